@@ -0,0 +1,184 @@
+"""
+Measure tail latency under mixed speech and underwriting load with and without the CPU thread budget.
+
+For each value in --budgets, starts --workers worker processes as a multi-worker server would
+(CPU_THREAD_BUDGET set to that value, WEB_CONCURRENCY to --workers) and drives every worker
+with two kinds of closed-loop clients for --seconds:
+
+    speech        transcribe a --clip-seconds clip with the Whisper model (CTranslate2 threads)
+    underwriting  hybrid_search a batch of --queries queries over --chunks indexed chunks (FAISS/BLAS)
+
+A budget of 0 leaves every library at its default thread count (CTranslate2: 4, OpenMP and BLAS:
+one per core), -1 divides the available cores between the workers (see item_api/resources.py).
+Reports p50/p95/p99 latency and requests/s per kind across all workers. --model takes a size
+("base") or the path of a converted CTranslate2 model.
+
+Usage (from backend/):
+    python benchmarks/bench_cpu_budget.py --model base --workers 4 --budgets 0 -1 --json budget.json
+    python benchmarks/bench_cpu_budget.py --model base --workers 4 --budgets -1 --compare budget.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KINDS = ("speech", "underwriting")
+WORDS = ("vehicle collision damage adjuster coverage deductible liability policyholder estimate repair "
+         "bumper windshield settlement inspection statement weather flood theft injury premium").split()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base", help="Whisper size or CTranslate2 model directory")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, -1], help="CPU_THREAD_BUDGET values to run")
+    parser.add_argument("--seconds", type=float, default=20, help="load duration per budget")
+    parser.add_argument("--speech-clients", type=int, default=1, help="speech clients per worker")
+    parser.add_argument("--underwriting-clients", type=int, default=2, help="underwriting clients per worker")
+    parser.add_argument("--clip-seconds", type=float, default=2.0)
+    parser.add_argument("--max-new-tokens", type=int, default=16)
+    parser.add_argument("--chunks", type=int, default=20000, help="chunks indexed in each worker")
+    parser.add_argument("--queries", type=int, default=8, help="queries per hybrid_search request")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    return parser.parse_args()
+
+
+def run_worker(args):
+    """One worker process: load both models, run the clients and print latencies as JSON"""
+    import django
+    django.setup()
+    logging.disable(logging.INFO)
+    from items import transcription
+    from underwriting.services import EmbeddingService
+
+    rng = random.Random(os.getpid())
+    model = transcription.get_whisper_model()
+    clip = (np.random.default_rng(0).standard_normal(int(args.clip_seconds * 16000)) * 0.1).astype(np.float32)
+    service = EmbeddingService(index_type="flat")
+    service.add_documents([(" ".join(rng.choices(WORDS, k=40)) + f" claim {n}", "claim", f"CLM-{n}")
+                           for n in range(args.chunks)])
+
+    def speech():
+        segments, _ = model.transcribe(clip, language="en", beam_size=1, temperature=0.0, without_timestamps=True,
+                                       condition_on_previous_text=False, max_new_tokens=args.max_new_tokens)
+        list(segments)
+
+    def underwriting():
+        service.hybrid_search([" ".join(rng.choices(WORDS, k=6)) + f" {rng.random()}" for _ in range(args.queries)])
+
+    calls = {"speech": speech, "underwriting": underwriting}
+    for call in calls.values():
+        call()  # warm up
+    latencies = {kind: [] for kind in KINDS}
+    clients = {"speech": args.speech_clients, "underwriting": args.underwriting_clients}
+
+    def client(kind, deadline):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            calls[kind]()
+            latencies[kind].append(time.perf_counter() - start)
+
+    # Start together with the other workers: the parent releases everyone through stdin
+    print("ready", flush=True)
+    sys.stdin.readline()
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=client, args=(kind, deadline)) for kind in KINDS for _ in range(clients[kind])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps(latencies), flush=True)
+
+
+def run_budget(args, budget):
+    env = dict(os.environ, CPU_THREAD_BUDGET=str(budget), WEB_CONCURRENCY=str(args.workers),
+               WHISPER_MODEL_SIZE=args.model, WHISPER_COMPUTE_TYPE=args.compute_type,
+               UNDERWRITING_LLM_BACKEND="stub", DJANGO_SETTINGS_MODULE="item_api.settings")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", *sys.argv[1:]]
+    workers = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise SystemExit(f"worker exited with {worker.wait()}")
+    for worker in workers:
+        worker.stdin.write("go\n")
+        worker.stdin.flush()
+
+    latencies = {kind: [] for kind in KINDS}
+    for worker in workers:
+        for kind, values in json.loads(worker.stdout.readline()).items():
+            latencies[kind].extend(values)
+        worker.wait()
+    return [{
+        "budget": budget,
+        "kind": kind,
+        "requests": len(values),
+        "requests_per_second": len(values) / args.seconds,
+        "p50_ms": float(np.percentile(values, 50) * 1000),
+        "p95_ms": float(np.percentile(values, 95) * 1000),
+        "p99_ms": float(np.percentile(values, 99) * 1000),
+    } for kind, values in latencies.items() if values]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline = {(r["budget"], r["kind"]): r for r in (baseline or {}).get("results", [])}
+    print(f"{'budget':>6} {'kind':<13} {'reqs':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r['budget']:>6} {r['kind']:<13} {r['requests']:>6} {r['requests_per_second']:>8.2f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+        before = baseline.get((r["budget"], r["kind"]))
+        if before:
+            changes = "  ".join(f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                                for key in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms") if before[key])
+            print(f"{'':>6} {'':<13} vs {before.get('commit') or 'baseline'}: {changes}")
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        return run_worker(args)
+
+    from item_api import resources
+
+    print(f"{args.workers} workers on {resources.available_cpus()} available cores, {args.seconds:g}s per budget")
+    results = []
+    for budget in args.budgets:
+        results.extend(run_budget(args, budget))
+
+    commit = git_commit()
+    for result in results:
+        result["commit"] = commit
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "commit": commit, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
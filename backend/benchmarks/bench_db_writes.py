@@ -0,0 +1,158 @@
+"""
+Compare concurrent write throughput across database configurations.
+
+Each configuration gets its own freshly migrated test database. Writer threads then emulate
+request handling: every operation saves one UnderwritingApplication (what process_application
+does) or upserts a batch of claims (what bulk ingestion does) in a transaction, and ends with
+close_old_connections() the way Django ends a request, so CONN_MAX_AGE and pooling take effect.
+
+Configurations:
+    sqlite-default   Django's stock SQLite settings (rollback journal, FULL sync, 5s timeout)
+    sqlite-tuned     the settings.py default: WAL, synchronous=NORMAL, IMMEDIATE transactions
+    postgres-*       --postgres only, from the DB_* environment variables: no persistent
+                     connections, CONN_MAX_AGE, and the psycopg pool (needs psycopg[pool])
+
+Usage (from backend/):
+    python benchmarks/bench_db_writes.py --threads 8 --ops 200
+    DB_HOST=localhost DB_USER=postgres python benchmarks/bench_db_writes.py --postgres --json writes.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+
+def database_configs(include_postgres, directory):
+    sqlite = {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(directory, "bench.sqlite3")}
+    configs = {
+        "sqlite-default": {**sqlite, "TEST": {"NAME": os.path.join(directory, "default.sqlite3")}},
+        "sqlite-tuned": {**sqlite, "TEST": {"NAME": os.path.join(directory, "tuned.sqlite3")}, "OPTIONS": {
+            "timeout": 20, "transaction_mode": "IMMEDIATE",
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL"}},
+    }
+    if include_postgres:
+        postgres = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "item_api"),
+            "USER": os.getenv("DB_USER", "postgres"),
+            "PASSWORD": os.getenv("DB_PASSWORD", ""),
+            "HOST": os.getenv("DB_HOST", "localhost"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+        }
+        configs["postgres-no-persist"] = {**postgres, "CONN_MAX_AGE": 0,
+                                          "TEST": {"NAME": "test_bench_no_persist"}}
+        configs["postgres-conn-max-age"] = {**postgres, "CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True,
+                                            "TEST": {"NAME": "test_bench_conn_max_age"}}
+        configs["postgres-pool"] = {**postgres, "CONN_MAX_AGE": 0, "TEST": {"NAME": "test_bench_pool"},
+                                    "OPTIONS": {"pool": {"min_size": 2, "max_size": 32, "timeout": 30}}}
+    return configs
+
+
+def run_writers(alias, threads, ops, batch):
+    from django.db import close_old_connections, connections, transaction
+    from underwriting.models import Claim, UnderwritingApplication
+
+    latencies, errors = [], []
+    guard = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def writer(worker):
+        local_latencies, local_errors = [], []
+        barrier.wait()
+        for op in range(ops):
+            start = time.perf_counter()
+            try:
+                with transaction.atomic(using=alias):
+                    if op % 10 == 9:
+                        Claim.objects.using(alias).bulk_create(
+                            [Claim(claim_id=f"W{worker}-{op}-{n}", applicant_id=f"A{worker}", text="claim text")
+                             for n in range(batch)],
+                            update_conflicts=True, unique_fields=["claim_id"], update_fields=["text"])
+                    else:
+                        UnderwritingApplication.objects.using(alias).create(
+                            applicant_id=f"A{worker}", policy_id=f"P{op}", lob="auto",
+                            application_data={"op": op}, risk_summary="Low risk", red_flags=["flag"],
+                            status="processed")
+            except Exception as e:
+                local_errors.append(type(e).__name__)
+            local_latencies.append(time.perf_counter() - start)
+            # End of "request": closes or keeps the connection according to CONN_MAX_AGE / pool
+            close_old_connections()
+        connections[alias].close()
+        with guard:
+            latencies.extend(local_latencies)
+            errors.extend(local_errors)
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent writer threads")
+    parser.add_argument("--ops", type=int, default=200, help="write operations per thread")
+    parser.add_argument("--batch", type=int, default=50, help="claims per bulk upsert (every 10th operation)")
+    parser.add_argument("--postgres", action="store_true", help="also benchmark PostgreSQL from DB_* variables")
+    parser.add_argument("--configs", nargs="+", help="only run these configurations")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_db_")
+    configs = database_configs(args.postgres, directory)
+    if args.configs:
+        configs = {name: config for name, config in configs.items() if name in args.configs}
+
+    # Register the benchmark databases before Django creates any connection
+    from django.conf import settings
+    settings.DATABASES.update(configs)
+
+    import django
+    django.setup()
+    from django.db import connections
+
+    print(f"{args.threads} threads x {args.ops} writes (every 10th a {args.batch}-row bulk upsert)")
+    print(f"{'config':<24} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    results = []
+    for alias in configs:
+        connection = connections[alias]
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            latencies, errors, seconds = run_writers(alias, args.threads, args.ops, args.batch)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if connection.vendor == "postgresql":
+                connection.close_pool()
+        successful = len(latencies) - len(errors)
+        result = {
+            "config": alias,
+            "writes_per_second": successful / seconds,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "errors": len(errors),
+            "error_types": sorted(set(errors)),
+        }
+        results.append(result)
+        print(f"{alias:<24} {result['writes_per_second']:>9.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
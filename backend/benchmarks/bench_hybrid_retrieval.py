@@ -0,0 +1,117 @@
+"""
+Compare vector, BM25 and hybrid (reciprocal rank fusion) retrieval on a synthetic claims corpus.
+
+Every synthetic chunk carries a unique claim code, a VIN and a regulation section number buried
+in filler text. Queries ask for one identifier in natural wording; a hit means the chunk that
+contains it is in the top k. Latency is reported per query for each retriever.
+
+Usage (from backend/):
+    python benchmarks/bench_hybrid_retrieval.py --chunks 50000 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from underwriting.services import EmbeddingService  # noqa: E402
+
+FILLER = ("the insured vehicle was parked collision damage reported adjuster reviewed coverage deductible "
+          "liability policyholder estimate repair rear bumper windshield claim notes settlement pending "
+          "inspection photos submitted third party statement police report weather conditions").split()
+
+VIN_ALPHABET = "".join(c for c in string.ascii_uppercase + string.digits if c not in "IOQ")
+
+
+def synthetic_corpus(chunks, words, seed):
+    rng = random.Random(seed)
+    documents, identifiers = [], []
+    for n in range(chunks):
+        claim_code = f"CLM-{2015 + n % 10}-{n:06d}"
+        vin = "".join(rng.choice(VIN_ALPHABET) for _ in range(17))
+        section = f"{rng.randint(1, 40)}.{rng.randint(1, 20)}.{n % 97}"
+        filler = [rng.choice(FILLER) for _ in range(words)]
+        for token in (f"claim {claim_code}", f"VIN {vin}", f"see section {section}"):
+            filler.insert(rng.randrange(len(filler)), token)
+        documents.append((" ".join(filler), "claims", claim_code))
+        identifiers.append({"claim_code": claim_code, "vin": vin, "section": section})
+    return documents, identifiers
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=60, help="filler words per chunk")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    documents, identifiers = synthetic_corpus(args.chunks, args.words, args.seed)
+    service = EmbeddingService()
+    start = time.perf_counter()
+    service.add_documents(documents)
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(args.seed + 1)
+    targets = rng.sample(range(args.chunks), min(args.queries, args.chunks))
+    templates = [
+        ("claim_code", "status of claim {} for this applicant"),
+        ("vin", "prior losses on vehicle VIN {}"),
+        ("section", "requirements under regulation section {}"),
+    ]
+    queries, expected = [], []
+    for i, target in enumerate(targets):
+        field, template = templates[i % len(templates)]
+        queries.append(template.format(identifiers[target][field]))
+        expected.append(documents[target][2])
+
+    retrievers = {
+        "vector": lambda q: [r["doc_id"] for r in service.search(q, k=args.k)],
+        "bm25": lambda q: [service.chunks.get(idx)["doc_id"] for idx, _ in service.lexical_index.search(q, args.k)],
+        "hybrid": lambda q: [r["doc_id"] for r in service.hybrid_search(q, k=args.k)],
+    }
+
+    print(f"{args.chunks} chunks indexed in {build_seconds:.1f}s; {len(queries)} identifier queries, hit@{args.k}")
+    print(f"{'retriever':<10} {'hit@k':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    results = []
+    for name, retrieve in retrievers.items():
+        hits, latencies = timed(retrieve, queries)
+        hit_rate = sum(target in found for target, found in zip(expected, hits)) / len(queries)
+        result = {
+            "retriever": name,
+            "hit_at_k": hit_rate,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        }
+        results.append(result)
+        print(f"{name:<10} {hit_rate:>7.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "build_seconds": build_seconds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure worker boot cost: import time and resident memory of loading Django and the URLconf.
+
+Each run starts a fresh interpreter with `python -X importtime`, calls django.setup() and
+resolves the URLconf (what a WSGI/ASGI worker does before serving its first request), then
+reports wall time, peak RSS and the heaviest imports by cumulative time. The "services" and
+"whisper" targets additionally import the underwriting pipeline or load the speech model
+module, to show what first use costs once those are deferred.
+
+Usage (from backend/):
+    python benchmarks/bench_import_time.py --repeat 5 --json boot.json
+    python benchmarks/bench_import_time.py --target urls services --compare boot.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "django": "",
+    "urls": "from django.urls import get_resolver; get_resolver().url_patterns",
+    "services": "from django.urls import get_resolver; get_resolver().url_patterns; import underwriting.services",
+    "whisper": "from django.urls import get_resolver; get_resolver().url_patterns; import faster_whisper",
+}
+
+CHILD = """
+import resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+{statement}
+elapsed = time.perf_counter() - start
+# ru_maxrss is KiB on Linux
+print("BENCH", elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, file=sys.stderr)
+"""
+
+
+def run_once(statement):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "item_api.settings"))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(statement=statement)],
+                             cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if process.returncode:
+        raise SystemExit(process.stderr[-2000:])
+
+    imports, seconds, rss = {}, None, None
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if self_us.strip().isdigit():
+                imports[name.strip()] = int(cumulative_us)
+        elif line.startswith("BENCH "):
+            _, seconds, rss = line.split()
+    return float(seconds), int(rss), imports
+
+
+def top_level(imports, count):
+    """Heaviest top-level packages by cumulative import time"""
+    packages = {}
+    for name, cumulative_us in imports.items():
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative_us)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", nargs="+", default=["django", "urls"], choices=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to list")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["target"]: r for r in json.load(f)["results"]}
+
+    results = []
+    for target in args.target:
+        runs = [run_once(TARGETS[target]) for _ in range(args.repeat)]
+        result = {
+            "target": target,
+            "seconds": statistics.median(seconds for seconds, _, _ in runs),
+            "rss_mib": statistics.median(rss for _, rss, _ in runs) / 2 ** 20,
+            "modules": len(runs[-1][2]),
+            "top_packages_ms": {name: us / 1000 for name, us in top_level(runs[-1][2], args.top)},
+        }
+        results.append(result)
+
+        print(f"{target}: {result['seconds'] * 1000:.0f} ms, {result['rss_mib']:.1f} MiB RSS, "
+              f"{result['modules']} modules")
+        before = baseline.get(target)
+        if before:
+            print(f"  vs baseline: {(result['seconds'] - before['seconds']) * 1000:+.0f} ms, "
+                  f"{result['rss_mib'] - before['rss_mib']:+.1f} MiB, {result['modules'] - before['modules']:+d} modules")
+        for name, ms in result["top_packages_ms"].items():
+            print(f"  {name:<28} {ms:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
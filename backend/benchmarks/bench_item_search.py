@@ -0,0 +1,210 @@
+"""
+Benchmark item search (GET /items/ with ?group=, ?q= and ?fuzzy=) on a large seeded table.
+
+Seeds N items (default 1M) with two-word names drawn from a synthetic vocabulary into a
+throwaway test database, then times requests through the API with the response cache cleared
+before every call, so each one runs its queries:
+
+    full_list     GET /items/ unpaginated: what the list page downloaded before search existed
+    group_page    ?group=&limit=20&offset= (a random page among the first --max-offset rows)
+    prefix_1      ?q=<first letter>&limit=20
+    prefix_3      ?q=<first three letters>&limit=20
+    fuzzy         ?q=<name with one typo>&fuzzy=1&limit=20
+    scan_prefix   the prefix_3 lookup as an unindexed istartswith scan (ORM only, for reference)
+
+Fuzzy queries are existing names with one character deleted, replaced or transposed; recall is
+the share of them whose original item comes back in the first page. Write --json to keep a
+result and --compare it against an earlier run to print the relative change.
+
+Usage (from backend/):
+    python benchmarks/bench_item_search.py --items 1000000 --json search.json
+    python benchmarks/bench_item_search.py --items 100000 --requests 50 --compare search.json
+"""
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = ("full_list", "group_page", "prefix_1", "prefix_3", "fuzzy", "scan_prefix")
+GROUPS = ("Primary", "Secondary")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=5000, help="distinct words names are made of")
+    parser.add_argument("--requests", type=int, default=200, help="calls per stage")
+    parser.add_argument("--full-list-requests", type=int, default=3, help="calls for the (slow) full_list stage")
+    parser.add_argument("--max-offset", type=int, default=1000, help="deepest page group_page requests")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    return parser.parse_args()
+
+
+def make_words(rng, count):
+    syllables = [c + v for c in "bcdfghjklmnprstvwz" for v in "aeiou"]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed_items(args, rng):
+    from django.db import transaction
+    from items.models import Item
+
+    words = make_words(rng, args.vocabulary)
+    names = set()
+    while len(names) < args.items:
+        names.add(f"{rng.choice(words).title()} {rng.choice(words)}")
+    names = sorted(names)
+    rng.shuffle(names)
+    for start in range(0, len(names), 50_000):
+        with transaction.atomic():
+            Item.objects.bulk_create([Item(name=name, group=rng.choice(GROUPS))
+                                      for name in names[start:start + 50_000]], batch_size=5000)
+    return names
+
+
+def typo(rng, name):
+    chars = list(name)
+    position = rng.randrange(1, len(chars) - 1)
+    kind = rng.choice(("delete", "replace", "transpose"))
+    if kind == "delete":
+        del chars[position]
+    elif kind == "replace":
+        chars[position] = rng.choice(string.ascii_lowercase)
+    else:
+        chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return "".join(chars)
+
+
+def summarize(stage, latencies, **extra):
+    return {
+        "stage": stage,
+        "ops": len(latencies),
+        "ops_per_second": len(latencies) / sum(latencies),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        **extra,
+    }
+
+
+def run_stages(args, rng, names):
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from items.models import Item
+
+    client = APIClient()
+
+    def get(url, params=None):
+        cache.clear()
+        start = time.perf_counter()
+        response = client.get(url, params)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise SystemExit(f"{url} {params} returned {response.status_code}")
+        return elapsed, response.data
+
+    samples = [rng.choice(names) for _ in range(args.requests)]
+    results = {}
+    if "full_list" in args.stages:
+        latencies = [get("/items/")[0] for _ in range(args.full_list_requests)]
+        results["full_list"] = summarize("full_list", latencies)
+    if "group_page" in args.stages:
+        latencies = [get("/items/", {"group": rng.choice(GROUPS), "limit": 20,
+                                     "offset": rng.randrange(args.max_offset)})[0] for _ in samples]
+        results["group_page"] = summarize("group_page", latencies)
+    for stage, length in (("prefix_1", 1), ("prefix_3", 3)):
+        if stage in args.stages:
+            calls = [get("/items/", {"q": name[:length], "limit": 20}) for name in samples]
+            results[stage] = summarize(stage, [elapsed for elapsed, _ in calls],
+                                       mean_count=float(np.mean([data["count"] for _, data in calls])))
+    if "fuzzy" in args.stages:
+        latencies, found = [], 0
+        for name in samples:
+            elapsed, data = get("/items/", {"q": typo(rng, name), "fuzzy": 1, "limit": 20})
+            latencies.append(elapsed)
+            found += any(item["name"] == name for item in data["results"])
+        results["fuzzy"] = summarize("fuzzy", latencies, recall=found / len(samples))
+    if "scan_prefix" in args.stages:
+        latencies = []
+        for name in samples:
+            start = time.perf_counter()
+            list(Item.objects.filter(name__istartswith=name[:3]).order_by("name")[:20])
+            latencies.append(time.perf_counter() - start)
+        results["scan_prefix"] = summarize("scan_prefix", latencies)
+    return [results[stage] for stage in args.stages if stage in results]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline = {r["stage"]: r for r in (baseline or {}).get("results", [])}
+    print(f"{'stage':<12} {'ops':>5} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  notes")
+    for r in results:
+        notes = "  ".join(f"{key} {r[key]:.2f}" for key in ("mean_count", "recall") if key in r)
+        print(f"{r['stage']:<12} {r['ops']:>5} {r['ops_per_second']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}  {notes}")
+        before = baseline.get(r["stage"])
+        if before:
+            changes = "  ".join(f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                                for key in ("ops_per_second", "p50_ms", "p95_ms", "p99_ms") if before[key])
+            print(f"{'':<12} vs {before.get('commit') or 'baseline'}: {changes}")
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        names = seed_items(args, rng)
+        print(f"Seeded {args.items} items in {time.perf_counter() - start:.1f}s on {connection.vendor}")
+        results = run_stages(args, rng, names)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    commit = git_commit()
+    for result in results:
+        result["commit"] = commit
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "commit": commit, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Measure the CPU cost of JSON responses: rendering, parsing and the hot read endpoints.
+
+Seeds a throwaway test database and reports, per stage, CPU milliseconds per call
+(time.process_time, so waiting is excluded) next to wall-clock p50/p95:
+
+    render_drf, render_orjson   DRF's JSONRenderer vs ORJSONRenderer on the list_applications payload
+    parse_drf, parse_orjson     JSONParser vs ORJSONParser on a bulk claims body
+    items_list                  GET /items/ (unpaginated)
+    list_applications           GET /api/underwriting/list_applications/
+    dashboard_overview          GET /api/underwriting/dashboard_overview/
+    application_details         GET /api/underwriting/get_application_details/ with all related data
+    embeddings                  POST /api/underwriting/embeddings/ for --texts texts
+
+Endpoints run with the response cache cleared before every call. The render and parse stages
+need item_api/renderers.py; on older commits they are skipped, so a run there with --json gives
+the endpoint baseline for --compare.
+
+Usage (from backend/):
+    python benchmarks/bench_json.py --applications 2000 --json after.json
+    python benchmarks/bench_json.py --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = ("render_drf", "render_orjson", "parse_drf", "parse_orjson", "items_list", "list_applications",
+          "dashboard_overview", "application_details", "embeddings")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--claims", type=int, default=500, help="claims of the applicant application_details reads")
+    parser.add_argument("--texts", type=int, default=64, help="texts per embeddings request")
+    parser.add_argument("--requests", type=int, default=20, help="calls per stage")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    return parser.parse_args()
+
+
+def seed_database(args, rng):
+    from items.models import Item
+    from underwriting.models import Claim, Policy, Regulation, UnderwritingApplication
+
+    Item.objects.bulk_create([Item(name=f"Item {n}", group=rng.choice(["Primary", "Secondary"]))
+                              for n in range(args.items)], batch_size=1000)
+    Policy.objects.create(policy_id="POL-0", text="Policy wording " * 200)
+    Regulation.objects.bulk_create([Regulation(regulation_id=f"REG-{n}", lob="auto", text="Rule text " * 100)
+                                    for n in range(50)])
+    Claim.objects.bulk_create([Claim(claim_id=f"CLM-{n}", applicant_id="APP-0", text="Claim text " * 50,
+                                     metadata={"amount": n * 100}) for n in range(args.claims)], batch_size=1000)
+    UnderwritingApplication.objects.bulk_create([UnderwritingApplication(
+        applicant_id=f"APP-{n % 100}", policy_id="POL-0", lob="auto",
+        application_data={"age": rng.randint(18, 80), "vehicle": "sedan", "coverage": [50000, 100000]},
+        risk_summary=rng.choice(["Low risk", "Medium to high risk driver", "High risk applicant"]) * 5,
+        red_flags=[f"flag {i}" for i in range(n % 4)], recommendations="Standard review",
+        status="processed" if n % 3 else "pending") for n in range(args.applications)], batch_size=1000)
+    return UnderwritingApplication.objects.filter(applicant_id="APP-0").first().id
+
+
+def measure(stage, call, requests):
+    call()  # warm up
+    cpu, wall = [], []
+    for _ in range(requests):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        call()
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+    return {
+        "stage": stage,
+        "ops": requests,
+        "cpu_ms": float(np.mean(cpu) * 1000),
+        "p50_ms": float(np.percentile(wall, 50) * 1000),
+        "p95_ms": float(np.percentile(wall, 95) * 1000),
+    }
+
+
+def run_stages(args, application_id):
+    from django.core.cache import cache
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+    from underwriting.models import UnderwritingApplication
+    from underwriting.serializers import UnderwritingApplicationSerializer
+
+    client = APIClient()
+
+    def get(url, params=None):
+        cache.clear()
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise SystemExit(f"{url} returned {response.status_code}")
+        return response
+
+    def post(url, data):
+        response = client.post(url, data, format="json")
+        if response.status_code != 200:
+            raise SystemExit(f"{url} returned {response.status_code}")
+        return response
+
+    endpoints = {
+        "items_list": lambda: get("/items/"),
+        "list_applications": lambda: get("/api/underwriting/list_applications/"),
+        "dashboard_overview": lambda: get("/api/underwriting/dashboard_overview/"),
+        "application_details": lambda: get("/api/underwriting/get_application_details/",
+                                           {"application_id": str(application_id)}),
+        "embeddings": lambda: post("/api/underwriting/embeddings/",
+                                   {"input": [f"text number {n} about a vehicle claim" for n in range(args.texts)]}),
+    }
+
+    calls = {}
+    try:
+        from item_api.parsers import ORJSONParser
+        from item_api.renderers import ORJSONRenderer
+    except ImportError:
+        print("item_api.renderers not found; skipping the render and parse stages")
+    else:
+        payload = UnderwritingApplicationSerializer(UnderwritingApplication.objects.all(), many=True).data
+        body = JSONRenderer().render([{"claim_id": f"CLM-{n}", "applicant_id": "APP-1", "text": "Claim text " * 50,
+                                       "metadata": {"amount": n}} for n in range(2000)])
+        calls = {
+            "render_drf": lambda: JSONRenderer().render(payload),
+            "render_orjson": lambda: ORJSONRenderer().render(payload),
+            "parse_drf": lambda: JSONParser().parse(io.BytesIO(body)),
+            "parse_orjson": lambda: ORJSONParser().parse(io.BytesIO(body)),
+        }
+    calls.update(endpoints)
+    return [measure(stage, calls[stage], args.requests) for stage in args.stages if stage in calls]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline = {r["stage"]: r for r in (baseline or {}).get("results", [])}
+    print(f"{'stage':<20} {'ops':>5} {'cpu ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['stage']:<20} {r['ops']:>5} {r['cpu_ms']:>9.2f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}")
+        before = baseline.get(r["stage"])
+        if before:
+            changes = "  ".join(f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                                for key in ("cpu_ms", "p50_ms", "p95_ms") if before[key])
+            print(f"{'':<20} vs {before.get('commit') or 'baseline'}: {changes}")
+
+
+def main():
+    args = parse_args()
+    os.environ["UNDERWRITING_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench_index_")
+    os.environ["UNDERWRITING_LLM_BACKEND"] = "stub"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        application_id = seed_database(args, random.Random(args.seed))
+        print(f"Seeded {args.applications} applications, {args.items} items and {args.claims} claims")
+        results = run_stages(args, application_id)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    commit = git_commit()
+    for result in results:
+        result["commit"] = commit
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "commit": commit, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
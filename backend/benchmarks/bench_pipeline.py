@@ -0,0 +1,259 @@
+"""
+Benchmark the underwriting pipeline stage by stage against a seeded throwaway database.
+
+Seeds N policies, M claims and R regulations (plus applications for the read endpoints) into a
+test database, swaps ChatGroq for the deterministic stub LLM (underwriting/llm.py) with a
+configurable per-call latency, and times each stage separately:
+
+    chunking, embedding, index_add, search, process_application, list_applications, dashboard_overview
+
+Each stage reports operations, throughput (ops/s) and p50/p95/p99 latency. Search runs with the
+retrieval cache disabled and the read endpoints with the response cache cleared (unless
+--cached), so every call does real work. Write --json to keep a result and --compare it against
+an earlier run (e.g. from another commit) to print the relative change.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py --policies 200 --claims 1000 --regulations 50 --json head.json
+    python benchmarks/bench_pipeline.py --llm-latency 0.2 --compare head.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = ("chunking", "embedding", "index_add", "search", "process_application",
+          "list_applications", "dashboard_overview")
+
+WORDS = ("coverage deductible liability collision comprehensive premium insured vehicle driver "
+         "accident claim adjuster settlement exclusion endorsement renewal underwriting risk "
+         "violation speeding property damage bodily injury uninsured motorist limit policyholder "
+         "inspection estimate repair windshield theft flood hail garage territory mileage").split()
+LOBS = ("auto", "home", "commercial_auto", "umbrella")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", type=int, default=100)
+    parser.add_argument("--claims", type=int, default=500)
+    parser.add_argument("--regulations", type=int, default=40)
+    parser.add_argument("--applicants", type=int, default=100, help="distinct applicants the claims are spread over")
+    parser.add_argument("--applications", type=int, default=500, help="stored applications for the read endpoints")
+    parser.add_argument("--words", type=int, default=300, help="words per seeded document")
+    parser.add_argument("--runs", type=int, default=20, help="process_application calls")
+    parser.add_argument("--queries", type=int, default=200, help="search calls")
+    parser.add_argument("--requests", type=int, default=50, help="calls per read endpoint")
+    parser.add_argument("--cached", action="store_true",
+                        help="let the read endpoints serve from the response cache (default: measure the uncached path)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    return parser.parse_args()
+
+
+def summarize(stage, latencies, total_seconds=None, items=None):
+    total_seconds = sum(latencies) if total_seconds is None else total_seconds
+    result = {
+        "stage": stage,
+        "ops": len(latencies),
+        "ops_per_second": len(latencies) / total_seconds if total_seconds else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+    if items is not None:
+        result["items"] = items
+        result["items_per_second"] = items / total_seconds if total_seconds else 0.0
+    return result
+
+
+def timed(calls):
+    latencies, outputs = [], []
+    for call in calls:
+        start = time.perf_counter()
+        outputs.append(call())
+        latencies.append(time.perf_counter() - start)
+    return latencies, outputs
+
+
+def text(rng, words, *tokens):
+    body = [rng.choice(WORDS) for _ in range(words)]
+    for token in tokens:
+        body.insert(rng.randrange(len(body)), token)
+    return " ".join(body)
+
+
+def seed_database(args, rng):
+    from underwriting.models import Claim, Policy, Regulation, UnderwritingApplication
+
+    Policy.objects.bulk_create(
+        [Policy(policy_id=f"POL-{n:06d}", text=text(rng, args.words, f"policy POL-{n:06d}"))
+         for n in range(args.policies)], batch_size=500)
+    Claim.objects.bulk_create(
+        [Claim(claim_id=f"CLM-{n:06d}", applicant_id=f"APP-{n % args.applicants:05d}",
+               text=text(rng, args.words // 3, f"claim CLM-{n:06d}")) for n in range(args.claims)], batch_size=500)
+    Regulation.objects.bulk_create(
+        [Regulation(regulation_id=f"REG-{n:04d}", lob=LOBS[n % len(LOBS)],
+                    text=text(rng, args.words, f"section {n % 40}.{n % 7}.{n % 3}")) for n in range(args.regulations)],
+        batch_size=500)
+    UnderwritingApplication.objects.bulk_create(
+        [UnderwritingApplication(
+            applicant_id=f"APP-{n % args.applicants:05d}", policy_id=f"POL-{n % max(args.policies, 1):06d}",
+            lob=LOBS[n % len(LOBS)], application_data=application_data(rng),
+            risk_summary=rng.choice(["Low risk", "Medium to high risk", "High risk applicant"]),
+            red_flags=[f"flag {i}" for i in range(n % 4)], recommendations="Standard review",
+            status="processed" if n % 3 else "pending") for n in range(args.applications)], batch_size=500)
+
+
+def application_data(rng):
+    return {
+        "coverage_type": rng.choice(["full", "liability", "comprehensive"]),
+        "coverage_amount": rng.choice([50000, 100000, 250000]),
+        "age": rng.randint(18, 80),
+        "driving_record": rng.choice(["clean", "1 speeding violation", "2 accidents"]),
+        "previous_claims": rng.choice(["none", "1 collision claim"]),
+    }
+
+
+def run_stages(args, rng):
+    from django.core.cache import cache
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from underwriting.models import Claim, Policy, Regulation
+    from underwriting.services import EmbeddingService, UnderwritingWorkflow
+
+    documents = ([(p.text, "policy", p.policy_id) for p in Policy.objects.only("policy_id", "text")]
+                 + [(c.text, "claims", c.claim_id) for c in Claim.objects.only("claim_id", "text")]
+                 + [(r.text, "regulations", r.regulation_id) for r in Regulation.objects.only("regulation_id", "text")])
+    service = EmbeddingService()
+    results = {}
+
+    # Chunking and embedding run per document, as the request path and build_index do
+    latencies, chunked = timed([lambda d=d: service.chunk_text(d[0]) for d in documents])
+    chunk_count = sum(len(chunks) for chunks in chunked)
+    if "chunking" in args.stages:
+        results["chunking"] = summarize("chunking", latencies, items=chunk_count)
+
+    latencies, embedded = timed([lambda c=c: service.get_embeddings(c) for c in chunked])
+    if "embedding" in args.stages:
+        results["embedding"] = summarize("embedding", latencies, items=chunk_count)
+
+    metadata = [[{"text": chunk, "source": source, "doc_id": doc_id, "chunk_index": i}
+                 for i, chunk in enumerate(chunks)] for (_, source, doc_id), chunks in zip(documents, chunked)]
+    latencies, _ = timed([lambda e=e, m=m: service.add_embeddings(e, m) for e, m in zip(embedded, metadata)])
+    if "index_add" in args.stages:
+        results["index_add"] = summarize("index_add", latencies, items=chunk_count)
+
+    workflow = UnderwritingWorkflow()
+    if "search" in args.stages:
+        query_sets = [workflow.build_retrieval_queries(application_data(rng)) + [f"claim CLM-{n:06d}"]
+                      for n in rng.sample(range(max(args.claims, 1)), min(args.queries, max(args.claims, 1)))]
+        with override_settings(UNDERWRITING_RETRIEVAL_CACHE_SIZE=0):
+            latencies, _ = timed([lambda q=q: service.hybrid_search(q, k=15) for q in query_sets])
+        results["search"] = summarize("search", latencies)
+
+    if "process_application" in args.stages:
+        calls = []
+        for _ in range(args.runs):
+            n = rng.randrange(max(args.policies, 1))
+            calls.append(lambda n=n: workflow.process_application(
+                f"APP-{n % args.applicants:05d}", f"POL-{n:06d}", LOBS[n % len(LOBS)], application_data(rng)))
+        latencies, _ = timed(calls)
+        results["process_application"] = summarize("process_application", latencies)
+
+    client = APIClient()
+
+    def get(url):
+        if not args.cached:
+            cache.clear()
+        return client.get(url)
+
+    for stage in ("list_applications", "dashboard_overview"):
+        if stage in args.stages:
+            url = f"/api/underwriting/{stage}/"
+            latencies, responses = timed([lambda: get(url)] * args.requests)
+            failed = [r.status_code for r in responses if r.status_code != 200]
+            if failed:
+                raise SystemExit(f"{stage} returned {failed[0]}")
+            results[stage] = summarize(stage, latencies)
+
+    return [results[stage] for stage in args.stages if stage in results]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline = {r["stage"]: r for r in (baseline or {}).get("results", [])}
+    print(f"{'stage':<20} {'ops':>6} {'ops/s':>10} {'items/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        items_rate = f"{r['items_per_second']:>10.1f}" if "items_per_second" in r else f"{'-':>10}"
+        print(f"{r['stage']:<20} {r['ops']:>6} {r['ops_per_second']:>10.1f} {items_rate} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+        before = baseline.get(r["stage"])
+        if before:
+            changes = "  ".join(f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                                for key in ("ops_per_second", "p50_ms", "p95_ms", "p99_ms") if before[key])
+            print(f"{'':<20} vs {before.get('commit') or 'baseline'}: {changes}")
+
+
+def main():
+    args = parse_args()
+
+    # Settings read the environment at import, so configure before django.setup()
+    index_dir = tempfile.mkdtemp(prefix="bench_index_")
+    os.environ["UNDERWRITING_INDEX_DIR"] = index_dir
+    os.environ["UNDERWRITING_LLM_BACKEND"] = "stub"
+    os.environ["UNDERWRITING_STUB_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        seed_database(args, rng)
+        print(f"Seeded {args.policies} policies, {args.claims} claims, {args.regulations} regulations and "
+              f"{args.applications} applications in {time.perf_counter() - start:.1f}s; "
+              f"stub LLM latency {args.llm_latency}s")
+        results = run_stages(args, rng)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    commit = git_commit()
+    for result in results:
+        result["commit"] = commit
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "commit": commit, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
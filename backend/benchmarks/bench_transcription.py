@@ -0,0 +1,151 @@
+"""
+Compare concurrent transcription throughput: one decode per request versus the micro-batching scheduler.
+
+Sends --clips speech clips from --concurrency client threads and reports clips/s and p50/p95/p99
+latency for each mode:
+
+    per_request  every clip decoded on its own (model.transcribe), as speech_to_text did before batching
+    batched      clips queued on items.scheduler.TranscriptionScheduler and decoded together
+
+Clips are synthesized noise unless --audio gives a recording; only compute cost matters here, so
+both modes decode greedily with temperature fallback off and --max-new-tokens caps each output.
+--model takes a size ("base") or the path of a converted CTranslate2 model.
+
+Usage (from backend/):
+    python benchmarks/bench_transcription.py --model base --clips 64 --concurrency 8 --json batch.json
+    python benchmarks/bench_transcription.py --batch-size 16 --window-ms 20 --compare batch.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("per_request", "batched")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base", help="Whisper size or CTranslate2 model directory")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--audio", help="recording to send instead of synthesized clips")
+    parser.add_argument("--clip-seconds", type=float, default=2.0)
+    parser.add_argument("--clips", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads sending clips")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--window-ms", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="scheduler worker threads")
+    parser.add_argument("--max-new-tokens", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to compare against")
+    return parser.parse_args()
+
+
+def load_clips(args):
+    from items.transcription import SAMPLE_RATE
+
+    if args.audio:
+        from faster_whisper import decode_audio
+
+        clip = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    else:
+        clip = (np.random.default_rng(0).standard_normal(int(args.clip_seconds * SAMPLE_RATE)) * 0.1).astype(np.float32)
+    return [clip] * args.clips
+
+
+def run(mode, args, clips):
+    from items import scheduler, transcription
+
+    model = transcription.get_whisper_model()
+    options = {"max_new_tokens": args.max_new_tokens}
+    if mode == "per_request":
+        def transcribe(clip):
+            segments, _ = model.transcribe(clip, language="en", beam_size=1, temperature=0.0, without_timestamps=True,
+                                           condition_on_previous_text=False, **options)
+            return "".join(segment.text for segment in segments)
+        batcher = None
+    else:
+        batcher = scheduler.TranscriptionScheduler(partial(transcription.transcribe_batch, **options),
+                                                   window=args.window_ms / 1000, max_batch_size=args.batch_size,
+                                                   workers=args.workers)
+        transcribe = batcher.transcribe
+
+    def timed(clip):
+        start = time.perf_counter()
+        transcribe(clip)
+        return time.perf_counter() - start
+
+    transcribe(clips[0])  # warm up
+    batches_before = batch_count()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        latencies = list(pool.map(timed, clips))
+    elapsed = time.perf_counter() - start
+    if batcher:
+        batcher.close()
+
+    result = {
+        "mode": mode,
+        "clips": len(clips),
+        "clips_per_second": len(clips) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+    if batcher:
+        result["mean_batch_size"] = len(clips) / max(batch_count() - batches_before, 1)
+    return result
+
+
+def batch_count():
+    from items.scheduler import BATCH_SIZE
+
+    return sum(series[-1] for series in BATCH_SIZE._series.values())
+
+
+def main():
+    args = parse_args()
+    os.environ["WHISPER_MODEL_SIZE"] = args.model
+    os.environ["WHISPER_COMPUTE_TYPE"] = args.compute_type
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "item_api.settings")
+
+    import django
+    django.setup()
+
+    clips = load_clips(args)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["mode"]: r for r in json.load(f)["results"]}
+
+    results = []
+    print(f"{'mode':<12} {'clips':>6} {'clips/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'batch':>6}")
+    for mode in args.modes:
+        r = run(mode, args, clips)
+        results.append(r)
+        batch = f"{r['mean_batch_size']:>6.1f}" if "mean_batch_size" in r else f"{'-':>6}"
+        print(f"{mode:<12} {r['clips']:>6} {r['clips_per_second']:>9.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {batch}")
+        before = baseline.get(mode)
+        if before:
+            changes = "  ".join(f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                                for key in ("clips_per_second", "p50_ms", "p95_ms", "p99_ms") if before[key])
+            print(f"{'':<12} vs baseline: {changes}")
+
+    if len(results) == 2:
+        print(f"batched / per_request throughput: {results[1]['clips_per_second'] / results[0]['clips_per_second']:.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
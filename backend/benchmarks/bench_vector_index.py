@@ -0,0 +1,108 @@
+"""
+Compare FAISS storage layouts for the underwriting vector index.
+
+For each layout in underwriting.vector_index.INDEX_TYPES this reports memory per million chunks,
+build time (train + add), single-query and batched query latency, and recall@k against the exact
+flat index. Vectors are synthetic but clustered and unit-normalized like real embeddings.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_index.py --n 100000 --types flat fp16 sq8 pq
+    python benchmarks/bench_vector_index.py --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from underwriting.vector_index import INDEX_TYPES, build_index, index_nbytes  # noqa: E402
+
+
+def synthetic_embeddings(n, dimension, clusters, seed):
+    """Unit vectors drawn around random centroids, so quantizers see realistic structure"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(exact_ids, approx_ids):
+    hits = sum(len(set(exact) & set(approx)) for exact, approx in zip(exact_ids, approx_ids))
+    return hits / exact_ids.size
+
+
+def bench_layout(index_type, vectors, queries, k, pq_m, training_size):
+    index = build_index(vectors.shape[1], index_type, pq_m)
+
+    start = time.perf_counter()
+    if not index.is_trained:
+        index.train(vectors[:training_size])
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    batched_seconds = time.perf_counter() - start
+
+    return {
+        "index_type": index_type,
+        "bytes_per_vector": index_nbytes(index) / len(vectors),
+        "gib_per_million": index_nbytes(index) / len(vectors) * 1e6 / 2 ** 30,
+        "build_seconds": build_seconds,
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "query_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "batched_query_ms": batched_seconds / len(queries) * 1000,
+    }, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="vectors in the index")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--pq-m", type=int, default=96, help="PQ sub-quantizers (bytes per vector)")
+    parser.add_argument("--training-size", type=int, default=20000)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=list(INDEX_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.n, args.dimension, args.clusters, args.seed)
+    queries = synthetic_embeddings(args.queries, args.dimension, args.clusters, args.seed)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, exact_ids = exact.search(queries, args.k)
+
+    results = []
+    print(f"{args.n} vectors, d={args.dimension}, {args.queries} queries, recall@{args.k} vs exact flat index")
+    print(f"{'layout':<8} {'B/vec':>8} {'GiB/1M':>8} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch ms':>9} {'recall':>7}")
+    for index_type in args.types:
+        result, ids = bench_layout(index_type, vectors, queries, args.k, args.pq_m, args.training_size)
+        result["recall_at_k"] = recall_at_k(exact_ids, ids)
+        results.append(result)
+        print(f"{index_type:<8} {result['bytes_per_vector']:>8.0f} {result['gib_per_million']:>8.2f} "
+              f"{result['build_seconds']:>8.2f} {result['query_p50_ms']:>8.2f} {result['query_p99_ms']:>8.2f} "
+              f"{result['batched_query_ms']:>9.3f} {result['recall_at_k']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Concurrent HTTP load generator for the REST API (asyncio + httpx).
+
+Runs a scenario file (benchmarks/scenarios/*.json) with N virtual users against a running server
+and reports throughput, error rate and a latency histogram per step. Start the server with the
+stub LLM so process_application measures the app rather than the LLM provider:
+
+    UNDERWRITING_LLM_BACKEND=stub UNDERWRITING_STUB_LLM_LATENCY=0.3 python manage.py runserver --noreload
+    gunicorn item_api.wsgi -w 4 --threads 4        # or a production-style server
+
+Usage (from backend/):
+    python benchmarks/loadgen.py benchmarks/scenarios/item_crud.json --users 20 --duration 30
+    python benchmarks/loadgen.py benchmarks/scenarios/process_application.json --users 8 --iterations 10
+    python benchmarks/loadgen.py --replay traffic.jsonl --users 16 --json results.json
+
+Scenario files hold "setup" steps (run once, before the users start) and "steps" (run in order
+by every user on each iteration). A step has a name, method, path and optionally json, data,
+files, headers, expect (accepted status codes, default 2xx) and save ({"var": "response.field"}),
+which stores a response field for later steps of the same iteration. Strings are templated with
+{vu}, {iteration}, {uuid} and saved variables. A file part is either {"path": ...} or
+{"generate_wav_seconds": n}, a synthesized 16 kHz tone.
+
+A replay file is JSONL with one HTTP request per line: {"method", "path"} plus the optional step
+fields above and "offset" (seconds from the start; honoured with --replay-timing). Lines without
+a method and path are skipped, so files that are not request logs are reported rather than sent.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import string
+import struct
+import sys
+import time
+import uuid
+import wave
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    sys.exit("loadgen needs httpx: pip install httpx")
+
+# Upper bounds in milliseconds for the latency histogram
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class StepStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.exceptions = {}
+
+    def record(self, seconds, status=None, ok=True, exception=None):
+        self.latencies.append(seconds)
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if exception is not None:
+            name = type(exception).__name__
+            self.exceptions[name] = self.exceptions.get(name, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, wall_seconds):
+        latencies_ms = np.array(self.latencies) * 1000
+        histogram = [int(n) for n in np.histogram(latencies_ms, bins=(0,) + HISTOGRAM_BOUNDS_MS + (math.inf,))[0]]
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "error_rate": self.errors / len(self.latencies) if self.latencies else 0.0,
+            "requests_per_second": len(self.latencies) / wall_seconds if wall_seconds else 0.0,
+            "mean_ms": float(latencies_ms.mean()) if len(latencies_ms) else 0.0,
+            "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else 0.0,
+            "p95_ms": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else 0.0,
+            "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else 0.0,
+            "max_ms": float(latencies_ms.max()) if len(latencies_ms) else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "exceptions": self.exceptions,
+            "histogram_ms": dict(zip([f"<={b}" for b in HISTOGRAM_BOUNDS_MS] + [">30000"], histogram)),
+        }
+
+
+def synthesize_wav(seconds, sample_rate=16000, frequency=440.0):
+    """A mono 16-bit tone, enough to exercise upload, decoding and transcription"""
+    samples = (0.2 * 32767 * np.sin(2 * np.pi * frequency * np.arange(int(seconds * sample_rate)) / sample_rate))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack(f"<{len(samples)}h", *samples.astype(np.int16)))
+    return buffer.getvalue()
+
+
+def render(value, variables):
+    """Fill {placeholders} in every string of a JSON-like value"""
+    if isinstance(value, str):
+        return string.Formatter().vformat(value, (), variables)
+    if isinstance(value, list):
+        return [render(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: render(item, variables) for key, item in value.items()}
+    return value
+
+
+def load_files(files, cache):
+    """Turn file specs into httpx multipart tuples, reading or synthesizing each payload once"""
+    parts = {}
+    for field, spec in (files or {}).items():
+        key = json.dumps(spec, sort_keys=True)
+        if key not in cache:
+            if "path" in spec:
+                with open(spec["path"], "rb") as f:
+                    cache[key] = (spec.get("filename", spec["path"].rsplit("/", 1)[-1]), f.read(),
+                                  spec.get("content_type", "application/octet-stream"))
+            else:
+                cache[key] = ("sample.wav", synthesize_wav(spec["generate_wav_seconds"]), "audio/wav")
+        parts[field] = cache[key]
+    return parts
+
+
+def extract(payload, dotted):
+    for part in dotted.split("."):
+        if part == "response":
+            continue
+        payload = payload[int(part)] if isinstance(payload, list) else payload[part]
+    return payload
+
+
+async def send(client, step, variables, stats, file_cache):
+    name = step.get("name") or f"{step['method']} {step['path']}"
+    expect = step.get("expect")
+    start = time.perf_counter()
+    try:
+        response = await client.request(
+            step["method"], render(step["path"], variables),
+            json=render(step["json"], variables) if "json" in step else None,
+            data=render(step.get("data"), variables),
+            files=load_files(step.get("files"), file_cache) or None,
+            headers=render(step.get("headers"), variables),
+        )
+    except (httpx.HTTPError, KeyError, OSError) as e:
+        stats.setdefault(name, StepStats()).record(time.perf_counter() - start, ok=False, exception=e)
+        return False
+    elapsed = time.perf_counter() - start
+    ok = response.status_code in expect if expect else response.is_success
+    stats.setdefault(name, StepStats()).record(elapsed, response.status_code, ok)
+
+    if ok and step.get("save"):
+        try:
+            payload = response.json()
+            for var, field in step["save"].items():
+                variables[var] = extract(payload, field)
+        except (ValueError, KeyError, IndexError, TypeError):
+            return False
+    return ok
+
+
+async def virtual_user(vu, client, steps, stats, deadline, iterations, start_delay, file_cache):
+    await asyncio.sleep(start_delay)
+    iteration = 0
+    while (iterations is None or iteration < iterations) and time.perf_counter() < deadline:
+        variables = {"vu": vu, "iteration": iteration, "uuid": uuid.uuid4().hex[:12]}
+        for step in steps:
+            # Later steps usually depend on saved variables, so a failed step ends the iteration
+            if not await send(client, step, variables, stats, file_cache):
+                break
+        iteration += 1
+
+
+async def replay_worker(client, queue, stats, started, speed, file_cache):
+    while True:
+        try:
+            line = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if speed and "offset" in line:
+            await asyncio.sleep(max(0.0, started + line["offset"] / speed - time.perf_counter()))
+        await send(client, line, {"uuid": uuid.uuid4().hex[:12], "vu": 0, "iteration": 0}, stats, file_cache)
+
+
+def read_replay(path):
+    lines, skipped = [], 0
+    with open(path) as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            try:
+                line = json.loads(raw)
+            except ValueError:
+                skipped += 1
+                continue
+            if isinstance(line, dict) and line.get("method") and line.get("path"):
+                lines.append(line)
+            else:
+                skipped += 1
+    return lines, skipped
+
+
+async def run(args):
+    stats, file_cache = {}, {}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        if args.replay:
+            lines, skipped = read_replay(args.replay)
+            if skipped:
+                print(f"Skipped {skipped} replay lines without a method and path")
+            if not lines:
+                sys.exit(f"{args.replay} contains no HTTP requests to replay")
+            queue = asyncio.Queue()
+            for line in sorted(lines, key=lambda line: line.get("offset", 0)):
+                queue.put_nowait(line)
+            name = args.replay
+            started = time.perf_counter()
+            await asyncio.gather(*(replay_worker(client, queue, stats, started, args.replay_timing, file_cache)
+                                   for _ in range(args.users)))
+        else:
+            with open(args.scenario) as f:
+                scenario = json.load(f)
+            name = scenario.get("name", args.scenario)
+            for step in scenario.get("setup", []):
+                if not await send(client, step, {"uuid": uuid.uuid4().hex[:12], "vu": "setup", "iteration": 0},
+                                  {}, file_cache):
+                    sys.exit(f"Setup step '{step.get('name', step['path'])}' failed")
+            iterations = args.iterations if args.iterations or not args.duration else None
+            started = time.perf_counter()
+            deadline = started + args.duration if args.duration else math.inf
+            await asyncio.gather(*(
+                virtual_user(vu, client, scenario["steps"], stats, deadline, iterations,
+                             args.ramp_up * vu / args.users, file_cache)
+                for vu in range(args.users)))
+    return name, stats, time.perf_counter() - started
+
+
+def print_report(name, summaries, total, wall_seconds, users):
+    print(f"\n{name}: {users} users, {wall_seconds:.1f}s, {total['requests']} requests, "
+          f"{total['requests_per_second']:.1f} req/s, {total['error_rate'] * 100:.2f}% errors")
+    print(f"{'step':<36} {'reqs':>7} {'req/s':>8} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for step, s in summaries.items():
+        statuses = " ".join(f"{code}x{count}" for code, count in s["statuses"].items())
+        if s["exceptions"]:
+            statuses += " " + " ".join(f"{exc}x{count}" for exc, count in s["exceptions"].items())
+        print(f"{step[:36]:<36} {s['requests']:>7} {s['requests_per_second']:>8.1f} {s['error_rate'] * 100:>6.2f} "
+              f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}  {statuses}")
+
+    print("\nlatency histogram (all steps)")
+    peak = max(total["histogram_ms"].values()) or 1
+    for bucket, count in total["histogram_ms"].items():
+        print(f"{bucket:>8} ms {count:>7} {'#' * round(40 * count / peak)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", nargs="?", help="scenario JSON file")
+    parser.add_argument("--replay", help="JSONL file of HTTP requests to replay instead of a scenario")
+    parser.add_argument("--replay-timing", type=float, default=0.0,
+                        help="honour replay offsets at this speed-up (0 sends as fast as possible)")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, help="seconds to run (default: --iterations per user)")
+    parser.add_argument("--iterations", type=int, help="scenario iterations per user (default 10)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which users start")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    if bool(args.scenario) == bool(args.replay):
+        parser.error("give either a scenario file or --replay")
+    if not args.duration and not args.iterations:
+        args.iterations = 10
+
+    name, stats, wall_seconds = asyncio.run(run(args))
+    if not stats:
+        sys.exit("No requests were sent")
+
+    combined = StepStats()
+    for s in stats.values():
+        combined.latencies.extend(s.latencies)
+        combined.errors += s.errors
+        for code, count in s.statuses.items():
+            combined.statuses[code] = combined.statuses.get(code, 0) + count
+        for exc, count in s.exceptions.items():
+            combined.exceptions[exc] = combined.exceptions.get(exc, 0) + count
+    summaries = {step: s.summary(wall_seconds) for step, s in stats.items()}
+    total = combined.summary(wall_seconds)
+    print_report(name, summaries, total, wall_seconds, args.users)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "scenario": name, "wall_seconds": wall_seconds,
+                       "total": total, "steps": summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
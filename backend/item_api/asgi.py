@@ -2,6 +2,8 @@
 ASGI config for item_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections are routed by path to the handlers in
+``websocket_routes`` and rejected for any other path.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -11,6 +13,30 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from item_api import resources
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'item_api.settings')
 
-application = get_asgi_application()
+# Size the libraries' thread pools for this worker before Django setup imports numpy
+resources.configure()
+
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from items.streaming import speech_socket  # noqa: E402
+
+websocket_routes = {
+    '/ws/items/speech/': speech_socket,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        handler = websocket_routes.get(scope['path'])
+        if handler is None:
+            await receive()  # websocket.connect
+            # Closing before accepting rejects the handshake with 403
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        return await handler(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,45 @@
+"""
+orjson-backed JSON renderer, the default for every API view (REST_FRAMEWORK in settings.py).
+
+Output matches DRF's JSONRenderer for serializer data. orjson also serializes numpy arrays and
+scalars, UUIDs and datetimes (UTC as ...Z, like DateTimeField) natively, so views can return
+QuerySet.values() rows and embeddings as they are. Anything else DRF knows how to encode
+(Decimal, lazy strings, timedelta, querysets) goes through DRF's JSONEncoder. Unlike
+STRICT_JSON, NaN and infinity render as null instead of failing the response.
+"""
+import contextlib
+
+import orjson
+from django.utils.http import parse_header_parameters
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def get_indent(self, accepted_media_type, renderer_context) -> bool:
+        """Pretty-print for 'application/json; indent=N' or the browsable API (always two spaces)"""
+        if accepted_media_type:
+            _, params = parse_header_parameters(accepted_media_type)
+            with contextlib.suppress(KeyError, ValueError, TypeError):
+                return int(params['indent']) > 0
+        return bool(renderer_context.get('indent'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_encoder.default, option=options)
+        # Escape U+2028/U+2029 like DRF, so the output stays a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,95 @@
+"""
+CPU thread budget for one worker process.
+
+Whisper (CTranslate2), FAISS (OpenMP), numpy's BLAS, torch and tiktoken's batch encoder each
+size their own thread pool, by default to every core of the host (CTranslate2 to four threads).
+With several worker processes per host they run many times more threads than there are cores,
+and requests queue behind each other's spinning threads. Each library instead gets threads(name):
+its <NAME>_THREADS setting if set, otherwise CPU_THREAD_BUDGET, which by default is the cores
+available to the process divided by WEB_CONCURRENCY (the gunicorn/uvicorn worker count).
+CPU_THREAD_BUDGET=0 turns the governor off and leaves every library at its own default.
+
+configure() runs in the web worker entry points (wsgi.py and asgi.py) before Django is set up, so
+before any of these libraries is imported: it sets the OpenMP and BLAS environment variables, which
+are read once when a library loads, and limits the libraries already loaded. Setting up Django
+alone (tests, management commands, scripts) leaves the process environment untouched. Libraries
+ask threads() themselves when they are used: get_whisper_model() passes cpu_threads,
+EmbeddingService limits FAISS's OpenMP pool when it is created and
+EmbeddingService.embed_documents passes num_threads to tiktoken. Outside a configured Django
+process (e.g. a benchmark importing vector_index directly) every library keeps its default. Silero
+VAD runs its ONNX session on one thread regardless.
+"""
+import logging
+import os
+import sys
+from typing import Optional
+
+from django.conf import ENVIRONMENT_VARIABLE, settings
+
+logger = logging.getLogger(__name__)
+
+LIBRARIES = ('whisper', 'faiss', 'torch', 'tiktoken', 'blas')
+
+# Set by configure(budget=...) in processes that are not web workers (e.g. build_index workers)
+_budget_override = None
+
+
+def available_cpus() -> int:
+    """Cores this process may run on: its CPU affinity, capped by a cgroup v2 CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def thread_budget() -> int:
+    """Threads one library may use in this process; 0 when the governor is off"""
+    if _budget_override is not None:
+        return _budget_override
+    if settings.CPU_THREAD_BUDGET >= 0:
+        return settings.CPU_THREAD_BUDGET
+    return max(1, available_cpus() // max(1, settings.WEB_CONCURRENCY))
+
+
+def threads(library: str) -> Optional[int]:
+    """Thread count for library (one of LIBRARIES), or None to keep the library's default"""
+    # Settings load lazily, so a worker entry point may ask before anything else has touched them
+    if not settings.configured and not os.environ.get(ENVIRONMENT_VARIABLE):
+        return None
+    return getattr(settings, f'{library.upper()}_THREADS') or thread_budget() or None
+
+
+def configure(budget: Optional[int] = None) -> None:
+    """Apply the budget to this process; pass budget to override CPU_THREAD_BUDGET"""
+    global _budget_override
+    if budget is not None:
+        _budget_override = budget
+
+    omp, blas = threads('faiss'), threads('blas')
+    if omp:
+        os.environ.setdefault('OMP_NUM_THREADS', str(omp))
+    if blas:
+        for name in ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+            os.environ.setdefault(name, str(blas))
+
+    if 'faiss' in sys.modules:
+        limit_faiss(sys.modules['faiss'])
+    torch_threads = threads('torch')
+    if torch_threads and 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(torch_threads)
+    logger.info("CPU thread budget: %s", {library: threads(library) or 'default' for library in LIBRARIES})
+
+
+def limit_faiss(faiss) -> None:
+    """Size FAISS's OpenMP pool to threads('faiss')"""
+    faiss_threads = threads('faiss')
+    if faiss_threads:
+        faiss.omp_set_num_threads(faiss_threads)
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -81,14 +82,69 @@ WSGI_APPLICATION = 'item_api.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_ENGINE selects sqlite (default) or postgresql; both are configured from the environment.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'item_api'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Seconds a connection is reused across requests (0 closes it after each request)
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # psycopg's connection pool (needs psycopg[pool]) replaces persistent connections
+    if os.getenv('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a writer waits for the database lock before "database is locked"
+                'timeout': float(os.getenv('DB_SQLITE_TIMEOUT', '20')),
+                # Take the write lock when a transaction starts, so concurrent writers queue on the
+                # busy timeout instead of failing when a read transaction tries to upgrade
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets readers run alongside the writer; NORMAL syncs at checkpoints, not every commit
+                'init_command': os.getenv('DB_SQLITE_INIT_COMMAND',
+                                          'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE '{DB_ENGINE}', expected 'sqlite' or 'postgresql'")
+
 
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache with
+# CACHE_LOCATION=/path/to/dir shares cached responses between worker processes on one host.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'item-api'),
     }
 }
 
+# Seconds a cached read-endpoint response is kept; any write to its tables bypasses it sooner
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,9 +187,96 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST framework: orjson for JSON bodies (item_api/renderers.py, item_api/parsers.py)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'item_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'item_api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# CPU threads per native library in each worker process (see item_api/resources.py). -1 divides the
+# cores available to the process by WEB_CONCURRENCY workers, 0 leaves every library at its default;
+# the <LIBRARY>_THREADS settings (0: use the budget) override it per library
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+CPU_THREAD_BUDGET = int(os.getenv('CPU_THREAD_BUDGET', '-1'))
+WHISPER_THREADS = int(os.getenv('WHISPER_THREADS', '0'))
+FAISS_THREADS = int(os.getenv('FAISS_THREADS', '0'))
+TORCH_THREADS = int(os.getenv('TORCH_THREADS', '0'))
+TIKTOKEN_THREADS = int(os.getenv('TIKTOKEN_THREADS', '0'))
+BLAS_THREADS = int(os.getenv('BLAS_THREADS', '0'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Item search (items/search.py): ?limit= is capped at ITEM_PAGE_MAX_LIMIT; fuzzy matches need at least
+# ITEM_FUZZY_THRESHOLD trigram similarity and are chosen from the ITEM_FUZZY_CANDIDATES best index hits
+ITEM_PAGE_MAX_LIMIT = int(os.getenv('ITEM_PAGE_MAX_LIMIT', '500'))
+ITEM_FUZZY_THRESHOLD = float(os.getenv('ITEM_FUZZY_THRESHOLD', '0.3'))
+ITEM_FUZZY_CANDIDATES = int(os.getenv('ITEM_FUZZY_CANDIDATES', '200'))
+
+# Speech-to-text settings (faster-whisper, loaded on first transcription; see items/transcription.py)
+WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'base')
+WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'int8')
+# Uploads longer than this are rejected before decoding
+WHISPER_MAX_AUDIO_SECONDS = float(os.getenv('WHISPER_MAX_AUDIO_SECONDS', '30'))
+# Trim silence with Silero VAD and decode only the detected speech
+WHISPER_VAD_FILTER = os.getenv('WHISPER_VAD_FILTER', '1') == '1'
+WHISPER_VAD_MIN_SILENCE_MS = int(os.getenv('WHISPER_VAD_MIN_SILENCE_MS', '500'))
+# Speech up to this many seconds is decoded greedily, longer speech with WHISPER_BEAM_SIZE beams
+WHISPER_GREEDY_MAX_SECONDS = float(os.getenv('WHISPER_GREEDY_MAX_SECONDS', '5'))
+WHISPER_BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', '5'))
+# Concurrent clips are decoded together in batches of up to WHISPER_BATCH_SIZE (1 disables batching),
+# collected for WHISPER_BATCH_WINDOW_MS, on WHISPER_BATCH_WORKERS threads (see items/scheduler.py)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '8'))
+WHISPER_BATCH_WINDOW_MS = float(os.getenv('WHISPER_BATCH_WINDOW_MS', '10'))
+WHISPER_BATCH_WORKERS = int(os.getenv('WHISPER_BATCH_WORKERS', '1'))
+# Streaming voice entry (items/streaming.py): transcribe the last WHISPER_STREAM_WINDOW_SECONDS every
+# WHISPER_STREAM_STEP_MS of new audio; this much trailing silence ends a command
+WHISPER_STREAM_WINDOW_SECONDS = float(os.getenv('WHISPER_STREAM_WINDOW_SECONDS', '10'))
+WHISPER_STREAM_STEP_MS = int(os.getenv('WHISPER_STREAM_STEP_MS', '500'))
+WHISPER_STREAM_END_SILENCE_MS = int(os.getenv('WHISPER_STREAM_END_SILENCE_MS', '400'))
+# Prime the decoder with this many recent item names plus the group choices (0 disables)
+WHISPER_PROMPT_ITEMS = int(os.getenv('WHISPER_PROMPT_ITEMS', '50'))
+
+# Underwriting settings
+UNDERWRITING_BULK_BATCH_SIZE = int(os.getenv('UNDERWRITING_BULK_BATCH_SIZE', '500'))
+UNDERWRITING_INDEX_DIR = Path(os.getenv('UNDERWRITING_INDEX_DIR', BASE_DIR / 'faiss_index'))
+# Vector storage layout: flat, flat_ip, fp16, sq8 or pq (see underwriting/vector_index.py)
+UNDERWRITING_INDEX_TYPE = os.getenv('UNDERWRITING_INDEX_TYPE', 'flat')
+UNDERWRITING_PQ_SUBQUANTIZERS = int(os.getenv('UNDERWRITING_PQ_SUBQUANTIZERS', '96'))
+# Chunks collected before a trained layout (sq8, pq) is trained and starts serving searches
+UNDERWRITING_INDEX_TRAINING_SIZE = int(os.getenv('UNDERWRITING_INDEX_TRAINING_SIZE', '10000'))
+# Stale chunks of re-indexed documents are compacted out of the index once they exceed this fraction of all chunks
+UNDERWRITING_INDEX_COMPACT_RATIO = float(os.getenv('UNDERWRITING_INDEX_COMPACT_RATIO', '0.25'))
+# Retrieval results kept in the LRU cache (0 disables); entries are invalidated by any index change
+UNDERWRITING_RETRIEVAL_CACHE_SIZE = int(os.getenv('UNDERWRITING_RETRIEVAL_CACHE_SIZE', '1024'))
+# Seconds a processed application is replayed for a repeated Idempotency-Key (or identical request body)
+UNDERWRITING_IDEMPOTENCY_WINDOW = int(os.getenv('UNDERWRITING_IDEMPOTENCY_WINDOW', '86400'))
+# LLM used by the workflow: "groq" (ChatGroq) or "stub" (deterministic, offline; see underwriting/llm.py)
+UNDERWRITING_LLM_BACKEND = os.getenv('UNDERWRITING_LLM_BACKEND', 'groq')
+UNDERWRITING_LLM_MODEL = os.getenv('UNDERWRITING_LLM_MODEL', 'llama-3.1-8b-instant')
+# Provider endpoint override, e.g. a proxy or a local stub server (empty: the provider's default)
+UNDERWRITING_LLM_BASE_URL = os.getenv('UNDERWRITING_LLM_BASE_URL', '')
+# LLM gateway (see underwriting/llm.py): calls per second and burst (rate 0 disables the token bucket),
+# upper bound of the adaptive concurrency limit, answer time above which the limit is reduced (0: only
+# 429s reduce it), retries with their base backoff in seconds, and seconds a call may take in total
+UNDERWRITING_LLM_RATE = float(os.getenv('UNDERWRITING_LLM_RATE', '0'))
+UNDERWRITING_LLM_BURST = float(os.getenv('UNDERWRITING_LLM_BURST', '5'))
+UNDERWRITING_LLM_MAX_CONCURRENCY = int(os.getenv('UNDERWRITING_LLM_MAX_CONCURRENCY', '16'))
+UNDERWRITING_LLM_LATENCY_TARGET = float(os.getenv('UNDERWRITING_LLM_LATENCY_TARGET', '0'))
+UNDERWRITING_LLM_MAX_RETRIES = int(os.getenv('UNDERWRITING_LLM_MAX_RETRIES', '3'))
+UNDERWRITING_LLM_BACKOFF = float(os.getenv('UNDERWRITING_LLM_BACKOFF', '0.5'))
+UNDERWRITING_LLM_DEADLINE = float(os.getenv('UNDERWRITING_LLM_DEADLINE', '60'))
+# Seconds the stub LLM sleeps per call
+UNDERWRITING_STUB_LLM_LATENCY = float(os.getenv('UNDERWRITING_STUB_LLM_LATENCY', '0'))
@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from item_api import resources
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'item_api.settings')
 
+# Size the libraries' thread pools for this worker before Django setup imports numpy
+resources.configure()
+
 application = get_wsgi_application()
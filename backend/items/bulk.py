@@ -0,0 +1,74 @@
+"""
+Batch writes for items that respect the unique_name_per_group constraint.
+
+Uniqueness is checked for the whole batch with one query instead of per item, and rows that
+would collide with an existing item (or with an earlier row of the same batch) are reported as
+conflicts instead of failing the batch. Callers run these inside a transaction.
+"""
+from typing import Dict, List, Tuple
+
+from django.utils import timezone
+
+from .models import Item, fold_name
+from .serializers import ItemSerializer
+
+CONFLICT_ERROR = 'An item with this name already exists in this group'
+
+
+class ItemFieldsSerializer(ItemSerializer):
+    """Field validation only; the batch functions below check uniqueness for all rows at once"""
+
+    class Meta(ItemSerializer.Meta):
+        validators = []
+
+
+def _existing_keys(keys, exclude_ids=()):
+    names = {name for name, _ in keys}
+    if not names:
+        return set()
+    return set(Item.objects.filter(name__in=names).exclude(pk__in=exclude_ids).values_list('name', 'group'))
+
+
+def create_items(records: List[Dict]) -> Tuple[List[Item], List[int]]:
+    """bulk_create validated {'name', 'group'} records; returns (created items, positions that conflicted)"""
+    keys = [(record['name'], record['group']) for record in records]
+    taken = _existing_keys(keys)
+    new, conflicts = [], []
+    for position, key in enumerate(keys):
+        if key in taken:
+            conflicts.append(position)
+        else:
+            taken.add(key)
+            new.append(Item(name=key[0], group=key[1]))
+    return Item.objects.bulk_create(new), conflicts
+
+
+def update_items(changes: List[Tuple[Item, Dict]]) -> Tuple[List[Item], List[int]]:
+    """bulk_update (item, validated partial fields) pairs; returns (updated items, positions that conflicted)"""
+    keys = [(attrs.get('name', item.name), attrs.get('group', item.group)) for item, attrs in changes]
+    outside = _existing_keys(keys, exclude_ids=[item.pk for item, _ in changes])
+    conflicts = set()
+    while True:
+        # A conflicting row keeps its current key, which may in turn block another row of the batch
+        taken = outside | {(item.name, item.group) for position, (item, _) in enumerate(changes) if position in conflicts}
+        found = set(conflicts)
+        for position, key in enumerate(keys):
+            if position not in conflicts:
+                if key in taken:
+                    found.add(position)
+                taken.add(key)
+        if found == conflicts:
+            break
+        conflicts = found
+
+    now = timezone.now()
+    updated = []
+    for position, ((item, _), key) in enumerate(zip(changes, keys)):
+        if position not in conflicts:
+            item.name, item.group = key
+            # bulk_update skips pre_save: name_lower is the search key, and the conditional list cache keys on updated_at
+            item.name_lower = fold_name(item.name)
+            item.updated_at = now
+            updated.append(item)
+    Item.objects.bulk_update(updated, ['name', 'name_lower', 'group', 'updated_at'])
+    return updated, sorted(conflicts)
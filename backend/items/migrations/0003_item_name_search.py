@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:54
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def create_name_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Contentless trigram index over ' ' || lower(name) || ' ', so word edges count as trigrams
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE items_item_trigram USING fts5(name, content='', tokenize='trigram')")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_insert AFTER INSERT ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(rowid, name) VALUES (new.id, ' ' || lower(new.name) || ' '); END")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_delete AFTER DELETE ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(items_item_trigram, rowid, name) "
+            "VALUES ('delete', old.id, ' ' || lower(old.name) || ' '); END")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_update AFTER UPDATE OF name ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(items_item_trigram, rowid, name) "
+            "VALUES ('delete', old.id, ' ' || lower(old.name) || ' '); "
+            "INSERT INTO items_item_trigram(rowid, name) VALUES (new.id, ' ' || lower(new.name) || ' '); END")
+        schema_editor.execute(
+            "INSERT INTO items_item_trigram(rowid, name) SELECT id, ' ' || lower(name) || ' ' FROM items_item")
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX items_item_name_trgm ON items_item USING gin (lower(name) gin_trgm_ops)")
+        # LIKE 'prefix%' can only use a btree with pattern ops under non-C collations
+        schema_editor.execute(
+            "CREATE INDEX items_item_name_pattern ON items_item (lower(name) text_pattern_ops)")
+
+
+def drop_name_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS items_item_trigram_{trigger}")
+        schema_editor.execute("DROP TABLE IF EXISTS items_item_trigram")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS items_item_name_trgm")
+        schema_editor.execute("DROP INDEX IF EXISTS items_item_name_pattern")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_item_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='group',
+            field=models.CharField(choices=[('Primary', 'Primary'), ('Secondary', 'Secondary')], db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='item_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(models.F('group'), django.db.models.functions.text.Lower('name'), name='item_group_name_lower_idx'),
+        ),
+        migrations.RunPython(create_name_indexes, drop_name_indexes),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:57
+
+from importlib import import_module
+import items.models
+from django.db import migrations, models
+
+name_search = import_module('items.migrations.0003_item_name_search')
+
+
+def backfill_name_lower(apps, schema_editor):
+    Item = apps.get_model('items', 'Item')
+    items = list(Item.objects.using(schema_editor.connection.alias).only('id', 'name'))
+    for item in items:
+        item.name_lower = item.name.casefold()
+    Item.objects.using(schema_editor.connection.alias).bulk_update(items, ['name_lower'], batch_size=1000)
+
+
+def create_name_indexes(apps, schema_editor):
+    """Rebuild the 0003 search indexes over the casefolded name_lower column instead of lower(name)"""
+    name_search.drop_name_indexes(apps, schema_editor)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE items_item_trigram USING fts5(name, content='', tokenize='trigram')")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_insert AFTER INSERT ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(rowid, name) VALUES (new.id, ' ' || new.name_lower || ' '); END")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_delete AFTER DELETE ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(items_item_trigram, rowid, name) "
+            "VALUES ('delete', old.id, ' ' || old.name_lower || ' '); END")
+        schema_editor.execute(
+            "CREATE TRIGGER items_item_trigram_update AFTER UPDATE OF name_lower ON items_item BEGIN "
+            "INSERT INTO items_item_trigram(items_item_trigram, rowid, name) "
+            "VALUES ('delete', old.id, ' ' || old.name_lower || ' '); "
+            "INSERT INTO items_item_trigram(rowid, name) VALUES (new.id, ' ' || new.name_lower || ' '); END")
+        schema_editor.execute(
+            "INSERT INTO items_item_trigram(rowid, name) SELECT id, ' ' || name_lower || ' ' FROM items_item")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX items_item_name_trgm ON items_item USING gin (name_lower gin_trgm_ops)")
+        schema_editor.execute(
+            "CREATE INDEX items_item_name_pattern ON items_item (name_lower varchar_pattern_ops)")
+
+
+def restore_name_indexes(apps, schema_editor):
+    name_search.drop_name_indexes(apps, schema_editor)
+    name_search.create_name_indexes(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_name_search'),
+    ]
+
+    # SQLite adds name_lower by rebuilding items_item, which drops the 0003 trigram triggers;
+    # create_name_indexes recreates them (over name_lower) once the column is filled
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_name_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_group_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='name_lower',
+            field=items.models.FoldedNameField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['name_lower'], name='item_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['group', 'name_lower'], name='item_group_name_lower_idx'),
+        ),
+        migrations.RunPython(backfill_name_lower, migrations.RunPython.noop),
+        migrations.RunPython(create_name_indexes, restore_name_indexes),
+    ]
@@ -1,6 +1,21 @@
 from django.db import models
 from django.db.models import UniqueConstraint
 
+
+def fold_name(name: str) -> str:
+    """Case-insensitive form of an item name; unlike SQLite's lower(), this folds non-ASCII letters too"""
+    return name.casefold()
+
+
+class FoldedNameField(models.CharField):
+    """fold_name(name), recomputed whenever the row is saved or bulk-created (bulk_update must set it)"""
+
+    def pre_save(self, model_instance, add):
+        value = fold_name(model_instance.name)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Item(models.Model):
     GROUP_CHOICES = [
         ('Primary', 'Primary'),
@@ -8,14 +23,21 @@ class Item(models.Model):
     ]
     
     name = models.CharField(max_length=100)
-    group = models.CharField(max_length=50, choices=GROUP_CHOICES)
+    # Search key for prefix and fuzzy name lookups; casefolding can lengthen a name up to threefold
+    name_lower = FoldedNameField(max_length=300, editable=False, default='')
+    group = models.CharField(max_length=50, choices=GROUP_CHOICES, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         constraints = [
             UniqueConstraint(fields=['name', 'group'], name='unique_name_per_group')
         ]
+        indexes = [
+            # Case-insensitive prefix search (items/search.py)
+            models.Index(fields=['name_lower'], name='item_name_lower_idx'),
+            models.Index(fields=['group', 'name_lower'], name='item_group_name_lower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.group})"
@@ -0,0 +1,125 @@
+"""
+Micro-batching scheduler for Whisper transcription.
+
+Concurrent speech_to_text requests would otherwise each run their own CTranslate2 decode and
+compete for the same cores. Instead, clips are queued and a collector thread groups whatever
+arrives within WHISPER_BATCH_WINDOW_MS (up to WHISPER_BATCH_SIZE clips, split by decoding
+options) into one batched decode on a pool of WHISPER_BATCH_WORKERS threads. While every worker
+is busy the collector waits, so under load clips accumulate and batches grow on their own.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+
+from item_api import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge('transcription_queue_depth', 'Clips waiting for a transcription batch')
+BATCH_SIZE = metrics.histogram('transcription_batch_size', 'Clips decoded together in one batch',
+                               buckets=(1, 2, 4, 8, 16, 32))
+QUEUE_SECONDS = metrics.histogram('transcription_queue_seconds', 'Time a clip waits before its batch starts')
+BATCH_SECONDS = metrics.histogram('transcription_batch_seconds', 'Wall time of one batched decode')
+
+_Clip = namedtuple('_Clip', 'audio beam_size prompt future queued_at')
+
+
+class TranscriptionScheduler:
+    """Queue clips and decode them in batches with transcribe_batch(clips, beam_size, prompt) -> texts"""
+
+    def __init__(self, transcribe_batch, window: float = 0.01, max_batch_size: int = 8, workers: int = 1):
+        self.transcribe_batch = transcribe_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(workers)
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='transcription')
+        self._collector = threading.Thread(target=self._collect, name='transcription-scheduler', daemon=True)
+        self._collector.start()
+
+    def submit(self, audio, beam_size: int = 1, prompt: str = None) -> Future:
+        """Queue a clip; the future resolves to its transcript"""
+        future = Future()
+        QUEUE_DEPTH.inc()
+        self._queue.put(_Clip(audio, beam_size, prompt, future, time.perf_counter()))
+        return future
+
+    def transcribe(self, audio, beam_size: int = 1, prompt: str = None) -> str:
+        return self.submit(audio, beam_size, prompt).result()
+
+    def close(self) -> None:
+        """Finish queued clips and stop the collector and workers"""
+        self._queue.put(None)
+        self._collector.join()
+        self._pool.shutdown()
+
+    def _collect(self):
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            # Hold the first clip until a worker is free; clips arriving meanwhile join its batch
+            self._slots.acquire()
+            batch = [clip]
+            deadline = time.perf_counter() + self.window
+            stop = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    clip = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if clip is None:
+                    stop = True
+                    break
+                batch.append(clip)
+            QUEUE_DEPTH.dec(len(batch))
+            self._pool.submit(self._run, batch)
+            if stop:
+                return
+
+    def _run(self, batch):
+        try:
+            groups = {}
+            for clip in batch:
+                groups.setdefault((clip.beam_size, clip.prompt), []).append(clip)
+            for (beam_size, prompt), clips in groups.items():
+                started = time.perf_counter()
+                for clip in clips:
+                    QUEUE_SECONDS.observe(started - clip.queued_at)
+                BATCH_SIZE.observe(len(clips))
+                try:
+                    with metrics.timer(BATCH_SECONDS):
+                        texts = self.transcribe_batch([clip.audio for clip in clips], beam_size=beam_size,
+                                                      prompt=prompt)
+                except Exception as e:
+                    logger.error("Batched transcription of %d clips failed: %s", len(clips), e, exc_info=True)
+                    for clip in clips:
+                        clip.future.set_exception(e)
+                else:
+                    for clip, text in zip(clips, texts):
+                        clip.future.set_result(text)
+        finally:
+            self._slots.release()
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> TranscriptionScheduler:
+    """Process-wide scheduler feeding transcription.transcribe_batch, started on first use"""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                from .transcription import transcribe_batch
+
+                _SCHEDULER = TranscriptionScheduler(
+                    transcribe_batch, window=settings.WHISPER_BATCH_WINDOW_MS / 1000,
+                    max_batch_size=settings.WHISPER_BATCH_SIZE, workers=settings.WHISPER_BATCH_WORKERS)
+    return _SCHEDULER
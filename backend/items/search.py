@@ -0,0 +1,98 @@
+"""
+Item name lookup: prefix autocomplete and typo-tolerant fuzzy matching.
+
+Both lookups compare Item.name_lower, the name casefolded in Python (models.fold_name), so a query
+is normalized exactly like the names it is matched against, accented letters included.
+
+Prefix search is a range scan on the name_lower index (a LIKE on a varchar_pattern_ops index under
+PostgreSQL). Fuzzy search ranks names by trigram similarity, as pg_trgm defines it: SQLite pulls
+candidates from the items_item_trigram FTS5 table and re-ranks them here, PostgreSQL filters and
+orders with pg_trgm directly. Both indexes are created by migrations 0003_item_name_search and
+0004_item_name_lower and maintained by the database on every write, so no worker has to rebuild
+anything. Other backends fall back to unindexed startswith/contains scans.
+"""
+from typing import List, Optional, Set
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Item, fold_name
+
+# Shorter queries have too few trigrams to be similar to anything, so fuzzy search uses prefix matches alone
+FUZZY_MIN_LENGTH = 3
+
+
+def _padded_trigrams(text: str) -> List[str]:
+    """Trigrams of ' ' + casefolded text + ' ' in order, as the trigram index stores them"""
+    padded = f' {" ".join(fold_name(text).split())} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def trigrams(text: str) -> Set[str]:
+    return set(_padded_trigrams(text))
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+def _match_expression(query: str) -> str:
+    """FTS5 query for names sharing a pair of adjacent trigrams (four characters) with query"""
+    quoted = ['"' + trigram.replace('"', '""') + '"' for trigram in _padded_trigrams(query)]
+    if len(quoted) < 2:
+        return ' AND '.join(quoted)
+    # A typo changes at most three consecutive trigrams, so most adjacent pairs survive it; requiring
+    # both of a pair leaves far fewer candidates to rank than matching any single trigram
+    return ' OR '.join(sorted({f'({a} AND {b})' for a, b in zip(quoted, quoted[1:])}))
+
+
+def prefix_search(queryset, prefix: str):
+    """Items of queryset whose name starts with prefix (case-insensitive), in name order"""
+    prefix = fold_name(prefix)
+    if connection.vendor == 'sqlite':
+        # A range keeps the scan on the index; SQLite's LIKE is case-insensitive, so it cannot use it
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        queryset = queryset.filter(name_lower__gte=prefix, name_lower__lt=upper)
+    else:
+        queryset = queryset.filter(name_lower__startswith=prefix)
+    return queryset.order_by('name_lower', 'pk')
+
+
+def fuzzy_search(query: str, group: Optional[str] = None) -> List[Item]:
+    """Prefix matches in name order, then items at least ITEM_FUZZY_THRESHOLD similar to query, most similar first
+
+    Prefix matches come first so that turning fuzzy matching on never hides what a plain search finds.
+    """
+    limit = settings.ITEM_FUZZY_CANDIDATES
+    queryset = Item.objects.filter(group=group) if group else Item.objects.all()
+    matches = list(prefix_search(queryset, query)[:limit])
+    if len(fold_name(query).strip()) < FUZZY_MIN_LENGTH:
+        return matches
+
+    query_trigrams = trigrams(query)
+    if connection.vendor == 'sqlite':
+        join, where, params = '', '', [_match_expression(query)]
+        if group:
+            join, where = ' JOIN items_item m ON m.id = t.rowid', ' AND m."group" = %s'
+            params.append(group)
+        sql = (f'SELECT t.rowid FROM items_item_trigram t{join} '
+               f'WHERE items_item_trigram MATCH %s{where} ORDER BY t.rank LIMIT %s')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            candidates = Item.objects.in_bulk([row[0] for row in cursor.fetchall()]).values()
+    elif connection.vendor == 'postgresql':
+        where, params = '', [fold_name(query)]
+        if group:
+            where = ' AND "group" = %s'
+            params.append(group)
+        candidates = Item.objects.raw(
+            f'SELECT * FROM items_item WHERE name_lower %% %s{where} '
+            f'ORDER BY similarity(name_lower, %s) DESC LIMIT %s', [*params, fold_name(query), limit])
+    else:
+        candidates = queryset.filter(name_lower__contains=fold_name(query).strip())[:limit]
+
+    seen = {item.pk for item in matches}
+    scored = [(similarity(query_trigrams, trigrams(item.name)), item) for item in candidates if item.pk not in seen]
+    scored.sort(key=lambda pair: (-pair[0], pair[1].name_lower, pair[1].pk))
+    return matches + [item for score, item in scored if score >= settings.ITEM_FUZZY_THRESHOLD]
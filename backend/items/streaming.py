@@ -0,0 +1,190 @@
+"""
+Streaming voice entry over a WebSocket (ASGI only; routed by item_api/asgi.py).
+
+The client sends binary frames of 16 kHz mono signed 16-bit little-endian PCM while the user
+speaks. Every WHISPER_STREAM_STEP_MS of new audio the last WHISPER_STREAM_WINDOW_SECONDS are
+transcribed (a decode still in flight absorbs the audio that arrives meanwhile) and the partial
+transcript is run through ItemViewSet.parse_speech_input. The item is created as soon as the
+parse is confident: unchanged across consecutive partials, or followed by
+WHISPER_STREAM_END_SILENCE_MS of silence. The buffer then resets, so one connection can dictate
+several items. A text frame {"type": "end"} flushes the remaining audio and closes the socket.
+
+Server messages are JSON objects with a "type":
+    ready     {"sample_rate": 16000, "encoding": "pcm_s16le"}
+    partial   {"transcription", "parsed_data"}
+    created   {"transcription", "parsed_data", "item"}
+    error     {"transcription", "parsed_data", "errors"} or {"error"}
+    final     {"transcription"}
+"""
+import asyncio
+import json
+import logging
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import transcription
+from .serializers import ItemSerializer
+from .views import ItemViewSet
+
+logger = logging.getLogger(__name__)
+
+# Identical parses in a row that count as confident without waiting for silence
+STABLE_PARTIALS = 2
+
+
+def _database(fn):
+    """Run fn in the thread that owns the database connection, like a request would"""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=True)
+
+
+@_database
+def _vocabulary_prompt():
+    return transcription.vocabulary_prompt()
+
+
+@_database
+def _create_item(parsed_data):
+    serializer = ItemSerializer(data=parsed_data)
+    if serializer.is_valid():
+        serializer.save()
+        return serializer.data, None
+    return None, serializer.errors
+
+
+def _parse(text):
+    return ItemViewSet().parse_speech_input(text) if text else None
+
+
+class SpeechStream:
+    """Rolling audio window of one connection and the confidence state of its parse"""
+
+    def __init__(self, prompt=None):
+        self.prompt = prompt
+        self.window = np.zeros(0, dtype=np.float32)
+        self.pending = 0  # samples received since the last decode started
+        self.last_parse = None
+        self.repeats = 0
+
+    def add(self, frame: bytes) -> None:
+        if len(frame) % 2:
+            raise ValueError('Audio frames must be 16-bit PCM')
+        samples = np.frombuffer(frame, dtype='<i2').astype(np.float32) / 32768
+        limit = int(settings.WHISPER_STREAM_WINDOW_SECONDS * transcription.SAMPLE_RATE)
+        self.window = np.concatenate((self.window, samples))[-limit:]
+        self.pending += len(samples)
+
+    @property
+    def due(self) -> bool:
+        return self.pending >= settings.WHISPER_STREAM_STEP_MS * transcription.SAMPLE_RATE / 1000
+
+    def transcribe(self):
+        """Decode the current window: (text, seconds of silence after the last speech)"""
+        window, self.pending = self.window, 0
+        if settings.WHISPER_VAD_FILTER:
+            timestamps = transcription.speech_timestamps(window)
+            if not timestamps:
+                return '', len(window) / transcription.SAMPLE_RATE
+            trailing_silence = (len(window) - timestamps[-1]['end']) / transcription.SAMPLE_RATE
+            window = transcription.speech_audio(window, timestamps)
+        else:
+            trailing_silence = 0.0
+        return transcription.decode(window, self.prompt)[0], trailing_silence
+
+    def confident(self, parsed_data, trailing_silence: float) -> bool:
+        self.repeats = self.repeats + 1 if parsed_data and parsed_data == self.last_parse else 1
+        self.last_parse = parsed_data
+        return bool(parsed_data) and (self.repeats >= STABLE_PARTIALS
+                                      or trailing_silence * 1000 >= settings.WHISPER_STREAM_END_SILENCE_MS)
+
+    def reset(self) -> None:
+        self.window = self.window[:0]
+        self.pending = 0
+        self.last_parse = None
+        self.repeats = 0
+
+
+async def _send_json(send, message):
+    await send({'type': 'websocket.send', 'text': json.dumps(message)})
+
+
+async def _transcribe_and_create(stream, send, final=False):
+    text, trailing_silence = await asyncio.to_thread(stream.transcribe)
+    parsed_data = _parse(text)
+    if not (stream.confident(parsed_data, trailing_silence) or (final and parsed_data)):
+        await _send_json(send, {'type': 'final' if final else 'partial', 'transcription': text,
+                                'parsed_data': parsed_data})
+        return
+
+    item, errors = await _create_item(parsed_data)
+    stream.reset()
+    message = {'type': 'created', 'transcription': text, 'parsed_data': parsed_data, 'item': item}
+    if errors:
+        message = {'type': 'error', 'transcription': text, 'parsed_data': parsed_data, 'errors': errors}
+    await _send_json(send, message)
+    if final:
+        await _send_json(send, {'type': 'final', 'transcription': text})
+
+
+async def speech_socket(scope, receive, send):
+    """ASGI WebSocket application for /ws/items/speech/"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+    stream = SpeechStream(await _vocabulary_prompt())
+    await _send_json(send, {'type': 'ready', 'sample_rate': transcription.SAMPLE_RATE, 'encoding': 'pcm_s16le'})
+
+    incoming = asyncio.Queue()
+
+    async def read():
+        while True:
+            message = await receive()
+            await incoming.put(message)
+            if message['type'] == 'websocket.disconnect':
+                return
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            message = await incoming.get()
+            # Take everything that arrived during the last decode before deciding to decode again
+            messages = [message]
+            while not incoming.empty():
+                messages.append(incoming.get_nowait())
+
+            finish = False
+            for message in messages:
+                if message['type'] == 'websocket.disconnect':
+                    return
+                if message.get('bytes'):
+                    stream.add(message['bytes'])
+                elif message.get('text') and json.loads(message['text']).get('type') == 'end':
+                    finish = True
+
+            if finish:
+                if stream.pending or stream.last_parse:
+                    await _transcribe_and_create(stream, send, final=True)
+                else:
+                    await _send_json(send, {'type': 'final', 'transcription': ''})
+                await send({'type': 'websocket.close', 'code': 1000})
+                return
+            if stream.due:
+                await _transcribe_and_create(stream, send)
+    except ValueError as e:
+        await _send_json(send, {'type': 'error', 'error': str(e)})
+        await send({'type': 'websocket.close', 'code': 1003})
+    except Exception as e:
+        logger.error("Streaming transcription failed: %s", e, exc_info=True)
+        await _send_json(send, {'type': 'error', 'error': f'Error processing audio: {e}'})
+        await send({'type': 'websocket.close', 'code': 1011})
+    finally:
+        reader.cancel()
@@ -1,3 +1,456 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from item_api import metrics, resources
+from item_api.asgi import application
+from . import scheduler, transcription
+from .models import Item
+
+
+def wav_bytes(seconds, tone=False):
+    """16 kHz mono PCM: silence, or a 440 Hz tone"""
+    samples = np.zeros(int(seconds * transcription.SAMPLE_RATE), dtype=np.int16)
+    if tone:
+        samples = (np.sin(np.arange(len(samples)) * 2 * np.pi * 440 / transcription.SAMPLE_RATE) * 8000).astype(np.int16)
+    with tempfile.TemporaryFile() as f:
+        with wave.open(f, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(transcription.SAMPLE_RATE)
+            w.writeframes(samples.tobytes())
+        f.seek(0)
+        return f.read()
+
+
+class FakeWhisperModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio) / transcription.SAMPLE_RATE, options))
+        return iter([SimpleNamespace(text=' ' + self.text)]), None
+
+
+class ConditionalItemListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Item.objects.create(name='Apple', group='Primary')
+
+    def test_unchanged_list_returns_304(self):
+        response = self.client.get('/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get('/items/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_writes_change_the_etag_and_bypass_the_cache(self):
+        etag = self.client.get('/items/')['ETag']
+
+        item = Item.objects.create(name='Orange', group='Secondary')
+        response = self.client.get('/items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['name'] for i in response.json()], ['Apple', 'Orange'])
+
+        # Deleting the newest row leaves MAX(updated_at) where it was; the version must still move
+        etag = response['ETag']
+        item.delete()
+        response = self.client.get('/items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['name'] for i in response.json()], ['Apple'])
+
+    def test_cached_data_is_served_until_a_write(self):
+        self.client.get('/items/')
+        with self.assertNumQueries(2):  # only the version queries (count and last update)
+            self.assertEqual(self.client.get('/items/').status_code, 200)
+
+
+@override_settings(WHISPER_MAX_AUDIO_SECONDS=10, WHISPER_GREEDY_MAX_SECONDS=3, WHISPER_BEAM_SIZE=5,
+                   WHISPER_BATCH_SIZE=1)
+class SpeechToTextTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.model = FakeWhisperModel('banana primary')
+        patcher = mock.patch.object(transcription, '_MODEL', self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, audio):
+        upload = SimpleUploadedFile('command.wav', audio, content_type='audio/wav')
+        return self.client.post('/items/speech_to_text/', {'audio': upload}, format='multipart')
+
+    def test_silence_is_trimmed_without_decoding(self):
+        response = self.post(wav_bytes(4))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['transcription'], '')
+        self.assertEqual(self.model.calls, [])
+
+    @override_settings(WHISPER_VAD_FILTER=False)
+    def test_short_clips_decode_greedily_with_vocabulary_prompt(self):
+        Item.objects.create(name='Banana', group='Secondary')
+        response = self.post(wav_bytes(2, tone=True))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['parsed_data'], {'name': 'Banana', 'group': 'Primary'})
+
+        seconds, options = self.model.calls[0]
+        self.assertAlmostEqual(seconds, 2, places=2)
+        self.assertEqual(options['beam_size'], 1)
+        self.assertEqual(options['initial_prompt'], 'Banana, Primary, Secondary.')
+
+    @override_settings(WHISPER_VAD_FILTER=False)
+    def test_longer_speech_uses_beam_search(self):
+        self.post(wav_bytes(5, tone=True))
+        self.assertEqual(self.model.calls[0][1]['beam_size'], 5)
+
+    def test_audio_over_the_limit_is_rejected(self):
+        response = self.post(wav_bytes(11))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit is 10s', response.json()['error'])
+        self.assertEqual(self.model.calls, [])
+
+
+class TranscriptionSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def transcribe_batch(self, clips, beam_size, prompt):
+        self.batches.append((len(clips), beam_size))
+        self.release.wait(5)
+        return [f'{clip}/{beam_size}' for clip in clips]
+
+    def test_clips_queued_behind_a_busy_worker_share_a_batch(self):
+        batcher = scheduler.TranscriptionScheduler(self.transcribe_batch, window=0.001, max_batch_size=4, workers=1)
+        self.addCleanup(batcher.close)
+
+        first = batcher.submit('a')
+        while not self.batches:
+            time.sleep(0.001)
+        futures = [batcher.submit(name, beam_size=beam_size)
+                   for name, beam_size in (('b', 1), ('c', 5), ('d', 1), ('e', 1), ('f', 1))]
+        self.release.set()
+
+        self.assertEqual(first.result(5), 'a/1')
+        self.assertEqual([f.result(5) for f in futures], ['b/1', 'c/5', 'd/1', 'e/1', 'f/1'])
+        # b, c, d, e fill the next batch and split by beam size; f follows on its own
+        self.assertEqual(self.batches, [(1, 1), (3, 1), (1, 5), (1, 1)])
+        self.assertEqual(scheduler.QUEUE_DEPTH.value(), 0)
+
+    def test_failures_reach_every_clip_in_the_batch(self):
+        def fail(clips, beam_size, prompt):
+            raise RuntimeError('decoder crashed')
+
+        batcher = scheduler.TranscriptionScheduler(fail, window=0.01, workers=1)
+        self.addCleanup(batcher.close)
+        futures = [batcher.submit(n) for n in range(3)]
+        for future in futures:
+            with self.assertRaisesMessage(RuntimeError, 'decoder crashed'):
+                future.result(5)
+
+    def test_batched_segments_are_mapped_back_to_their_clips(self):
+        class FakePipeline:
+            def transcribe(self, audio, clip_timestamps, **options):
+                self.clip_timestamps = clip_timestamps
+                # No speech found in the second clip; the third yields two segments
+                return iter([SimpleNamespace(start=0.0, text=' apple primary'),
+                             SimpleNamespace(start=round(clip_timestamps[2]['start'], 3), text=' orange'),
+                             SimpleNamespace(start=round(clip_timestamps[2]['start'], 3), text=' secondary')]), None
+
+        pipeline = FakePipeline()
+        clips = [np.zeros(n, dtype=np.float32) for n in (16000, 8001, 24000)]
+        with mock.patch.object(transcription, '_PIPELINE', pipeline):
+            texts = transcription.transcribe_batch(clips)
+        self.assertEqual(texts, ['apple primary', '', 'orange secondary'])
+        self.assertEqual([c['start'] for c in pipeline.clip_timestamps], [0.0, 1.0, 24001 / 16000])
+
+    def test_scheduler_metrics_do_not_depend_on_the_underwriting_app(self):
+        self.assertIs(metrics.REGISTRY.register(scheduler.QUEUE_DEPTH), scheduler.QUEUE_DEPTH)
+        script = ("import sys, django; django.setup(); import items.scheduler; "
+                  "print('underwriting.metrics' in sys.modules)")
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='item_api.settings')
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), 'False')
+
+
+def pcm_frame(seconds):
+    return (np.ones(int(seconds * transcription.SAMPLE_RATE)) * 1000).astype('<i2').tobytes()
+
+
+@override_settings(WHISPER_BATCH_SIZE=1, WHISPER_STREAM_STEP_MS=500, WHISPER_STREAM_END_SILENCE_MS=400)
+class StreamingSpeechTests(TransactionTestCase):
+    def setUp(self):
+        self.model = FakeWhisperModel('banana primary')
+        patcher = mock.patch.object(transcription, '_MODEL', self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self, path='/ws/items/speech/'):
+        communicator = ApplicationCommunicator(application, {'type': 'websocket', 'path': path})
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output(5))['type'], 'websocket.accept')
+        self.assertEqual(await self.receive_json(communicator), {'type': 'ready', 'sample_rate': 16000,
+                                                                 'encoding': 'pcm_s16le'})
+        return communicator
+
+    async def receive_json(self, communicator):
+        return json.loads((await communicator.receive_output(5))['text'])
+
+    @override_settings(WHISPER_VAD_FILTER=False)
+    async def test_item_is_created_once_the_parse_is_stable(self):
+        communicator = await self.connect()
+        await communicator.send_input({'type': 'websocket.receive', 'bytes': pcm_frame(0.5)})
+        partial = await self.receive_json(communicator)
+        self.assertEqual(partial['type'], 'partial')
+        self.assertEqual(partial['parsed_data'], {'name': 'Banana', 'group': 'Primary'})
+
+        await communicator.send_input({'type': 'websocket.receive', 'bytes': pcm_frame(0.5)})
+        created = await self.receive_json(communicator)
+        self.assertEqual(created['type'], 'created')
+        self.assertEqual(created['item']['name'], 'Banana')
+        self.assertTrue(await Item.objects.filter(name='Banana', group='Primary').aexists())
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': '{"type": "end"}'})
+        self.assertEqual(await self.receive_json(communicator), {'type': 'final', 'transcription': ''})
+        self.assertEqual(await communicator.receive_output(5), {'type': 'websocket.close', 'code': 1000})
+
+    async def test_trailing_silence_ends_the_command(self):
+        def speech_then_silence(audio):
+            return [{'start': 0, 'end': len(audio) - 8000}]  # last 0.5 s silent
+
+        communicator = await self.connect()
+        with mock.patch.object(transcription, 'speech_timestamps', speech_then_silence):
+            await communicator.send_input({'type': 'websocket.receive', 'bytes': pcm_frame(1)})
+            created = await self.receive_json(communicator)
+        self.assertEqual(created['type'], 'created')
+        self.assertAlmostEqual(self.model.calls[0][0], 0.5, places=2)
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(5)
+
+    async def test_malformed_audio_closes_the_socket(self):
+        communicator = await self.connect()
+        await communicator.send_input({'type': 'websocket.receive', 'bytes': b'\x00\x01\x02'})
+        self.assertEqual((await self.receive_json(communicator))['type'], 'error')
+        self.assertEqual(await communicator.receive_output(5), {'type': 'websocket.close', 'code': 1003})
+
+    async def test_unknown_paths_are_rejected(self):
+        communicator = ApplicationCommunicator(application, {'type': 'websocket', 'path': '/ws/unknown/'})
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(5), {'type': 'websocket.close', 'code': 1000})
+
+
+class BulkItemTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.apple = Item.objects.create(name='Apple', group='Primary')
+        self.orange = Item.objects.create(name='Orange', group='Secondary')
+
+    def test_parse_speech_commands(self):
+        from .views import ItemViewSet
+
+        parse = ItemViewSet().parse_speech_commands
+        self.assertEqual(parse('Apple primary, orange secondary and banana primary.'), [
+            {'name': 'Apple', 'group': 'Primary'},
+            {'name': 'Orange', 'group': 'Secondary'},
+            {'name': 'Banana', 'group': 'Primary'},
+        ])
+        self.assertEqual(parse('add green apple to primary group and kiwi to secondary group'), [
+            {'name': 'Green Apple', 'group': 'Primary'},
+            {'name': 'Kiwi', 'group': 'Secondary'},
+        ])
+        self.assertEqual(parse('salt and pepper secondary'), [{'name': 'Salt And Pepper', 'group': 'Secondary'}])
+        self.assertEqual(parse('hello there'), [])
+
+    def test_bulk_applies_changes_and_reports_conflicts(self):
+        etag = self.client.get('/items/')['ETag']
+        # Constant in the batch size: validation, savepoint, delete (3), update (2), create (2)
+        with self.assertNumQueries(10):
+            response = self.client.post('/items/bulk/', {
+                'delete': [self.orange.id],
+                'update': [{'id': self.apple.id, 'group': 'Secondary'}],
+                'create': [{'name': 'Orange', 'group': 'Secondary'}, {'name': 'Pear', 'group': 'Primary'},
+                           {'name': 'Apple', 'group': 'Secondary'}, {'name': 'Pear', 'group': 'Primary'}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['deleted'], [self.orange.id])
+        self.assertEqual([(i['name'], i['group']) for i in body['updated']], [('Apple', 'Secondary')])
+        self.assertEqual([(i['name'], i['group']) for i in body['created']], [('Orange', 'Secondary'), ('Pear', 'Primary')])
+        self.assertEqual([(c['operation'], c['index']) for c in body['conflicts']], [('create', 2), ('create', 3)])
+        self.assertEqual(Item.objects.count(), 3)
+        self.assertEqual(self.client.get('/items/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_update_conflicts_cascade_to_keys_still_in_use(self):
+        banana = Item.objects.create(name='Banana', group='Primary')
+        response = self.client.post('/items/bulk/', {'update': [
+            {'id': self.apple.id, 'name': 'Orange', 'group': 'Secondary'},  # taken by Orange
+            {'id': banana.id, 'name': 'Apple'},  # Apple keeps its name since its own update failed
+        ]}, format='json')
+        self.assertEqual([c['index'] for c in response.json()['conflicts']], [0, 1])
+        self.assertEqual(set(Item.objects.values_list('name', flat=True)), {'Apple', 'Orange', 'Banana'})
+
+    def test_invalid_rows_reject_the_whole_batch(self):
+        response = self.client.post('/items/bulk/', {
+            'delete': [self.apple.id],
+            'create': [{'name': 'Kiwi', 'group': 'Tertiary'}],
+            'update': [{'id': 999999, 'name': 'Ghost'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'create', 'update'})
+        self.assertTrue(Item.objects.filter(pk=self.apple.pk).exists())
+
+    @override_settings(WHISPER_BATCH_SIZE=1, WHISPER_VAD_FILTER=False)
+    def test_speech_with_several_commands_creates_them_together(self):
+        model = FakeWhisperModel('Apple primary, kiwi secondary and banana primary.')
+        with mock.patch.object(transcription, '_MODEL', model):
+            upload = SimpleUploadedFile('command.wav', wav_bytes(2, tone=True), content_type='audio/wav')
+            response = self.client.post('/items/speech_to_text/', {'audio': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([i['name'] for i in body['items']], ['Kiwi', 'Banana'])
+        self.assertEqual(body['conflicts'], [{'name': 'Apple', 'group': 'Primary', 'error': 'An item with this name already exists in this group'}])
+
+
+class ItemSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for name, group in [('Apple', 'Primary'), ('Apricot', 'Secondary'), ('Green Apple', 'Primary'),
+                            ('Banana', 'Primary'), ('Pineapple', 'Secondary'), ('apple juice', 'Secondary')]:
+            Item.objects.create(name=name, group=group)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [item['name'] for item in data]
+
+    def test_group_filter(self):
+        self.assertEqual(sorted(self.names(self.client.get('/items/?group=Secondary'))), ['Apricot', 'Pineapple', 'apple juice'])
+
+    def test_prefix_search_is_case_insensitive_and_ordered(self):
+        self.assertEqual(self.names(self.client.get('/items/?q=ap')), ['Apple', 'apple juice', 'Apricot'])
+        self.assertEqual(self.names(self.client.get('/items/?q=APP&group=Primary')), ['Apple'])
+        self.assertEqual(self.names(self.client.get('/items/?q=%25')), [])
+
+    def test_prefix_and_fuzzy_search_fold_non_ascii_case(self):
+        Item.objects.create(name='Éclair', group='Primary')
+        Item.objects.create(name='Straße', group='Secondary')
+        for query in ('é', 'É', 'écl', 'ÉCLAIR'):
+            self.assertEqual(self.names(self.client.get('/items/', {'q': query})), ['Éclair'])
+        self.assertEqual(self.names(self.client.get('/items/', {'q': 'STRASSE'})), ['Straße'])
+        self.assertEqual(self.names(self.client.get('/items/', {'q': 'ÉCLAIRE', 'fuzzy': '1'})), ['Éclair'])
+        # Bulk updates bypass pre_save, so they must keep the search key current themselves
+        eclair = Item.objects.get(name='Éclair')
+        response = self.client.post('/items/bulk/', {'update': [{'id': eclair.pk, 'name': 'Ölkuchen'}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(self.client.get('/items/', {'q': 'öl'})), ['Ölkuchen'])
+        self.assertEqual(self.names(self.client.get('/items/', {'q': 'ÖLKUCHN', 'fuzzy': '1'})), ['Ölkuchen'])
+        self.assertEqual(self.names(self.client.get('/items/', {'q': 'é'})), [])
+
+    def test_fuzzy_search_tolerates_typos(self):
+        self.assertEqual(self.names(self.client.get('/items/?q=aple&fuzzy=1'))[0], 'Apple')
+        self.assertEqual(self.names(self.client.get('/items/?q=banan&fuzzy=1')), ['Banana'])
+        self.assertEqual(self.names(self.client.get('/items/?q=pinaple&fuzzy=1&group=Secondary')), ['Pineapple'])
+        self.assertEqual(self.names(self.client.get('/items/?q=zzz&fuzzy=1')), [])
+
+    def test_fuzzy_search_keeps_prefix_matches_while_typing(self):
+        self.assertEqual(self.names(self.client.get('/items/?q=a&fuzzy=1')), ['Apple', 'apple juice', 'Apricot'])
+        self.assertEqual(self.names(self.client.get('/items/?q=ap&fuzzy=1&group=Secondary')), ['apple juice', 'Apricot'])
+        # Prefix matches first, then names that are merely similar
+        self.assertEqual(self.names(self.client.get('/items/?q=apple&fuzzy=1'))[:3], ['Apple', 'apple juice', 'Green Apple'])
+        for query in ('a', 'ap', 'apl', 'app', 'appl', 'apri'):
+            plain = self.names(self.client.get('/items/', {'q': query}))
+            fuzzy = self.names(self.client.get('/items/', {'q': query, 'fuzzy': '1'}))
+            self.assertEqual(fuzzy[:len(plain)], plain)
+
+    def test_trigram_index_follows_renames_and_deletes(self):
+        banana = Item.objects.get(name='Banana')
+        banana.name = 'Mango'
+        banana.save()
+        Item.objects.get(name='Apricot').delete()
+        self.assertEqual(self.names(self.client.get('/items/?q=banana&fuzzy=1')), [])
+        self.assertEqual(self.names(self.client.get('/items/?q=mangoo&fuzzy=1')), ['Mango'])
+        self.assertEqual(self.names(self.client.get('/items/?q=apricot&fuzzy=1')), [])
+
+    def test_rows_render_like_the_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import ItemSerializer
+
+        expected = JSONRenderer().render(ItemSerializer(Item.objects.order_by('pk'), many=True).data)
+        self.assertEqual(self.client.get('/items/').content, expected)
+        apple = self.client.get('/items/?q=aple&fuzzy=1').json()[0]
+        self.assertEqual(apple, ItemSerializer(Item.objects.get(name='Apple')).data)
+
+    @override_settings(ITEM_PAGE_MAX_LIMIT=2)
+    def test_pagination_is_opt_in(self):
+        self.assertEqual(len(self.client.get('/items/').data), 6)
+        response = self.client.get('/items/?q=a&limit=10')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([item['name'] for item in response.data['results']], ['Apple', 'apple juice'])
+        self.assertIsNotNone(response.data['next'])
+
+
+class CPUThreadBudgetTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(resources, 'available_cpus', return_value=8)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(WEB_CONCURRENCY=4, CPU_THREAD_BUDGET=-1, WHISPER_THREADS=0, FAISS_THREADS=3)
+    def test_budget_divides_cores_between_workers(self):
+        self.assertEqual(resources.thread_budget(), 2)
+        self.assertEqual(resources.threads('whisper'), 2)
+        self.assertEqual(resources.threads('faiss'), 3)
+        with override_settings(CPU_THREAD_BUDGET=0):
+            self.assertIsNone(resources.threads('whisper'))
+        with override_settings(WEB_CONCURRENCY=16):
+            self.assertEqual(resources.thread_budget(), 1)
+
+    @override_settings(WEB_CONCURRENCY=2, CPU_THREAD_BUDGET=-1, FAISS_THREADS=0)
+    def test_loaded_libraries_are_limited(self):
+        import faiss
+
+        before = faiss.omp_get_max_threads()
+        self.addCleanup(faiss.omp_set_num_threads, before)
+        with mock.patch.dict('os.environ', {}, clear=True):
+            resources.configure()
+            self.assertEqual(os.environ['OMP_NUM_THREADS'], '4')
+        self.assertEqual(faiss.omp_get_max_threads(), 4)
+
+    def test_only_worker_entry_points_configure_the_process(self):
+        script = "import os, {module}; print(os.environ.get('OMP_NUM_THREADS'))"
+        env = {k: v for k, v in os.environ.items() if k not in ('OMP_NUM_THREADS', 'CPU_THREAD_BUDGET')}
+        env.update(DJANGO_SETTINGS_MODULE='item_api.settings', WEB_CONCURRENCY='1')
+        outputs = {}
+        for module in ('django; django.setup()', 'item_api.wsgi'):
+            outputs[module] = subprocess.run([sys.executable, '-c', script.format(module=module)], cwd=settings.BASE_DIR,
+                                             env=env, capture_output=True, text=True, check=True).stdout.strip()
+        self.assertEqual(outputs['django; django.setup()'], 'None')
+        self.assertNotEqual(outputs['item_api.wsgi'], 'None')
+
+    @override_settings(WEB_CONCURRENCY=2, CPU_THREAD_BUDGET=-1, WHISPER_THREADS=0, WHISPER_BATCH_WORKERS=2)
+    def test_whisper_workers_share_the_budget(self):
+        with mock.patch.object(transcription, '_MODEL', None), \
+                mock.patch('faster_whisper.WhisperModel') as whisper_model:
+            transcription.get_whisper_model()
+        self.assertEqual(whisper_model.call_args.kwargs['cpu_threads'], 2)
+        self.assertEqual(whisper_model.call_args.kwargs['num_workers'], 2)
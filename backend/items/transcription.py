@@ -0,0 +1,176 @@
+"""
+Speech-to-text for voice commands.
+
+faster-whisper (and ctranslate2 and onnxruntime behind it) is only imported, and the model only
+loaded, by the first transcription, so workers boot without it and every later request reuses
+the same model instead of loading one per call.
+
+Commands are a second or two of speech ("apple primary"), often inside several seconds of
+silence, so transcribe() trims silence with Silero VAD before decoding, decodes short speech
+greedily and rejects uploads longer than WHISPER_MAX_AUDIO_SECONDS. Decoding cost then follows
+the spoken content rather than the upload length. Clips that fit one Whisper window are decoded
+in batches with other requests' clips by items.scheduler.
+"""
+import logging
+import threading
+from bisect import bisect_right
+from typing import List
+
+import numpy as np
+from django.conf import settings
+
+from item_api import resources
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Whisper decodes 30-second windows; longer speech cannot share a batch slot
+WINDOW_SECONDS = 30
+
+_MODEL = None
+_PIPELINE = None
+_MODEL_LOCK = threading.Lock()
+
+
+class AudioTooLongError(ValueError):
+    """Upload exceeds WHISPER_MAX_AUDIO_SECONDS"""
+
+
+def get_whisper_model():
+    """Process-wide WhisperModel, created on first use"""
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            # Re-check under the lock so concurrent first requests load one model
+            if _MODEL is None:
+                from faster_whisper import WhisperModel
+
+                # Scheduler workers decode in parallel, sharing the library's thread budget
+                workers = max(1, settings.WHISPER_BATCH_WORKERS)
+                budget = resources.threads('whisper')
+                cpu_threads = max(1, budget // workers) if budget else 0
+                _MODEL = WhisperModel(settings.WHISPER_MODEL_SIZE, device=settings.WHISPER_DEVICE,
+                                      compute_type=settings.WHISPER_COMPUTE_TYPE,
+                                      cpu_threads=cpu_threads, num_workers=workers)
+                logger.info("Loaded Whisper model %s (%s, %s, %s workers x %s threads)", settings.WHISPER_MODEL_SIZE,
+                            settings.WHISPER_DEVICE, settings.WHISPER_COMPUTE_TYPE, workers, cpu_threads or 'default')
+    return _MODEL
+
+
+def get_batched_pipeline():
+    """BatchedInferencePipeline over the shared model"""
+    global _PIPELINE
+    if _PIPELINE is None:
+        model = get_whisper_model()
+        with _MODEL_LOCK:
+            if _PIPELINE is None:
+                from faster_whisper import BatchedInferencePipeline
+
+                _PIPELINE = BatchedInferencePipeline(model)
+    return _PIPELINE
+
+
+def transcribe_batch(clips: List[np.ndarray], beam_size: int = 1, prompt: str = None, **options) -> List[str]:
+    """Decode clips of at most WINDOW_SECONDS together; returns their texts in order
+
+    options are passed on to BatchedInferencePipeline.transcribe.
+
+    The pipeline batches the clip_timestamps of a single audio, so the clips are laid end to end
+    and each one is marked as its own clip. Segments come back with their clip's start offset.
+    """
+    starts, offset = [], 0
+    for clip in clips:
+        starts.append(offset)
+        offset += len(clip)
+    segments, _ = get_batched_pipeline().transcribe(
+        np.concatenate(clips), language='en', beam_size=beam_size, initial_prompt=prompt or None,
+        clip_timestamps=[{'start': start / SAMPLE_RATE, 'end': (start + len(clip)) / SAMPLE_RATE}
+                         for start, clip in zip(starts, clips)],
+        batch_size=len(clips), without_timestamps=True, **options)
+
+    texts = [[] for _ in clips]
+    start_seconds = [start / SAMPLE_RATE for start in starts]
+    for segment in segments:
+        # Segment starts are rounded to milliseconds
+        texts[max(bisect_right(start_seconds, segment.start + 0.001) - 1, 0)].append(segment.text)
+    # Segment texts carry their own leading space
+    return [''.join(text).strip() for text in texts]
+
+
+def vocabulary_prompt() -> str:
+    """Recent item names and the group choices, so the decoder favours spelling them as stored"""
+    from .models import Item
+
+    if settings.WHISPER_PROMPT_ITEMS <= 0:
+        return ''
+    names = Item.objects.order_by('-updated_at').values_list('name', flat=True)[:settings.WHISPER_PROMPT_ITEMS]
+    groups = [label for _, label in Item.GROUP_CHOICES]
+    return ', '.join(dict.fromkeys([*names, *groups])) + '.'
+
+
+def _check_duration(seconds: float) -> None:
+    if seconds > settings.WHISPER_MAX_AUDIO_SECONDS:
+        raise AudioTooLongError(f'Audio is {seconds:.1f}s long; the limit is '
+                                f'{settings.WHISPER_MAX_AUDIO_SECONDS:g}s')
+
+
+def _declared_duration(path: str):
+    """Container duration in seconds without decoding, or None when the container omits it"""
+    import av
+
+    try:
+        with av.open(path, metadata_errors='ignore') as container:
+            return container.duration / 1_000_000 if container.duration else None
+    except av.error.FFmpegError:
+        return None
+
+
+def speech_timestamps(audio: np.ndarray) -> List[dict]:
+    """Sample ranges ({'start', 'end'}) that VAD classifies as speech"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    return get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=settings.WHISPER_VAD_MIN_SILENCE_MS))
+
+
+def speech_audio(audio: np.ndarray, timestamps: List[dict] = None) -> np.ndarray:
+    """audio with everything VAD classifies as silence removed"""
+    from faster_whisper.vad import collect_chunks
+
+    if timestamps is None:
+        timestamps = speech_timestamps(audio)
+    return np.concatenate(collect_chunks(audio, timestamps)[0])
+
+
+def decode(speech: np.ndarray, prompt: str = None):
+    """Transcribe speech (silence already removed): (text, beam size used)"""
+    speech_duration = len(speech) / SAMPLE_RATE
+    beam_size = 1 if speech_duration <= settings.WHISPER_GREEDY_MAX_SECONDS else settings.WHISPER_BEAM_SIZE
+    if settings.WHISPER_BATCH_SIZE > 1 and speech_duration <= WINDOW_SECONDS:
+        from .scheduler import get_scheduler
+
+        return get_scheduler().transcribe(speech, beam_size=beam_size, prompt=prompt), beam_size
+
+    segments, _ = get_whisper_model().transcribe(
+        speech, language='en', beam_size=beam_size, initial_prompt=prompt or None,
+        condition_on_previous_text=False, without_timestamps=True)
+    return ' '.join(segment.text for segment in segments).strip(), beam_size
+
+
+def transcribe(path: str, prompt: str = None) -> dict:
+    """Transcribe an audio file: {'text', 'duration', 'speech_duration', 'beam_size'}"""
+    from faster_whisper import decode_audio
+
+    declared = _declared_duration(path)
+    if declared is not None:
+        _check_duration(declared)
+    audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+    duration = len(audio) / SAMPLE_RATE
+    _check_duration(duration)
+
+    if settings.WHISPER_VAD_FILTER:
+        audio = speech_audio(audio)
+    result = {'text': '', 'duration': round(duration, 3), 'speech_duration': round(len(audio) / SAMPLE_RATE, 3),
+              'beam_size': 0}
+    if len(audio):
+        result['text'], result['beam_size'] = decode(audio, prompt)
+    return result
@@ -2,18 +2,57 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from faster_whisper import WhisperModel
+from django.db import IntegrityError, transaction
 import tempfile
 import os
 import json
+from item_api.conditional import conditional_response, touch
+from .bulk import CONFLICT_ERROR, ItemFieldsSerializer, create_items, update_items
 from .models import Item
+from .search import fuzzy_search, prefix_search
 from .serializers import ItemSerializer
+from .transcription import AudioTooLongError, transcribe, vocabulary_prompt
+
+
+class ItemPagination(LimitOffsetPagination):
+    """?limit=&offset= pages; without ?limit= the whole list is returned as before"""
+
+    @property
+    def max_limit(self):
+        return settings.ITEM_PAGE_MAX_LIMIT
+
 
 class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.all()
+    queryset = Item.objects.order_by('pk')
     serializer_class = ItemSerializer
+    pagination_class = ItemPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        group = self.request.query_params.get('group') if self.action == 'list' else None
+        return queryset.filter(group=group) if group else queryset
+
+    @conditional_response(Item)
+    def list(self, request, *args, **kwargs):
+        """All items, or ?q= name prefix matches (?fuzzy=1 for typo-tolerant matches); ?group= filters"""
+        query = request.query_params.get('q', '').strip()
+        # Plain columns render like ItemSerializer's output (item_api/renderers.py), so rows are
+        # dicts of field values without its per-field overhead
+        fields = ItemSerializer.Meta.fields
+        if query and request.query_params.get('fuzzy') in ('1', 'true'):
+            items = fuzzy_search(query, request.query_params.get('group'))
+            rows = [{field: getattr(item, field) for field in fields} for item in items]
+        else:
+            queryset = prefix_search(self.get_queryset(), query) if query else self.get_queryset()
+            rows = queryset.values(*fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(list(page))
+        return Response(list(rows))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -31,6 +70,73 @@ class ItemViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Delete, update and create many items in one transaction, reporting name/group conflicts per item"""
+        data = request.data
+        if not isinstance(data, dict) or not any(key in data for key in ('create', 'update', 'delete')):
+            return Response({
+                'error': 'Expected an object with "create", "update" and/or "delete" lists'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        create = data.get('create', [])
+        update = data.get('update', [])
+        delete = data.get('delete', [])
+        if not all(isinstance(value, list) for value in (create, update, delete)):
+            return Response({
+                'error': '"create", "update" and "delete" must be lists'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        errors = {}
+        create_serializer = ItemFieldsSerializer(data=create, many=True)
+        if not create_serializer.is_valid():
+            errors['create'] = {i: e for i, e in enumerate(create_serializer.errors) if e}
+
+        update_ids = [change.get('id') if isinstance(change, dict) else None for change in update]
+        items = Item.objects.in_bulk([pk for pk in update_ids if isinstance(pk, int)])
+        changes, update_errors, seen = [], {}, set()
+        for i, (pk, change) in enumerate(zip(update_ids, update)):
+            if pk not in items or pk in seen:
+                update_errors[i] = {'id': ['Unknown or repeated item id']}
+                continue
+            seen.add(pk)
+            serializer = ItemFieldsSerializer(items[pk], data=change, partial=True)
+            if serializer.is_valid():
+                changes.append((items[pk], serializer.validated_data))
+            else:
+                update_errors[i] = serializer.errors
+        if update_errors:
+            errors['update'] = update_errors
+
+        if not all(isinstance(pk, int) for pk in delete):
+            errors['delete'] = 'Expected a list of item ids'
+        if errors:
+            return Response({
+                'error': 'Validation failed; no items were changed',
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                deleted = list(Item.objects.filter(pk__in=delete).values_list('pk', flat=True))
+                Item.objects.filter(pk__in=deleted).delete()
+                updated, update_conflicts = update_items(changes)
+                created, create_conflicts = create_items(create_serializer.validated_data)
+        except IntegrityError:
+            # e.g. two items swapping names within one update
+            return Response({
+                'error': 'The changes conflict with each other or with a concurrent write; no items were changed'
+            }, status=status.HTTP_409_CONFLICT)
+        touch(Item)
+
+        conflicts = ([{'operation': 'update', 'index': i, 'error': CONFLICT_ERROR} for i in update_conflicts]
+                     + [{'operation': 'create', 'index': i, 'error': CONFLICT_ERROR} for i in create_conflicts])
+        return Response({
+            'created': ItemSerializer(created, many=True).data,
+            'updated': ItemSerializer(updated, many=True).data,
+            'deleted': deleted,
+            'conflicts': conflicts
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'])
     def speech_to_text(self, request):
         
@@ -45,8 +151,6 @@ class ItemViewSet(viewsets.ModelViewSet):
         print(f"Audio file received: {audio_file.name}, size: {audio_file.size}")  
         
         try:
-            model = WhisperModel("base", device="cpu", compute_type="int8")
-            
             # Determine file extension 
             file_extension = '.webm'  
             if hasattr(audio_file, 'content_type'):
@@ -64,14 +168,20 @@ class ItemViewSet(viewsets.ModelViewSet):
                     tmp_file.write(chunk)
                 tmp_file_path = tmp_file.name
             
-            segments, info = model.transcribe(tmp_file_path, language="en", beam_size=5)
-            transcription = " ".join([segment.text for segment in segments]).strip()
-            
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
+            try:
+                result = transcribe(tmp_file_path, prompt=vocabulary_prompt())
+            except AudioTooLongError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            finally:
+                # Clean up temporary file
+                os.unlink(tmp_file_path)
+            transcription = result['text']
             
-            # Parse transcription to extract name and group
-            parsed_data = self.parse_speech_input(transcription)
+            # Parse transcription to extract name and group, or several "name group" commands
+            commands = self.parse_speech_commands(transcription)
+            if len(commands) > 1:
+                return self.create_spoken_items(transcription, commands)
+            parsed_data = commands[0] if commands else None
             
             if parsed_data:
                 # Create item using parsed data
@@ -103,6 +213,49 @@ class ItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def create_spoken_items(self, transcription, commands):
+        """Create every item of a multi-item command in one bulk insert"""
+        serializer = ItemFieldsSerializer(data=commands, many=True)
+        if not serializer.is_valid():
+            return Response({
+                'transcription': transcription,
+                'parsed_data': commands,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created, conflicts = create_items(serializer.validated_data)
+        if created:
+            touch(Item)
+        return Response({
+            'transcription': transcription,
+            'parsed_data': commands,
+            'items': ItemSerializer(created, many=True).data,
+            'conflicts': [{**commands[i], 'error': CONFLICT_ERROR} for i in conflicts]
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+    def parse_speech_commands(self, text):
+        """
+        Parse one or more "[item name] [group]" commands from one utterance, e.g.
+        "apple primary, orange secondary and banana primary". Each group word ends a command;
+        connecting words between commands are skipped. Returns the parsed items in spoken order.
+        """
+        commands, clause = [], []
+        for word in text.lower().replace(',', ' ').replace('.', ' ').replace(';', ' ').split():
+            if not clause and word in ['and', 'then', 'also', 'plus', 'group']:
+                continue
+            clause.append(word)
+            if word in ['primary', 'secondary']:
+                parsed = self.parse_speech_input(' '.join(clause))
+                if parsed and parsed not in commands:
+                    commands.append(parsed)
+                clause = []
+
+        if not commands:
+            parsed = self.parse_speech_input(text)
+            return [parsed] if parsed else []
+        return commands
+
     def parse_speech_input(self, text):
         """
         Parse speech input to extract name and group.
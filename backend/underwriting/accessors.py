@@ -0,0 +1,42 @@
+"""
+Lazy accessors for the underwriting pipeline.
+
+services.py pulls in FAISS, tiktoken, LangGraph and the LLM client, which dominate worker boot
+time and memory. Views reach the pipeline through these functions instead, so those imports
+happen on the first request that needs them rather than when the URLconf is loaded.
+"""
+import threading
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_WORKFLOW = None
+_WORKFLOW_LOCK = threading.Lock()
+
+
+def get_embedding_service():
+    """Process-wide EmbeddingService (see services.get_embedding_service)"""
+    from .services import get_embedding_service
+
+    return get_embedding_service()
+
+
+def get_workflow():
+    """Process-wide UnderwritingWorkflow, built on first use and shared by all requests"""
+    global _WORKFLOW
+    if _WORKFLOW is None:
+        with _WORKFLOW_LOCK:
+            if _WORKFLOW is None:
+                from .services import UnderwritingWorkflow
+
+                _WORKFLOW = UnderwritingWorkflow()
+    return _WORKFLOW
+
+
+@receiver(setting_changed)
+def reset_workflow(setting=None, **kwargs) -> None:
+    """Drop the shared workflow so the next request rebuilds it with the current LLM settings"""
+    global _WORKFLOW
+    if setting is None or setting.startswith('UNDERWRITING_LLM') or setting == 'UNDERWRITING_STUB_LLM_LATENCY':
+        with _WORKFLOW_LOCK:
+            _WORKFLOW = None
@@ -1,28 +1,39 @@
 from django.contrib import admin
 from .models import Policy, Claim, Regulation, UnderwritingApplication
+from . import search
+
+
+class FullTextSearchAdminMixin:
+    """Match identifiers with search_fields and text through the full-text index, not LIKE scans"""
+
+    def get_search_results(self, request, queryset, search_term):
+        matches, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            matches |= queryset.filter(pk__in=search.matching_pks(self.model, search_term))
+        return matches, may_have_duplicates
 
 
 @admin.register(Policy)
-class PolicyAdmin(admin.ModelAdmin):
+class PolicyAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     list_display = ['policy_id', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['policy_id', 'text']
+    search_fields = ['policy_id']
     readonly_fields = ['id', 'created_at']
 
 
 @admin.register(Claim)
-class ClaimAdmin(admin.ModelAdmin):
+class ClaimAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     list_display = ['claim_id', 'applicant_id', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['claim_id', 'applicant_id', 'text']
+    search_fields = ['claim_id', 'applicant_id']
     readonly_fields = ['id', 'created_at']
 
 
 @admin.register(Regulation)
-class RegulationAdmin(admin.ModelAdmin):
+class RegulationAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     list_display = ['regulation_id', 'lob', 'created_at']
     list_filter = ['lob', 'created_at']
-    search_fields = ['regulation_id', 'lob', 'text']
+    search_fields = ['regulation_id', 'lob']
     readonly_fields = ['id', 'created_at']
 
 
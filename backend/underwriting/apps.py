@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UnderwritingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'underwriting'
+
+    def ready(self):
+        from .search import sync_search_indexes
+        post_migrate.connect(sync_search_indexes, sender=self)
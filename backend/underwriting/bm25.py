@@ -0,0 +1,95 @@
+import math
+import re
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Alphanumeric runs, keeping dotted/dashed compounds such as section numbers (4.2.1),
+# claim codes (clm-2023-0042) and VINs intact so they can be matched exactly
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/:][a-z0-9]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[.\-/:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; compounds are emitted whole and as their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in COMPOUND_SEPARATORS.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over chunks, addressed by the same ids as the FAISS index.
+
+    Postings are compact typed arrays (doc ids as uint32, term frequencies as uint16) rather than
+    per-posting Python objects. Scoring accumulates only over the postings of the query terms.
+    The index is not locked itself; EmbeddingService guards it with its readers-writer lock.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._doc_lengths = array('I')
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, texts: List[str]) -> None:
+        """Index texts as the next consecutive doc ids"""
+        for text in texts:
+            doc_id = len(self._doc_lengths)
+            tokens = tokenize(text)
+            self._doc_lengths.append(len(tokens))
+            self._total_length += len(tokens)
+
+            frequencies = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            for token, frequency in frequencies.items():
+                term_id = self._term_ids.get(token)
+                if term_id is None:
+                    term_id = len(self._postings_docs)
+                    self._term_ids[token] = term_id
+                    self._postings_docs.append(array('I'))
+                    self._postings_tfs.append(array('H'))
+                self._postings_docs[term_id].append(doc_id)
+                self._postings_tfs[term_id].append(min(frequency, 0xFFFF))
+
+    def search(self, query: str, k: int = 10, skip: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return up to k (doc_id, score) pairs, best first, leaving out doc ids where the boolean skip mask is set"""
+        doc_count = len(self._doc_lengths)
+        term_ids = {self._term_ids[token] for token in tokenize(query) if token in self._term_ids}
+        if not doc_count or not term_ids:
+            return []
+
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+        average_length = self._total_length / doc_count
+
+        doc_parts, score_parts = [], []
+        for term_id in term_ids:
+            docs = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+            tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norms = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / average_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norms))
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if skip is not None:
+            keep = ~skip[docs]
+            docs, scores = docs[keep], scores[keep]
+            if not len(docs):
+                return []
+
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(docs[i]), float(scores[i])) for i in top]
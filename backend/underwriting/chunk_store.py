@@ -0,0 +1,235 @@
+import json
+import mmap
+import os
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+
+class ChunkStore:
+    """Columnar metadata for indexed chunks, addressed by FAISS id.
+
+    Sources and doc ids are interned into small integer codes held in NumPy arrays, and chunk
+    text lives in one UTF-8 blob addressed by offsets. A persisted blob is memory-mapped on load,
+    so chunk text stays in the page cache instead of the Python heap. Per-source counts are kept
+    as running counters.
+
+    When a document is re-indexed, retire_document() marks its old chunks stale and searches skip
+    them. compact() later drops stale chunks and renumbers the rest in order, which is how
+    IndexFlatCodes.remove_ids renumbers FAISS ids, so the two stay aligned.
+
+    The store is not locked itself; EmbeddingService guards it with its readers-writer lock.
+    """
+
+    ARRAYS_FILE = "chunks.npz"
+    STRINGS_FILE = "chunks_strings.json"
+    BLOB_FILE = "chunks.blob"
+    FILES = (ARRAYS_FILE, STRINGS_FILE, BLOB_FILE)
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self._source_codes = np.zeros(capacity, dtype=np.uint16)
+        self._doc_codes = np.zeros(capacity, dtype=np.int32)
+        self._chunk_indexes = np.zeros(capacity, dtype=np.int32)
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._stale = np.zeros(capacity, dtype=bool)
+        self.stale_count = 0
+
+        self._sources: List[str] = []
+        self._source_lookup: Dict[str, int] = {}
+        self._source_counts: List[int] = []
+        self._doc_ids: List[str] = []
+        self._doc_lookup: Dict[str, int] = {}
+        self._documents = set()
+
+        # Text of chunks loaded from disk (mmap) followed by text appended since
+        self._base_blob = b""
+        self._base_length = 0
+        self._tail_blob = bytearray()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _intern_source(self, source: str) -> int:
+        code = self._source_lookup.get(source)
+        if code is None:
+            code = len(self._sources)
+            self._sources.append(source)
+            self._source_lookup[source] = code
+            self._source_counts.append(0)
+        return code
+
+    def _intern_doc(self, doc_id: str) -> int:
+        code = self._doc_lookup.get(doc_id)
+        if code is None:
+            code = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._doc_lookup[doc_id] = code
+        return code
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = len(self._source_codes)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._source_codes = np.resize(self._source_codes, capacity)
+        self._doc_codes = np.resize(self._doc_codes, capacity)
+        self._chunk_indexes = np.resize(self._chunk_indexes, capacity)
+        self._offsets = np.resize(self._offsets, capacity + 1)
+        self._stale = np.resize(self._stale, capacity)
+        self._stale[self._size:] = False
+
+    def append(self, chunk_metadata: List[Dict]) -> None:
+        """Append chunks given as dicts with source, doc_id, chunk_index and text"""
+        self._reserve(len(chunk_metadata))
+        end = int(self._offsets[self._size])
+        for chunk in chunk_metadata:
+            i = self._size
+            source_code = self._intern_source(chunk['source'])
+            doc_code = self._intern_doc(str(chunk['doc_id']))
+            encoded = chunk['text'].encode('utf-8')
+
+            self._source_codes[i] = source_code
+            self._doc_codes[i] = doc_code
+            self._chunk_indexes[i] = chunk['chunk_index']
+            self._tail_blob += encoded
+            end += len(encoded)
+            self._offsets[i + 1] = end
+
+            self._source_counts[source_code] += 1
+            self._documents.add((source_code, doc_code))
+            self._size += 1
+
+    def _text_bytes(self, chunk_id: int) -> bytes:
+        start, end = int(self._offsets[chunk_id]), int(self._offsets[chunk_id + 1])
+        if start >= self._base_length:
+            return self._tail_blob[start - self._base_length:end - self._base_length]
+        return self._base_blob[start:end]
+
+    def text(self, chunk_id: int) -> str:
+        return self._text_bytes(chunk_id).decode('utf-8')
+
+    def is_stale(self, chunk_id: int) -> bool:
+        return bool(self._stale[chunk_id])
+
+    def stale_mask(self) -> np.ndarray:
+        """Boolean array over chunk ids, True for stale chunks (a view; do not modify)"""
+        return self._stale[:self._size]
+
+    def retire_document(self, source: str, doc_id: str) -> int:
+        """Mark every live chunk of (source, doc_id) stale; returns how many were retired"""
+        source_code = self._source_lookup.get(source)
+        doc_code = self._doc_lookup.get(str(doc_id))
+        if source_code is None or doc_code is None or (source_code, doc_code) not in self._documents:
+            return 0
+        n = self._size
+        chunk_ids = np.flatnonzero((self._source_codes[:n] == source_code) & (self._doc_codes[:n] == doc_code)
+                                   & ~self._stale[:n])
+        self._stale[chunk_ids] = True
+        self.stale_count += len(chunk_ids)
+        self._source_counts[source_code] -= len(chunk_ids)
+        self._documents.discard((source_code, doc_code))
+        return len(chunk_ids)
+
+    def compact(self) -> np.ndarray:
+        """Drop stale chunks, renumbering the rest in order; returns the old ids of the chunks kept"""
+        n = self._size
+        keep = np.flatnonzero(~self._stale[:n])
+        lengths = np.diff(self._offsets[:n + 1])[keep]
+        blob = bytearray()
+        for chunk_id in keep:
+            blob += self._text_bytes(chunk_id)
+
+        size = len(keep)
+        self._source_codes[:size] = self._source_codes[keep]
+        self._doc_codes[:size] = self._doc_codes[keep]
+        self._chunk_indexes[:size] = self._chunk_indexes[keep]
+        self._offsets[0] = 0
+        self._offsets[1:size + 1] = np.cumsum(lengths)
+        self._stale[:] = False
+        self.stale_count = 0
+        self._size = size
+        # Interned sources and doc ids keep their codes, so counts and the document set stay valid
+        self._base_blob = b""
+        self._base_length = 0
+        self._tail_blob = blob
+        return keep
+
+    def source(self, chunk_id: int) -> str:
+        return self._sources[self._source_codes[chunk_id]]
+
+    def get(self, chunk_id: int) -> Dict:
+        """Materialize the metadata dict for one chunk"""
+        return {
+            'source': self._sources[self._source_codes[chunk_id]],
+            'doc_id': self._doc_ids[self._doc_codes[chunk_id]],
+            'chunk_index': int(self._chunk_indexes[chunk_id]),
+            'text': self.text(chunk_id)
+        }
+
+    def texts(self, chunk_ids: Optional[Iterable[int]] = None):
+        """Yield chunk texts in id order (or for the given ids)"""
+        for chunk_id in (range(self._size) if chunk_ids is None else chunk_ids):
+            yield self.text(chunk_id)
+
+    def has_document(self, source: str, doc_id: str) -> bool:
+        source_code = self._source_lookup.get(source)
+        doc_code = self._doc_lookup.get(str(doc_id))
+        return source_code is not None and doc_code is not None and (source_code, doc_code) in self._documents
+
+    def counts_by_source(self) -> Dict[str, int]:
+        return {source: count for source, count in zip(self._sources, self._source_counts) if count}
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the columns and in-memory text"""
+        return (self._source_codes.nbytes + self._doc_codes.nbytes + self._chunk_indexes.nbytes
+                + self._offsets.nbytes + self._stale.nbytes + len(self._tail_blob))
+
+    def save(self, directory, suffix: str = "") -> None:
+        """Write the store as FILES (each with suffix appended) into directory"""
+        n = self._size
+        with open(os.path.join(directory, self.ARRAYS_FILE + suffix), "wb") as f:
+            np.savez(f, source_codes=self._source_codes[:n], doc_codes=self._doc_codes[:n],
+                     chunk_indexes=self._chunk_indexes[:n], offsets=self._offsets[:n + 1],
+                     stale=self._stale[:n])
+        with open(os.path.join(directory, self.STRINGS_FILE + suffix), "w") as f:
+            json.dump({"sources": self._sources, "doc_ids": self._doc_ids}, f)
+        with open(os.path.join(directory, self.BLOB_FILE + suffix), "wb") as f:
+            f.write(self._base_blob[:self._base_length])
+            f.write(self._tail_blob)
+
+    @classmethod
+    def load(cls, directory) -> "ChunkStore":
+        with np.load(os.path.join(directory, cls.ARRAYS_FILE)) as arrays:
+            source_codes = arrays["source_codes"]
+            doc_codes = arrays["doc_codes"]
+            chunk_indexes = arrays["chunk_indexes"]
+            offsets = arrays["offsets"]
+            # Stores written before chunks could be retired have no stale column
+            stale = arrays["stale"] if "stale" in arrays else np.zeros(len(source_codes), dtype=bool)
+        with open(os.path.join(directory, cls.STRINGS_FILE)) as f:
+            strings = json.load(f)
+
+        n = len(source_codes)
+        store = cls(capacity=max(n, 1024))
+        store._size = n
+        store._source_codes[:n] = source_codes
+        store._doc_codes[:n] = doc_codes
+        store._chunk_indexes[:n] = chunk_indexes
+        store._offsets[:n + 1] = offsets
+        store._stale[:n] = stale
+        store.stale_count = int(stale.sum())
+
+        store._sources = strings["sources"]
+        store._source_lookup = {source: code for code, source in enumerate(store._sources)}
+        store._source_counts = np.bincount(source_codes[~stale], minlength=len(store._sources)).tolist()
+        store._doc_ids = strings["doc_ids"]
+        store._doc_lookup = {doc_id: code for code, doc_id in enumerate(store._doc_ids)}
+        store._documents = set(zip(source_codes[~stale].tolist(), doc_codes[~stale].tolist()))
+
+        store._base_length = int(offsets[n])
+        if store._base_length:
+            with open(os.path.join(directory, cls.BLOB_FILE), "rb") as f:
+                store._base_blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return store
@@ -0,0 +1,227 @@
+"""
+Chat models for the underwriting workflow and the gateway every LLM call goes through.
+
+LLMGateway wraps the model selected by get_llm(). It spaces calls with a token bucket
+(UNDERWRITING_LLM_RATE per second, bursts of UNDERWRITING_LLM_BURST), caps calls in flight with an
+AIMD limit that halves on 429s or slow answers and grows back by one per round of fast ones, and
+retries throttled, timed-out and 5xx calls with full-jitter exponential backoff (honouring
+Retry-After). Every call has a deadline, UNDERWRITING_LLM_DEADLINE seconds by default, that covers
+queueing, attempts and backoff; each attempt gets the remaining time as its timeout.
+"""
+import random
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+from django.conf import settings
+from langchain_core.messages import AIMessage
+
+from . import metrics
+
+RISK_LEVELS = ("Low risk", "Moderate risk", "Medium to high risk", "High risk")
+
+
+class StubChatModel:
+    """Deterministic stand-in for ChatGroq, for benchmarks and offline runs.
+
+    Sleeps `latency` seconds per call to model network and inference time, then answers in the
+    RISK SUMMARY / RED FLAGS / RECOMMENDATIONS format summarize_risk parses. The answer depends
+    only on the prompt, so repeated runs produce identical results.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def invoke(self, messages: List, timeout: Optional[float] = None) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if timeout is not None and self.latency > timeout:
+            time.sleep(max(timeout, 0))
+            raise TimeoutError(f"Stub LLM did not answer within {timeout:.2f}s")
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        risk_level = RISK_LEVELS[seed % len(RISK_LEVELS)]
+        flag_count = seed % 3 + 1
+        flags = "\n".join(f"- Stub concern {n + 1} (ref {seed % 10000:04d})" for n in range(flag_count))
+        content = (f"RISK SUMMARY: {risk_level} based on the application and retrieved context.\n\n"
+                   f"RED FLAGS:\n{flags}\n\n"
+                   f"RECOMMENDATIONS: Standard review with {risk_level.lower()} pricing.")
+
+        # Whitespace token counts keep usage metrics meaningful without a tokenizer
+        input_tokens, output_tokens = len(prompt.split()), len(content.split())
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+
+def get_llm():
+    """Chat model selected by UNDERWRITING_LLM_BACKEND ("groq" or "stub")"""
+    backend = settings.UNDERWRITING_LLM_BACKEND
+    if backend == "stub":
+        return StubChatModel(latency=settings.UNDERWRITING_STUB_LLM_LATENCY)
+    if backend == "groq":
+        from langchain_groq import ChatGroq
+        options = {"base_url": settings.UNDERWRITING_LLM_BASE_URL} if settings.UNDERWRITING_LLM_BASE_URL else {}
+        # LLMGateway retries; the client's own retries would multiply requests to a throttling provider
+        return ChatGroq(model=settings.UNDERWRITING_LLM_MODEL, temperature=0.1, max_retries=0, **options)
+    raise ValueError(f"Unknown LLM backend '{backend}', expected 'groq' or 'stub'")
+
+
+# HTTP statuses worth another attempt besides 429
+RETRY_STATUSES = (408, 500, 502, 503, 504)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """An LLM call could not finish within its deadline"""
+
+
+class TokenBucket:
+    """Allow `rate` calls per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Take a token, waiting for one until deadline (time.monotonic()); False if none came in time"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """Adaptive cap on calls in flight: additive increase, multiplicative decrease.
+
+    Each call that answers within latency_target adds 1/limit, so the limit grows by about one per
+    round of calls. A throttled or slow call multiplies it by `decrease`, at most once per round:
+    calls that started before the last decrease do not decrease it again.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 latency_target: float = 0.0, decrease: float = 0.5):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial or self.max_limit)
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self._in_flight = 0
+        self._last_decrease = float('-inf')
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline: float) -> bool:
+        """Wait for a free slot until deadline (time.monotonic()); False if none came in time"""
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self, started: float, latency: Optional[float] = None, throttled: bool = False) -> None:
+        """Free a slot and adapt the limit; latency is None for calls that failed without an answer"""
+        with self._cond:
+            self._in_flight -= 1
+            slow = latency is not None and self.latency_target > 0 and latency > self.latency_target
+            if throttled or slow:
+                if started > self._last_decrease:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+            elif latency is not None:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            metrics.LLM_CONCURRENCY_LIMIT.set(self.limit)
+            self._cond.notify_all()
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """'throttled', 'timeout' or 'error' if the failed call is worth retrying, else None"""
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "throttled"
+    if status in RETRY_STATUSES:
+        return "error"
+    # The groq and openai SDKs raise APITimeoutError/APIConnectionError, which subclass neither builtin
+    name = type(error).__name__
+    if isinstance(error, TimeoutError) or name == "APITimeoutError":
+        return "timeout"
+    if isinstance(error, ConnectionError) or name == "APIConnectionError":
+        return "error"
+    return None
+
+
+def retry_after(error: Exception) -> float:
+    """Seconds the provider asked us to wait in a Retry-After header, or 0"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", 0)), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LLMGateway:
+    """Rate limited, concurrency limited and retried access to a chat model; safe to share between threads"""
+
+    def __init__(self, llm, rate: float = 0.0, burst: float = 1, max_concurrency: int = 16,
+                 latency_target: float = 0.0, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, deadline: float = 60.0):
+        self.llm = llm
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.limiter = AIMDLimiter(max_concurrency, latency_target=latency_target)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+
+    @classmethod
+    def from_settings(cls, llm) -> "LLMGateway":
+        return cls(llm, rate=settings.UNDERWRITING_LLM_RATE, burst=settings.UNDERWRITING_LLM_BURST,
+                   max_concurrency=settings.UNDERWRITING_LLM_MAX_CONCURRENCY,
+                   latency_target=settings.UNDERWRITING_LLM_LATENCY_TARGET,
+                   max_retries=settings.UNDERWRITING_LLM_MAX_RETRIES, backoff=settings.UNDERWRITING_LLM_BACKOFF,
+                   deadline=settings.UNDERWRITING_LLM_DEADLINE)
+
+    def invoke(self, messages: List, deadline: Optional[float] = None):
+        """Call the model, retrying until it answers, fails for good or deadline seconds have passed"""
+        expires = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            if self.bucket and not self.bucket.acquire(expires):
+                raise LLMDeadlineExceeded("LLM rate limit left no room before the deadline")
+            if not self.limiter.acquire(expires):
+                raise LLMDeadlineExceeded("No LLM concurrency slot freed up before the deadline")
+
+            started = time.monotonic()
+            try:
+                response = self.llm.invoke(messages, timeout=expires - started)
+            except Exception as e:
+                reason = retry_reason(e)
+                self.limiter.release(started, throttled=reason == "throttled")
+                if reason is None or attempt >= self.max_retries:
+                    raise
+                # Full jitter spreads out callers that were throttled together
+                delay = max(retry_after(e), random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                if time.monotonic() + delay >= expires:
+                    raise LLMDeadlineExceeded(f"LLM call still failing ({reason}) at its deadline") from e
+                metrics.LLM_RETRIES.inc(reason=reason)
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.limiter.release(started, latency=time.monotonic() - started)
+                return response
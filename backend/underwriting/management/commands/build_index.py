@@ -0,0 +1,138 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from item_api import resources
+from underwriting.models import Policy, Claim, Regulation
+from underwriting.services import EmbeddingService
+
+# (model, natural key field, index source) for every corpus that feeds retrieval
+CORPORA = [
+    (Policy, 'policy_id', 'policy'),
+    (Claim, 'claim_id', 'claims'),
+    (Regulation, 'regulation_id', 'regulations'),
+]
+
+_worker_service = None
+
+
+def _init_worker(thread_budget):
+    global _worker_service
+    resources.configure(budget=thread_budget)
+    _worker_service = EmbeddingService()
+
+
+def _chunk_and_embed(documents):
+    """Worker entry point: chunk and embed one batch of (text, source, doc_id) documents"""
+    return _worker_service.embed_documents(documents)
+
+
+class Command(BaseCommand):
+    help = "Build the persistent FAISS index from all policies, claims and regulations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.UNDERWRITING_INDEX_DIR),
+                            help='Directory the index is written to (default: UNDERWRITING_INDEX_DIR)')
+        parser.add_argument('--index-type', default=settings.UNDERWRITING_INDEX_TYPE,
+                            help='Vector storage layout for a full build: flat, flat_ip, fp16, sq8 or pq')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only index rows created or updated since the last build in --output')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Chunk+embed worker processes; 0 runs everything in-process')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per database round trip')
+        parser.add_argument('--batch-size', type=int, default=256,
+                            help='Documents per worker task')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        started_at = timezone.now()
+
+        since = None
+        if options['incremental'] and EmbeddingService.exists(output):
+            service = EmbeddingService.load(output)
+            since = parse_datetime(service.manifest.get('last_built_at', ''))
+            self.stdout.write(f"Incremental build: {service.index.ntotal} vectors already indexed, "
+                              f"processing rows created or updated after {since}")
+        else:
+            service = EmbeddingService(index_type=options['index_type'])
+
+        pool = None
+        if options['workers'] > 0:
+            # The worker processes share this process's cores
+            thread_budget = max(1, resources.available_cpus() // options['workers'])
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker,
+                                       initargs=(thread_budget,))
+
+        total_docs = total_chunks = 0
+        clock = time.perf_counter()
+        try:
+            for model, key_field, source in CORPORA:
+                docs, chunks, elapsed = self._index_corpus(
+                    service, pool, model, key_field, source, since,
+                    options['chunk_size'], options['batch_size'], max(options['workers'], 1) * 2
+                )
+                total_docs += docs
+                total_chunks += chunks
+                self._report(source, docs, chunks, elapsed)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        service.save(output, last_built_at=started_at.isoformat())
+        self._report('total', total_docs, total_chunks, time.perf_counter() - clock)
+        self.stdout.write(self.style.SUCCESS(f"Index with {service.index.ntotal} vectors written to {output}"))
+
+    def _index_corpus(self, service, pool, model, key_field, source, since, chunk_size, batch_size, max_in_flight):
+        queryset = model.objects.only(key_field, 'text').order_by()
+        if since:
+            queryset = queryset.filter(updated_at__gt=since)
+
+        docs = chunks = 0
+        clock = time.perf_counter()
+        in_flight = set()
+
+        def collect(futures):
+            nonlocal chunks
+            for future in futures:
+                chunk_metadata, embeddings = future.result()
+                if chunk_metadata:
+                    chunks += service.add_embeddings(embeddings, chunk_metadata)
+
+        batch = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            batch.append((row.text, source, getattr(row, key_field)))
+            docs += 1
+            if len(batch) < batch_size:
+                continue
+
+            # Rows already in the index were updated since the last build: drop their old chunks
+            service.retire_documents([(source, doc_id) for _, source, doc_id in batch])
+
+            if pool is None:
+                chunks += service.add_documents(batch)
+            else:
+                # Bound the number of outstanding batches so memory stays flat on large corpora
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(_chunk_and_embed, batch))
+            batch = []
+
+        if batch:
+            service.retire_documents([(source, doc_id) for _, source, doc_id in batch])
+            if pool is None:
+                chunks += service.add_documents(batch)
+            else:
+                in_flight.add(pool.submit(_chunk_and_embed, batch))
+        collect(in_flight)
+
+        return docs, chunks, time.perf_counter() - clock
+
+    def _report(self, label, docs, chunks, elapsed):
+        elapsed = max(elapsed, 1e-9)
+        self.stdout.write(f"{label}: {docs} docs, {chunks} chunks in {elapsed:.2f}s "
+                          f"({docs / elapsed:.1f} docs/s, {chunks / elapsed:.1f} chunks/s)")
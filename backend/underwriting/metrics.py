@@ -0,0 +1,37 @@
+"""
+Metrics of the underwriting pipeline, registered in the shared item_api.metrics registry.
+"""
+from functools import wraps
+
+# collect_timings, record, timer and REGISTRY are re-exported for the underwriting modules
+from item_api.metrics import REGISTRY, collect_timings, counter, gauge, histogram, record, timer  # noqa: F401
+
+NODE_SECONDS = histogram('underwriting_node_seconds', 'Wall time of each workflow node', ('node',))
+APPLICATION_SECONDS = histogram('underwriting_application_seconds', 'Wall time of process_application')
+DB_QUERIES = counter('underwriting_db_queries_total', 'Database queries issued while processing applications')
+CHUNKS_INDEXED = counter('underwriting_chunks_indexed_total', 'Chunks added to the vector index', ('source',))
+EMBEDDINGS = counter('underwriting_embeddings_total', 'Texts embedded (chunks and queries)')
+SEARCH_SECONDS = histogram('underwriting_search_seconds', 'Index search latency, excluding embedding', ('kind',))
+SEARCH_CACHE = counter('underwriting_search_cache_total', 'Retrieval cache lookups', ('result',))
+APPLICATION_REPLAYS = counter('underwriting_application_replays_total',
+                              'process_application requests answered without running the workflow', ('source',))
+LLM_SECONDS = histogram('underwriting_llm_seconds', 'LLM call latency', ('operation',))
+LLM_RETRIES = counter('underwriting_llm_retries_total', 'LLM calls retried', ('reason',))
+LLM_CONCURRENCY_LIMIT = gauge('underwriting_llm_concurrency_limit', 'Current adaptive limit on LLM calls in flight')
+LLM_TOKENS = counter('underwriting_llm_tokens_total', 'LLM tokens used', ('operation', 'type'))
+
+
+def timed_node(name: str, fn):
+    """Wrap a workflow node so its wall time is recorded under node=name"""
+    @wraps(fn)
+    def wrapper(state):
+        with timer(NODE_SECONDS, stage=name, node=name):
+            return fn(state)
+    return wrapper
+
+
+def count_queries(execute, sql, params, many, context):
+    """connection.execute_wrapper hook counting database queries"""
+    DB_QUERIES.inc()
+    record('db_queries', 1)
+    return execute(sql, params, many, context)
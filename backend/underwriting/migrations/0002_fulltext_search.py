@@ -0,0 +1,49 @@
+from django.db import migrations
+
+TABLES = ('underwriting_policy', 'underwriting_claim', 'underwriting_regulation')
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == 'sqlite':
+            # External-content FTS5 table: stores only the index, reading text from the model table
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5("
+                f"text, content='{table}', content_rowid='rowid', tokenize='porter unicode61')")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, text) VALUES (new.rowid, new.text); END")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF text ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+                f"INSERT INTO {table}_fts(rowid, text) VALUES (new.rowid, new.text); END")
+            schema_editor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE INDEX {table}_text_fts ON {table} USING gin (to_tsvector('english', text))")
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_text_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('underwriting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
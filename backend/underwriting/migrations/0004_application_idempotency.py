@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('underwriting', '0003_underwritingapplication_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='underwritingapplication',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='underwritingapplication',
+            name='messages',
+            field=models.JSONField(default=list),
+        ),
+    ]
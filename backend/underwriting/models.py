@@ -9,6 +9,7 @@ class Policy(models.Model):
     text = models.TextField()
     metadata = models.JSONField(default=dict)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Policy {self.policy_id}"
@@ -24,6 +25,7 @@ class Claim(models.Model):
     text = models.TextField()
     metadata = models.JSONField(default=dict)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Claim {self.claim_id}"
@@ -36,6 +38,7 @@ class Regulation(models.Model):
     text = models.TextField()
     metadata = models.JSONField(default=dict)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Regulation {self.regulation_id}"
@@ -51,7 +54,12 @@ class UnderwritingApplication(models.Model):
     red_flags = models.JSONField(default=list)
     recommendations = models.TextField(blank=True)
     status = models.CharField(max_length=50, default='pending')
+    # Workflow messages returned with the result, so a replayed request gets the same response
+    messages = models.JSONField(default=list)
+    # Idempotency-Key header (or a hash of the request) this application was created for
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Application {self.applicant_id} - {self.policy_id}"
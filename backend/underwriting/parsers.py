@@ -0,0 +1,27 @@
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline-delimited JSON (one record per line) into a list of records"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        # orjson reads UTF-8 bytes directly; other declared charsets are decoded first
+        utf8 = encoding.lower().replace('-', '') == 'utf8'
+
+        records = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip() if utf8 else line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                records.append(orjson.loads(line))
+            except ValueError as e:
+                raise ParseError(f'NDJSON parse error on line {line_number}: {str(e)}')
+        return records
@@ -0,0 +1,181 @@
+"""
+Full-text search over policy, claim and regulation text.
+
+SQLite uses FTS5 external-content tables (underwriting_<model>_fts) that triggers keep in sync
+with the model tables; PostgreSQL uses GIN indexes on to_tsvector('english', text). Both are
+created by migration 0002_fulltext_search, and sync_search_indexes() keeps the SQLite side intact
+after later migrations. Other backends fall back to an unranked icontains scan.
+"""
+from typing import Dict, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.expressions import RawSQL
+
+from .bm25 import tokenize
+from .models import Claim, Policy, Regulation
+
+# Model -> (identifier field, extra fields returned with each hit)
+SEARCH_MODELS = {
+    Policy: ('policy_id', ()),
+    Claim: ('claim_id', ('applicant_id',)),
+    Regulation: ('regulation_id', ('lob',)),
+}
+
+# Integer column keying each row's FTS5 entry. It is kept out of the models so Django never writes it,
+# and unlike the implicit rowid of these UUID-keyed tables it is not renumbered by VACUUM.
+SEARCH_ROWID = 'search_rowid'
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_TOKENS = 16
+
+
+def fts_table(model) -> str:
+    return f'{model._meta.db_table}_fts'
+
+
+def fts5_query(query: str) -> str:
+    """Quote each term so user input cannot inject FTS5 syntax; terms are ANDed"""
+    terms = []
+    for token in tokenize(query):
+        # Compounds (4.2.1, clm-2023-0042) are emitted whole and as parts; the quoted whole is a phrase
+        quoted = '"' + token.replace('"', '""') + '"'
+        if quoted not in terms:
+            terms.append(quoted)
+    return ' '.join(terms)
+
+
+def _columns(model, filters: Dict[str, str]) -> List[str]:
+    key_field, extra_fields = SEARCH_MODELS[model]
+    for field in filters:
+        model._meta.get_field(field)  # raises FieldDoesNotExist for unknown filters
+    return ['id', key_field, *extra_fields]
+
+
+def search(model, query: str, limit: int = 20, offset: int = 0, filters: Optional[Dict[str, str]] = None) -> Dict:
+    """Ranked matches for query with highlighted snippets: {'count': n, 'results': [...]}"""
+    filters = filters or {}
+    columns = _columns(model, filters)
+    table = model._meta.db_table
+    quote = connection.ops.quote_name
+    select = ', '.join(f'm.{quote(column)}' for column in columns)
+    where = ''.join(f' AND m.{quote(field)} = %s' for field in filters)
+
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return {'count': 0, 'results': []}
+        fts = fts_table(model)
+        base = f'FROM {fts} JOIN {table} m ON m.{SEARCH_ROWID} = {fts}.rowid WHERE {fts} MATCH %s{where}'
+        params = [match, *filters.values()]
+        sql = (f'SELECT {select}, -bm25({fts}), '
+               f'snippet({fts}, 0, %s, %s, %s, {SNIPPET_TOKENS}) {base} ORDER BY bm25({fts}) LIMIT %s OFFSET %s')
+        sql_params = [HIGHLIGHT_START, HIGHLIGHT_END, '…', *params, limit, offset]
+    elif connection.vendor == 'postgresql':
+        base = (f"FROM {table} m, websearch_to_tsquery('english', %s) q "
+                f"WHERE to_tsvector('english', m.text) @@ q{where}")
+        params = [query, *filters.values()]
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords={SNIPPET_TOKENS}, MinWords=5'
+        sql = (f"SELECT {select}, ts_rank_cd(to_tsvector('english', m.text), q), "
+               f"ts_headline('english', m.text, q, %s) {base} ORDER BY {len(columns) + 1} DESC LIMIT %s OFFSET %s")
+        sql_params = [options, *params, limit, offset]
+    else:
+        return _search_fallback(model, query, columns, limit, offset, filters)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) {base}', params)
+        count = cursor.fetchone()[0]
+        cursor.execute(sql, sql_params)
+        rows = cursor.fetchall()
+
+    pk = model._meta.pk
+    results = []
+    for row in rows:
+        result = dict(zip(columns, row[:len(columns)]))
+        result['id'] = str(pk.to_python(result['id']))
+        result['rank'] = float(row[-2])
+        result['snippet'] = row[-1]
+        results.append(result)
+    return {'count': count, 'results': results}
+
+
+def _search_fallback(model, query, columns, limit, offset, filters):
+    """Unindexed icontains search for backends without full-text support"""
+    queryset = model.objects.filter(text__icontains=query.strip(), **filters)
+    results = []
+    for row in queryset.values(*columns, 'text')[offset:offset + limit]:
+        text = row.pop('text')
+        start = max(text.lower().find(query.strip().lower()), 0)
+        row['id'] = str(row['id'])
+        row['rank'] = 0.0
+        row['snippet'] = text[max(start - 60, 0):start + 120]
+        results.append(row)
+    return {'count': queryset.count(), 'results': results}
+
+
+def matching_pks(model, query: str) -> RawSQL:
+    """Subquery of primary keys whose text matches query, for pk__in filters (admin search)"""
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        fts = fts_table(model)
+        return RawSQL(f'SELECT m.id FROM {fts} JOIN {table} m ON m.{SEARCH_ROWID} = {fts}.rowid WHERE {fts} MATCH %s',
+                      [fts5_query(query) or '""'])
+    if connection.vendor == 'postgresql':
+        return RawSQL(f"SELECT id FROM {table} WHERE to_tsvector('english', text) @@ "
+                      f"websearch_to_tsquery('english', %s)", [query])
+    return RawSQL(f'SELECT id FROM {table} WHERE text LIKE %s', [f'%{query}%'])
+
+
+def sync_search_indexes(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Create or repair the SQLite FTS5 tables, their triggers and the search_rowid column.
+
+    Connected to post_migrate: SQLite applies most schema changes by rebuilding the table, which
+    drops the triggers and search_rowid, so this runs after every migrate and rebuilds an index
+    whose keys were lost. Safe to run repeatedly.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or ('underwriting', '0002_fulltext_search') not in \
+            MigrationRecorder(conn).applied_migrations():
+        return
+
+    with conn.cursor() as cursor:
+        for model in SEARCH_MODELS:
+            table, fts = model._meta.db_table, fts_table(model)
+            columns = [column.name for column in conn.introspection.get_table_description(cursor, table)]
+            if SEARCH_ROWID not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {SEARCH_ROWID} INTEGER')
+            # Key rows written while the triggers were missing, after every key already in use
+            cursor.execute(f'UPDATE {table} SET {SEARCH_ROWID} = rowid + '
+                           f'(SELECT IFNULL(MAX({SEARCH_ROWID}), 0) FROM {table}) WHERE {SEARCH_ROWID} IS NULL')
+            rebuild = cursor.rowcount > 0
+            cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {table}_{SEARCH_ROWID} ON {table} ({SEARCH_ROWID})')
+
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+            row = cursor.fetchone()
+            if row is None or f"content_rowid='{SEARCH_ROWID}'" not in row[0]:
+                # Missing, or the rowid-keyed table created by migration 0002
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                    f"text, content='{table}', content_rowid='{SEARCH_ROWID}', tokenize='porter unicode61')")
+                rebuild = True
+
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            # New rows take the next key after the largest one in use, so keys are never reused
+            cursor.execute(
+                f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"UPDATE {table} SET {SEARCH_ROWID} = (SELECT IFNULL(MAX({SEARCH_ROWID}), 0) + 1 FROM {table}) "
+                f"WHERE rowid = new.rowid; "
+                f"INSERT INTO {fts}(rowid, text) SELECT {SEARCH_ROWID}, text FROM {table} WHERE rowid = new.rowid; END")
+            cursor.execute(
+                f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.{SEARCH_ROWID}, old.text); END")
+            cursor.execute(
+                f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF text ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.{SEARCH_ROWID}, old.text); "
+                f"INSERT INTO {fts}(rowid, text) VALUES (new.{SEARCH_ROWID}, new.text); END")
+
+            if rebuild:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
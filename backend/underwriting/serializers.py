@@ -1,29 +1,83 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from .models import Policy, Claim, Regulation, UnderwritingApplication
 
 
-class PolicySerializer(serializers.ModelSerializer):
+class BulkUpsertListSerializer(serializers.ListSerializer):
+    """Write validated records with one upsert statement per batch instead of one INSERT per row"""
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        upsert_field = self.child.Meta.upsert_field
+        update_fields = [
+            field for field in self.child.Meta.fields
+            if field not in self.child.Meta.read_only_fields and field != upsert_field
+        ]
+        # ON CONFLICT only rewrites the listed columns, so auto_now timestamps must be named explicitly
+        update_fields += [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+        # The same key twice in one statement is rejected by ON CONFLICT, so the last record wins
+        records = {attrs[upsert_field]: attrs for attrs in validated_data}
+
+        return model.objects.bulk_create(
+            [model(**attrs) for attrs in records.values()],
+            batch_size=self.context.get('batch_size'),
+            update_conflicts=True,
+            unique_fields=[upsert_field],
+            update_fields=update_fields,
+        )
+
+
+class UpsertSerializerMixin:
+    """Drop the unique check on the upsert key when validating records for a bulk upsert"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if isinstance(self.parent, BulkUpsertListSerializer):
+            field = fields[self.Meta.upsert_field]
+            field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+        return fields
+
+
+class DynamicFieldsMixin:
+    """Serialize only the fields named in the `fields` argument (sparse fieldsets)"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PolicySerializer(DynamicFieldsMixin, UpsertSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Policy
         fields = ['id', 'policy_id', 'text', 'metadata', 'created_at']
         read_only_fields = ['id', 'created_at']
+        upsert_field = 'policy_id'
+        list_serializer_class = BulkUpsertListSerializer
 
 
-class ClaimSerializer(serializers.ModelSerializer):
+class ClaimSerializer(DynamicFieldsMixin, UpsertSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Claim
         fields = ['id', 'claim_id', 'applicant_id', 'text', 'metadata', 'created_at']
         read_only_fields = ['id', 'created_at']
+        upsert_field = 'claim_id'
+        list_serializer_class = BulkUpsertListSerializer
 
 
-class RegulationSerializer(serializers.ModelSerializer):
+class RegulationSerializer(DynamicFieldsMixin, UpsertSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Regulation
         fields = ['id', 'regulation_id', 'lob', 'text', 'metadata', 'created_at']
         read_only_fields = ['id', 'created_at']
+        upsert_field = 'regulation_id'
+        list_serializer_class = BulkUpsertListSerializer
 
 
-class UnderwritingApplicationSerializer(serializers.ModelSerializer):
+class UnderwritingApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UnderwritingApplication
         fields = ['id', 'applicant_id', 'policy_id', 'lob', 'application_data', 
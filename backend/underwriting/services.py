@@ -1,16 +1,28 @@
 import os
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
 import faiss
 import numpy as np
 import tiktoken
-from typing import List, Dict, Any, Tuple, Optional
-from langchain_groq import ChatGroq
+from typing import List, Dict, Any, Iterable, Tuple, Optional, Union
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.graph import StateGraph, END, MessagesState
 from datetime import datetime
 import json
 import requests
 import logging
+from django.conf import settings
+from django.db import connection
+from item_api import resources
+from . import metrics
+from .llm import LLMGateway, get_llm
+from .bm25 import BM25Index
+from .chunk_store import ChunkStore
+from .locks import ReadWriteLock
 from .models import Policy, Claim, Regulation
+from . import vector_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,32 +47,113 @@ class UnderwritingState(MessagesState):
 
 
 _EMBEDDING_SERVICE_INSTANCE = None
+_EMBEDDING_SERVICE_LOCK = threading.Lock()
 
 def get_embedding_service():
     global _EMBEDDING_SERVICE_INSTANCE
     if _EMBEDDING_SERVICE_INSTANCE is None:
-        _EMBEDDING_SERVICE_INSTANCE = EmbeddingService()
-        logger.info("Created new EmbeddingService singleton instance")
+        with _EMBEDDING_SERVICE_LOCK:
+            # Re-check under the lock so concurrent first requests share one instance
+            if _EMBEDDING_SERVICE_INSTANCE is None:
+                index_dir = settings.UNDERWRITING_INDEX_DIR
+                if EmbeddingService.exists(index_dir):
+                    _EMBEDDING_SERVICE_INSTANCE = EmbeddingService.load(index_dir)
+                    logger.info("Loaded EmbeddingService singleton from %s", index_dir)
+                else:
+                    _EMBEDDING_SERVICE_INSTANCE = EmbeddingService()
+                    logger.info("Created new EmbeddingService singleton instance")
     return _EMBEDDING_SERVICE_INSTANCE
 
 
 class EmbeddingService:
-    """Service for handling text embeddings and vector storage"""
-    
-    def __init__(self):
+    """Service for handling text embeddings and vector storage.
+
+    Safe to share between threads: searches run in parallel under a read lock, while index
+    writes are serialized under a write lock so FAISS ids always match chunk store positions.
+    """
+
+    INDEX_FILE = "index.faiss"
+    PENDING_FILE = "pending.npy"
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, index_type: Optional[str] = None):
         """Initialize the embedding service with a FAISS index"""
         self.dimension = 1536 
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.chunk_metadata = []
+        # FAISS sizes its OpenMP pool to every core unless told otherwise
+        resources.limit_faiss(faiss)
+        self.index_type = index_type or settings.UNDERWRITING_INDEX_TYPE
+        self.index = vector_index.build_index(self.dimension, self.index_type, settings.UNDERWRITING_PQ_SUBQUANTIZERS)
+        self.chunks = ChunkStore()
+        self.lexical_index = BM25Index()
+        self.manifest = {}
+        self._lock = ReadWriteLock()
+        # Embeddings held back until a quantizing index has enough of them to train on. Their chunks
+        # are already in the chunk store (as the ids after index.ntotal) and served by an exact scan.
+        self._training_buffer = []
+        # Bumped on every index change; part of every retrieval cache key
+        self.generation = 0
+        self._result_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
         self.encoding = tiktoken.get_encoding("gpt2")
-        logger.info(f"EmbeddingService initialized with {self.dimension}-dimensional FAISS index")
+        logger.info("EmbeddingService initialized with %s-dimensional '%s' FAISS index", self.dimension, self.index_type)
+
+    @classmethod
+    def exists(cls, index_dir) -> bool:
+        """Return True if a persisted index is present in index_dir"""
+        return os.path.exists(os.path.join(index_dir, cls.MANIFEST_FILE))
+
+    @classmethod
+    def load(cls, index_dir) -> "EmbeddingService":
+        """Load an index previously written by save()"""
+        with open(os.path.join(index_dir, cls.MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        # The persisted layout wins over UNDERWRITING_INDEX_TYPE; rebuild the index to change it
+        service = cls(index_type=manifest.get("index_type", "flat"))
+        service.manifest = manifest
+        service.index = faiss.read_index(os.path.join(index_dir, cls.INDEX_FILE))
+        service.chunks = ChunkStore.load(index_dir)
+        pending_path = os.path.join(index_dir, cls.PENDING_FILE)
+        if os.path.exists(pending_path):
+            pending = np.load(pending_path)
+            if len(pending):
+                service._training_buffer = [pending]
+        # The lexical index is cheap to rebuild from the stored chunk text, so it is not persisted
+        service.lexical_index.add(list(service.chunks.texts()))
+        logger.info("Loaded %s vectors from %s", service.index.ntotal, index_dir)
+        return service
+
+    def save(self, index_dir, **manifest) -> None:
+        """Persist the index, chunk metadata and a manifest; files are swapped in atomically"""
+        os.makedirs(index_dir, exist_ok=True)
+        self.flush_training_buffer()
+
+        # Hold the read lock so the index and metadata are written as one consistent snapshot
+        with self._lock.read_lock():
+            self.manifest = {**self.manifest, **manifest, "dimension": self.dimension,
+                             "index_type": self.index_type, "total_vectors": self.index.ntotal}
+            faiss.write_index(self.index, os.path.join(index_dir, self.INDEX_FILE + ".tmp"))
+            # Chunks too few to train on are kept with their embeddings and served exactly after load
+            with open(os.path.join(index_dir, self.PENDING_FILE + ".tmp"), "wb") as f:
+                np.save(f, self._pending_embeddings())
+            self.chunks.save(index_dir, suffix=".tmp")
+            with open(os.path.join(index_dir, self.MANIFEST_FILE + ".tmp"), "w") as f:
+                json.dump(self.manifest, f, indent=2)
+
+        # The manifest goes last so a reader never sees a manifest without its data
+        for name in (self.INDEX_FILE, self.PENDING_FILE, *ChunkStore.FILES, self.MANIFEST_FILE):
+            os.replace(os.path.join(index_dir, name + ".tmp"), os.path.join(index_dir, name))
+        logger.info("Saved %s vectors to %s", self.index.ntotal, index_dir)
     
-    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-        """Split text into overlapping chunks by tokens"""
+    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50,
+                   tokens: Optional[List[int]] = None) -> List[str]:
+        """Split text into overlapping chunks by tokens (pass tokens if text is already encoded)"""
         if not text or not text.strip():
             return []
             
-        tokens = self.encoding.encode(text)
+        if tokens is None:
+            tokens = self.encoding.encode(text)
         chunks = []
         
         if len(tokens) <= chunk_size:
@@ -70,7 +163,7 @@ class EmbeddingService:
             chunk = self.encoding.decode(tokens[i:i + chunk_size])
             chunks.append(chunk)
             
-        logger.info(f"Chunked text into {len(chunks)} chunks (avg {len(text)/len(chunks):.1f} chars/chunk)")
+        logger.info("Chunked text into %s chunks (avg %.1f chars/chunk)", len(chunks), len(text)/len(chunks))
         return chunks
     
     def get_embeddings(self, texts: List[str]) -> np.ndarray:
@@ -81,114 +174,437 @@ class EmbeddingService:
                 embeddings.append(np.zeros(self.dimension))
                 continue
 
-            text_hash = hash(text) % 100000
-            np.random.seed(text_hash)
-            embedding = np.random.rand(self.dimension)
+            # crc32 rather than hash() so embeddings are stable across processes and restarts
+            text_hash = zlib.crc32(text.encode("utf-8")) % 100000
+            embedding = np.random.RandomState(text_hash).rand(self.dimension)
             embedding = embedding / np.linalg.norm(embedding)
             embeddings.append(embedding)
         
+        metrics.EMBEDDINGS.inc(len(texts))
+        metrics.record('embeddings', len(texts))
         return np.array(embeddings, dtype=np.float32)
     
     def add_to_index(self, texts: List[str], source: str, doc_id: str) -> int:
         """Add text chunks to FAISS index and return number of chunks added"""
         if not texts:
-            logger.warning(f"No texts provided for source: {source}, doc_id: {doc_id}")
+            logger.warning("No texts provided for source: %s, doc_id: %s", source, doc_id)
             return 0
-            
-        # Chunk all texts
+
+        return self.add_documents([(text, source, doc_id) for text in texts])
+
+    def add_documents(self, documents: List[Tuple[str, str, str]]) -> int:
+        """Chunk and embed a batch of (text, source, doc_id) documents with a single index add"""
+        chunk_metadata, embeddings_array = self.embed_documents(documents)
+        if not chunk_metadata:
+            logger.warning("No valid chunks created for %s documents", len(documents))
+            return 0
+
+        return self.add_embeddings(embeddings_array, chunk_metadata)
+
+    def index_documents(self, documents: List[Tuple[str, str, str]]) -> int:
+        """Like add_documents, but skip documents whose (source, doc_id) is already indexed"""
+        pending = [doc for doc in documents if not self.chunks.has_document(doc[1], doc[2])]
+        if not pending:
+            return 0
+
+        # Another thread may index the same documents while we embed, so re-check under the write lock
+        chunk_metadata, embeddings_array = self.embed_documents(pending)
+        if not chunk_metadata:
+            return 0
+        return self.add_embeddings(embeddings_array, chunk_metadata, skip_indexed=True)
+
+    def update_documents(self, documents: List[Tuple[str, str, str]]) -> int:
+        """Re-index documents whose text changed: their old chunks are retired and the new ones added"""
+        chunk_metadata, embeddings_array = self.embed_documents(documents)
+        with self._lock.write_lock():
+            self._retire_locked({(source, doc_id) for _, source, doc_id in documents})
+            if not chunk_metadata:
+                return 0
+            return self._add_locked(embeddings_array, chunk_metadata)
+
+    def retire_documents(self, keys) -> int:
+        """Retire every indexed or buffered chunk of the given (source, doc_id) documents"""
+        with self._lock.write_lock():
+            return self._retire_locked(keys)
+
+    def _retire_locked(self, keys) -> int:
+        """retire_documents body; caller holds the write lock"""
+        keys = {(source, str(doc_id)) for source, doc_id in keys}
+        retired = sum(self.chunks.retire_document(source, doc_id) for source, doc_id in keys)
+        if retired:
+            self.generation += 1
+            logger.info("Retired %s stale chunks of %s updated documents", retired, len(keys))
+            if self.chunks.stale_count > settings.UNDERWRITING_INDEX_COMPACT_RATIO * len(self.chunks):
+                self._compact_locked()
+        return retired
+
+    def _compact_locked(self) -> None:
+        """Drop stale chunks from the chunk store, the vectors and the lexical index; caller holds the write lock"""
+        ntotal = self.index.ntotal
+        stale = np.flatnonzero(self.chunks.stale_mask()).astype(np.int64)
+        keep = self.chunks.compact()
+        # remove_ids shifts the remaining vectors down in order, matching the compacted chunk store
+        if len(stale) and stale[0] < ntotal:
+            self.index.remove_ids(stale[stale < ntotal])
+        if self._training_buffer:
+            pending = keep[keep >= ntotal] - ntotal
+            self._training_buffer = [self._pending_embeddings()[pending]] if len(pending) else []
+
+        self.lexical_index = BM25Index(self.lexical_index.k1, self.lexical_index.b)
+        self.lexical_index.add(list(self.chunks.texts()))
+        self.generation += 1
+        logger.info("Compacted %s stale chunks out of the index, %s remain", len(stale), len(self.chunks))
+
+    def embed_documents(self, documents: List[Tuple[str, str, str]]) -> Tuple[List[Dict], np.ndarray]:
+        """Chunk and embed documents without touching the index; safe to run in worker processes"""
+        documents = [(text, source, doc_id) for text, source, doc_id in documents if text and isinstance(text, str)]
+        # tiktoken encodes a batch on its own thread pool, sized by the worker's thread budget
+        encoded = self.encoding.encode_batch([text for text, _, _ in documents],
+                                             num_threads=resources.threads('tiktoken') or 8)
         all_chunks = []
-        for text in texts:
-            if not text or not isinstance(text, str):
+        chunk_metadata = []
+        for (text, source, doc_id), tokens in zip(documents, encoded):
+            chunks = self.chunk_text(text, tokens=tokens)
+            if not chunks:
+                logger.warning("No valid chunks created for source: %s, doc_id: %s", source, doc_id)
                 continue
-            chunks = self.chunk_text(text)
             all_chunks.extend(chunks)
-        
+            for i, chunk in enumerate(chunks):
+                chunk_metadata.append({
+                    'source': source,
+                    'doc_id': doc_id,
+                    'chunk_index': i,
+                    'text': chunk
+                })
+
         if not all_chunks:
-            logger.warning(f"No valid chunks created for source: {source}, doc_id: {doc_id}")
+            return [], np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Generate embeddings for all chunks in one batch
+        return chunk_metadata, self.get_embeddings(all_chunks)
+
+    def add_embeddings(self, embeddings_array: np.ndarray, chunk_metadata: List[Dict], skip_indexed: bool = False) -> int:
+        """Add precomputed chunk embeddings and their metadata to the index"""
+        with self._lock.write_lock():
+            return self._add_locked(embeddings_array, chunk_metadata, skip_indexed)
+
+    def _add_locked(self, embeddings_array: np.ndarray, chunk_metadata: List[Dict], skip_indexed: bool = False) -> int:
+        """add_embeddings body; caller holds the write lock"""
+        if skip_indexed:
+            # Buffered chunks are in the chunk store too, so this also skips documents awaiting training
+            keep = [i for i, chunk in enumerate(chunk_metadata)
+                    if not self.chunks.has_document(chunk['source'], chunk['doc_id'])]
+            if len(keep) < len(chunk_metadata):
+                embeddings_array = embeddings_array[keep]
+                chunk_metadata = [chunk_metadata[i] for i in keep]
+            if not chunk_metadata:
+                return 0
+
+        if not self.index.is_trained:
+            self._training_buffer.append(embeddings_array)
+            self._append_chunks(chunk_metadata)
+            buffered_count = len(self.chunks) - self.index.ntotal
+            if buffered_count < settings.UNDERWRITING_INDEX_TRAINING_SIZE:
+                logger.info("Buffered %s chunks until the '%s' index can be trained", buffered_count, self.index_type)
+                return len(chunk_metadata)
+            self._train_and_flush()
+            return len(chunk_metadata)
+
+        # FAISS assigns ids sequentially, so the next id must equal the next metadata position
+        start_id = self.index.ntotal
+        if start_id != len(self.chunks):
+            logger.error("FAISS index (%s) and chunk store (%s) are out of sync", start_id, len(self.chunks))
             return 0
-            
-        # Generate embeddings for all chunks
-        start_idx = len(self.chunk_metadata) 
-        embeddings_array = self.get_embeddings(all_chunks)
-        
+
         try:
             self.index.add(embeddings_array)
-            logger.info(f"Added {len(all_chunks)} chunks to index for {source} {doc_id}")
         except Exception as e:
-            logger.error(f"Error adding to FAISS index: {str(e)}")
+            logger.error("Error adding to FAISS index: %s", e)
             return 0
-        
-        # Store metadata for each chunk
-        for i, chunk in enumerate(all_chunks):
-            self.chunk_metadata.append({
-                'source': source,
-                'doc_id': doc_id,
-                'chunk_index': i,
-                'text': chunk
-            })
-        
-        logger.info(f"Index now contains {self.index.ntotal} vectors, {len(self.chunk_metadata)} chunks with metadata")
-        return len(all_chunks)
-    
+
+        self._append_chunks(chunk_metadata)
+        logger.info("Added %s chunks to index as ids %s-%s", len(chunk_metadata), start_id, self.index.ntotal - 1)
+        return len(chunk_metadata)
+
+    def _append_chunks(self, chunk_metadata: List[Dict]) -> None:
+        """Store metadata for each chunk and index its terms under the next ids; caller holds the write lock"""
+        self.chunks.append(chunk_metadata)
+        self.lexical_index.add([chunk['text'] for chunk in chunk_metadata])
+        self.generation += 1
+
+        for chunk in chunk_metadata:
+            metrics.CHUNKS_INDEXED.inc(source=chunk['source'])
+        metrics.record('chunks_indexed', len(chunk_metadata))
+
+    def flush_training_buffer(self) -> int:
+        """Train on whatever is buffered (if enough to train at all) and add it to the index"""
+        with self._lock.write_lock():
+            if not self._training_buffer:
+                return 0
+            buffered_count = len(self.chunks) - self.index.ntotal
+            if buffered_count < vector_index.min_training_points(self.index):
+                logger.warning("Only %s chunks buffered; the '%s' index needs %s to train, so they stay on exact search",
+                               buffered_count, self.index_type, vector_index.min_training_points(self.index))
+                return 0
+            return self._train_and_flush()
+
+    def _train_and_flush(self) -> int:
+        """Train the index on the buffered embeddings and add them; caller holds the write lock"""
+        embeddings_array = self._pending_embeddings()
+        self._training_buffer = []
+
+        self.index.train(embeddings_array)
+        # Buffered chunks are the ids from ntotal on, so adding them in order keeps ids aligned
+        self.index.add(embeddings_array)
+        # Quantized scores differ slightly from the exact ones served so far
+        self.generation += 1
+        logger.info("Trained '%s' index on %s chunks", self.index_type, len(embeddings_array))
+        return len(embeddings_array)
+
+    def _pending_embeddings(self) -> np.ndarray:
+        """Embeddings of the chunks not yet in the FAISS index, in id order"""
+        if not self._training_buffer:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.vstack(self._training_buffer)
+
+    def _vector_search(self, query_embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (distances, ids) of live chunks per query; caller holds the read lock.
+
+        Stale chunks are skipped: the search over-fetches by at most k and only widens when a query's
+        nearest vectors were mostly stale. Rows with fewer than k results are padded with id -1.
+        """
+        total = len(self.chunks)
+        fetch = min(k + min(self.chunks.stale_count, k), total)
+        stale = self.chunks.stale_mask()
+        while True:
+            distances, ids = self._nearest(query_embeddings, fetch)
+            live = ids >= 0
+            live[live] = ~stale[ids[live]]
+            if fetch >= total or (live.sum(axis=1) >= k).all():
+                break
+            fetch = min(fetch * 2, total)
+
+        # Live hits first, each row still in distance order
+        order = np.argsort(~live, axis=1, kind='stable')[:, :k]
+        distances, ids = np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+        ids = np.where(np.take_along_axis(live, order, axis=1), ids, -1)
+        return distances, ids
+
+    def _nearest(self, query_embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (distances, ids) per query over the index and, exactly, over buffered embeddings.
+
+        Caller holds the read lock. Rows with fewer than k results are padded with id -1.
+        """
+        queries = len(query_embeddings)
+        distances = np.zeros((queries, 0), dtype=np.float32)
+        ids = np.zeros((queries, 0), dtype=np.int64)
+        if self.index.ntotal:
+            scores, ids = self.index.search(query_embeddings, min(k, self.index.ntotal))
+            distances = vector_index.to_distances(self.index, scores)
+        if not self._training_buffer:
+            return distances, ids
+
+        # Squared L2 distances to every buffered embedding, scanned array by array to avoid a copy
+        start = self.index.ntotal
+        query_norms = (query_embeddings * query_embeddings).sum(axis=1)[:, None]
+        all_distances, all_ids = [distances], [ids]
+        for embeddings in self._training_buffer:
+            pending = query_norms + (embeddings * embeddings).sum(axis=1)[None, :] - 2.0 * query_embeddings @ embeddings.T
+            all_distances.append(np.maximum(pending, 0.0))
+            all_ids.append(np.broadcast_to(np.arange(start, start + len(embeddings)), pending.shape))
+            start += len(embeddings)
+        distances, ids = np.hstack(all_distances), np.hstack(all_ids)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def _cache_get(self, key: Tuple) -> Optional[List[Dict]]:
+        """Return cached results for key at the current index generation, or None"""
+        if settings.UNDERWRITING_RETRIEVAL_CACHE_SIZE <= 0:
+            return None
+        key = key + (self.generation,)
+        with self._cache_lock:
+            results = self._result_cache.get(key)
+            if results is None:
+                self._cache_misses += 1
+                metrics.SEARCH_CACHE.inc(result='miss')
+                return None
+            self._result_cache.move_to_end(key)
+            self._cache_hits += 1
+        metrics.SEARCH_CACHE.inc(result='hit')
+        return [dict(result) for result in results]
+
+    def _cache_put(self, key: Tuple, generation: int, results: List[Dict]) -> None:
+        """Store results computed against the given index generation"""
+        max_size = settings.UNDERWRITING_RETRIEVAL_CACHE_SIZE
+        if max_size <= 0:
+            return
+        with self._cache_lock:
+            self._result_cache[key + (generation,)] = [dict(result) for result in results]
+            self._result_cache.move_to_end(key + (generation,))
+            # Entries from older generations can never hit again, so they age out first in practice
+            while len(self._result_cache) > max_size:
+                self._result_cache.popitem(last=False)
+
+    @staticmethod
+    def _query_hash(queries: List[str]) -> str:
+        return hashlib.sha1("\x1f".join(queries).encode("utf-8")).hexdigest()
+
     def search(self, query: str, k: int = 5) -> List[Dict]:
         """Search for relevant chunks using the query"""
         if not query or not query.strip():
             logger.warning("Empty query provided for search")
             return []
+
+        cache_key = ("vector", self._query_hash([query]), k)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
             
-        if self.index.ntotal == 0:
-            logger.warning("Search called on empty FAISS index")
-            return []
-        
-        # Limit k to the number of vectors we have
-        k = min(k, self.index.ntotal)
-        
         # Get embedding for query
         query_embedding = self.get_embeddings([query])[0].reshape(1, -1)
         
         try:
-            # Search the index
-            distances, indices = self.index.search(query_embedding, k)
-            
-            # Process search results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx >= 0 and idx < len(self.chunk_metadata):
-                    result = self.chunk_metadata[idx].copy()
-                    result['distance'] = float(distances[0][i])
+            with self._lock.read_lock():
+                generation = self.generation
+                if len(self.chunks) == 0:
+                    logger.warning("Search called on empty FAISS index")
+                    return []
+
+                with metrics.timer(metrics.SEARCH_SECONDS, stage='search', kind='vector'):
+                    distances, indices = self._vector_search(query_embedding, k)
+
+                # Process search results
+                results = []
+                for i, idx in enumerate(indices[0]):
+                    if idx >= 0:
+                        result = self.chunks.get(idx)
+                        result['distance'] = float(distances[0][i])
+                        results.append(result)
+            
+            logger.info("Search for '%s...' returned %s results", query[:30], len(results))
+            self._cache_put(cache_key, generation, results)
+            return results
+        except Exception as e:
+            logger.error("Error searching FAISS index: %s", e)
+            return []
+
+    def hybrid_search(self, queries: Union[str, List[str]], k: int = 5, candidates: Optional[int] = None,
+                      rrf_k: int = 60, sources: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Fuse FAISS and BM25 rankings for one or more queries with reciprocal rank fusion.
+
+        All queries are embedded as one batch and searched with a single (m, d) index.search call.
+        Each query contributes a vector and a lexical ranking of its top `candidates` chunks
+        (default 4 * k); a chunk scores sum(1 / (rrf_k + rank)) over every ranking it appears in,
+        so results are deduplicated by chunk id and exact hits on section numbers, VINs or claim
+        codes surface even when their embeddings are not close to the query.
+
+        `sources` restricts results to chunks from those sources. Results are cached per
+        (queries, k, candidates, rrf_k, sources) until the index next changes.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        queries = [query for query in queries if query and query.strip()]
+        if not queries:
+            logger.warning("Empty query provided for hybrid search")
+            return []
+
+        candidates = candidates or k * 4
+        sources = frozenset(sources) if sources else None
+        cache_key = ("hybrid", self._query_hash(queries), k, candidates, rrf_k, sources)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        query_embeddings = self.get_embeddings(queries)
+
+        try:
+            with self._lock.read_lock():
+                generation = self.generation
+                if len(self.chunks) == 0:
+                    logger.warning("Hybrid search called on empty index")
+                    return []
+
+                skip = self.chunks.stale_mask() if self.chunks.stale_count else None
+                with metrics.timer(metrics.SEARCH_SECONDS, stage='search', kind='hybrid'):
+                    distances, indices = self._vector_search(query_embeddings, candidates)
+
+                    fused = {}
+                    for row, query in enumerate(queries):
+                        rank = 0
+                        for idx, distance in zip(indices[row], distances[row]):
+                            if idx < 0:
+                                break
+                            rank += 1
+                            entry = fused.setdefault(int(idx), {'rrf_score': 0.0, 'distance': None, 'bm25_score': None})
+                            entry['rrf_score'] += 1.0 / (rrf_k + rank)
+                            if entry['distance'] is None or distance < entry['distance']:
+                                entry['distance'] = float(distance)
+
+                        lexical = self.lexical_index.search(query, candidates, skip=skip)
+                        for rank, (idx, bm25_score) in enumerate(lexical, start=1):
+                            entry = fused.setdefault(idx, {'rrf_score': 0.0, 'distance': None, 'bm25_score': None})
+                            entry['rrf_score'] += 1.0 / (rrf_k + rank)
+                            entry['bm25_score'] = max(entry['bm25_score'] or 0.0, bm25_score)
+
+                results = []
+                for idx, scores in sorted(fused.items(), key=lambda item: item[1]['rrf_score'], reverse=True):
+                    if sources and self.chunks.source(idx) not in sources:
+                        continue
+                    result = self.chunks.get(idx)
+                    result.update(scores)
                     results.append(result)
-            
-            logger.info(f"Search for '{query[:30]}...' returned {len(results)} results")
+                    if len(results) == k:
+                        break
+
+            logger.info("Hybrid search for %s queries returned %s results from %s candidates",
+                        len(queries), len(results), len(fused))
+            self._cache_put(cache_key, generation, results)
             return results
         except Exception as e:
-            logger.error(f"Error searching FAISS index: {str(e)}")
+            logger.error("Error in hybrid search: %s", e)
             return []
             
     def get_stats(self) -> Dict:
         """Return statistics about the embedding service"""
-        sources = {}
-        for chunk in self.chunk_metadata:
-            source = chunk['source']
-            if source not in sources:
-                sources[source] = 0
-            sources[source] += 1
-            
-        return {
-            "total_vectors": self.index.ntotal,
-            "total_chunks": len(self.chunk_metadata),
-            "chunks_by_source": sources,
-            "dimension": self.dimension
-        }
+        # Counters are maintained on append, so this is O(number of sources)
+        with self._lock.read_lock():
+            return {
+                "total_vectors": self.index.ntotal,
+                "total_chunks": len(self.chunks),
+                "buffered_chunks": len(self.chunks) - self.index.ntotal,
+                "stale_chunks": self.chunks.stale_count,
+                "chunks_by_source": self.chunks.counts_by_source(),
+                "dimension": self.dimension,
+                "generation": self.generation,
+                "cache": {
+                    "size": len(self._result_cache),
+                    "hits": self._cache_hits,
+                    "misses": self._cache_misses
+                }
+            }
     
 
 class UnderwritingWorkflow:
     """Main underwriting workflow using LangGraph"""
     
     def __init__(self):
-        self.llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.1)
+        self.llm = get_llm()
+        # Shared by every LLM call of this (process-wide) workflow
+        self.gateway = LLMGateway.from_settings(self.llm)
         self.embedding_service = get_embedding_service()
         self.workflow = self._build_workflow()
     
+    def _invoke_llm(self, messages: List, operation: str):
+        """Call the LLM, recording its latency and token usage under the given operation"""
+        with metrics.timer(metrics.LLM_SECONDS, stage='llm', operation=operation):
+            response = self.gateway.invoke(messages)
+        usage = getattr(response, "usage_metadata", None) or {}
+        for token_type in ("input_tokens", "output_tokens"):
+            if usage.get(token_type):
+                metrics.LLM_TOKENS.inc(usage[token_type], operation=operation, type=token_type.split("_")[0])
+                metrics.record(f'llm_{token_type}', usage[token_type])
+        return response
+
     def fetch_context_data(self, state: UnderwritingState) -> Dict:
         """Fetch context data from databases"""
         try:
@@ -197,34 +613,34 @@ class UnderwritingWorkflow:
             policy_id = state.get("policy_id", "")
             lob = state.get("lob", "")
             
-            logger.info(f"Fetching data for applicant={applicant_id}, policy={policy_id}, lob={lob}")
+            logger.info("Fetching data for applicant=%s, policy=%s, lob=%s", applicant_id, policy_id, lob)
             
             # Fetch policy data
             policy = Policy.objects.filter(policy_id=policy_id).first()
             if policy:
                 policy_text = policy.text
-                logger.info(f"Found policy {policy_id}: {len(policy_text)} chars")
+                logger.info("Found policy %s: %s chars", policy_id, len(policy_text))
             else:
                 policy_text = ""
-                logger.warning(f"No policy found with ID {policy_id}")
+                logger.warning("No policy found with ID %s", policy_id)
             
             # Fetch claims data
             claims = Claim.objects.filter(applicant_id=applicant_id)
             if claims.exists():
                 claims_text = " ".join([claim.text for claim in claims])
-                logger.info(f"Found {claims.count()} claims for applicant {applicant_id}: {len(claims_text)} chars")
+                logger.info("Found %s claims for applicant %s: %s chars", len(claims), applicant_id, len(claims_text))
             else:
                 claims_text = ""
-                logger.warning(f"No claims found for applicant {applicant_id}")
+                logger.warning("No claims found for applicant %s", applicant_id)
             
             # Fetch regulations data
             regulations = Regulation.objects.filter(lob=lob)
             if regulations.exists():
                 regulations_text = " ".join([reg.text for reg in regulations])
-                logger.info(f"Found {regulations.count()} regulations for LOB {lob}: {len(regulations_text)} chars")
+                logger.info("Found %s regulations for LOB %s: %s chars", len(regulations), lob, len(regulations_text))
             else:
                 regulations_text = ""
-                logger.warning(f"No regulations found for LOB {lob}")
+                logger.warning("No regulations found for LOB %s", lob)
             
             return {
                 "messages": [AIMessage(content=f"📋 Data Fetcher: Retrieved policy ({len(policy_text)} chars), {claims.count()} claims, and {regulations.count()} regulations")],
@@ -234,12 +650,28 @@ class UnderwritingWorkflow:
                 "current_step": "embed_and_retrieve"
             }
         except Exception as e:
-            logger.error(f"Error fetching context data: {str(e)}", exc_info=True)
+            logger.error("Error fetching context data: %s", e, exc_info=True)
             return {
                 "messages": [AIMessage(content=f"❌ Data Fetcher: Error fetching data - {str(e)}")],
                 "current_step": "error"
             }
     
+    def build_retrieval_queries(self, application_data: Dict) -> List[str]:
+        """Build one focused query per risk aspect plus a catch-all over every application field"""
+        coverage_type = application_data.get('coverage_type', '')
+        coverage_amount = application_data.get('coverage_amount', '')
+        other_fields = ', '.join([f"{k}: {v}" for k, v in application_data.items() 
+                                  if k not in ['coverage_type', 'coverage_amount']])
+
+        queries = [f"Application for {coverage_type} coverage amount {coverage_amount}. {other_fields}"]
+        if coverage_type or coverage_amount:
+            queries.append(f"{coverage_type} coverage limits, exclusions and requirements for amount {coverage_amount}")
+        if application_data.get('driving_record'):
+            queries.append(f"Driving record: {application_data['driving_record']}")
+        if application_data.get('previous_claims'):
+            queries.append(f"Claims history: {application_data['previous_claims']}")
+        return queries
+
     def embed_and_retrieve(self, state: UnderwritingState) -> Dict:
         """Chunk texts and retrieve relevant context using the embedding service"""
         try:
@@ -252,45 +684,41 @@ class UnderwritingWorkflow:
             claims_text = state.get("claims_text", "")
             regulations_text = state.get("regulations_text", "")
             
-            logger.info(f"Processing application for applicant {applicant_id}, policy {policy_id}, LOB {lob}")
+            logger.info("Processing application for applicant %s, policy %s, LOB %s", applicant_id, policy_id, lob)
             
             # Get or create embedding service from the singleton
             embedding_service = get_embedding_service()
             
             # Show stats before adding new content
-            before_stats = embedding_service.get_stats()
-            logger.info(f"Embedding service before adding new content: {before_stats}")
-            
-            # Create comprehensive search query from application data
-            coverage_type = application_data.get('coverage_type', '')
-            coverage_amount = application_data.get('coverage_amount', '')
-            other_fields = ', '.join([f"{k}: {v}" for k, v in application_data.items() 
-                                      if k not in ['coverage_type', 'coverage_amount']])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Embedding service before adding new content: %s", embedding_service.get_stats())
             
-            query = f"Application for {coverage_type} coverage amount {coverage_amount}. {other_fields}"
-            logger.info(f"Search query created: {query[:100]}...")
+            # Create focused search queries from application data
+            queries = self.build_retrieval_queries(application_data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Search queries created: %s", [query[:50] for query in queries])
             
             # Add documents to index with detailed logging
             chunks_added = 0
             if policy_text:
                 added = embedding_service.add_to_index([policy_text], "policy", policy_id)
-                logger.info(f"Added {added} policy chunks to index")
+                logger.info("Added %s policy chunks to index", added)
                 chunks_added += added
             
             if claims_text:
                 added = embedding_service.add_to_index([claims_text], "claims", applicant_id)
-                logger.info(f"Added {added} claims chunks to index")
+                logger.info("Added %s claims chunks to index", added)
                 chunks_added += added
             
             if regulations_text:
                 added = embedding_service.add_to_index([regulations_text], "regulations", lob)
-                logger.info(f"Added {added} regulations chunks to index")
+                logger.info("Added %s regulations chunks to index", added)
                 chunks_added += added
             
             # Search for relevant chunks
-            logger.info(f"Searching for relevant chunks with query: {query[:50]}...")
-            relevant_chunks = embedding_service.search(query, k=15)
-            logger.info(f"Search returned {len(relevant_chunks)} chunks")
+            logger.info("Searching for relevant chunks with %s queries", len(queries))
+            relevant_chunks = embedding_service.hybrid_search(queries, k=15)
+            logger.info("Search returned %s chunks", len(relevant_chunks))
             
             # Separate chunks by source
             policy_chunks = [chunk['text'] for chunk in relevant_chunks if chunk['source'] == 'policy'][:5]
@@ -298,11 +726,12 @@ class UnderwritingWorkflow:
             regulations_chunks = [chunk['text'] for chunk in relevant_chunks if chunk['source'] == 'regulations'][:5]
             
             # Log the results
-            logger.info(f"Found {len(policy_chunks)} policy chunks, {len(claims_chunks)} claims chunks, {len(regulations_chunks)} regulation chunks")
+            logger.info("Found %s policy chunks, %s claims chunks, %s regulation chunks",
+                        len(policy_chunks), len(claims_chunks), len(regulations_chunks))
             
             # Show stats after processing
-            after_stats = embedding_service.get_stats()
-            logger.info(f"Embedding service after processing: {after_stats}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Embedding service after processing: %s", embedding_service.get_stats())
             
             message = f"🔍 Embedding Service: Added {chunks_added} chunks and retrieved {len(relevant_chunks)} relevant chunks"
             if not relevant_chunks:
@@ -316,7 +745,7 @@ class UnderwritingWorkflow:
                 "current_step": "summarize_risk"
             }
         except Exception as e:
-            logger.error(f"Error in embed_and_retrieve: {str(e)}", exc_info=True)
+            logger.error("Error in embed_and_retrieve: %s", e, exc_info=True)
             return {
                 "messages": [AIMessage(content=f"❌ Embedding Service: Error - {str(e)}")],
                 "current_step": "error"
@@ -360,7 +789,7 @@ RECOMMENDATIONS: [Coverage recommendations and risk mitigation suggestions]
 
 Focus on concrete, actionable risk factors based on the application data."""
             
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = self._invoke_llm([HumanMessage(content=prompt)], "summarize_risk")
             
             # Parse the structured response
             content = response.content
@@ -456,7 +885,7 @@ Include:
 3. Recommended actions
 4. Risk mitigation strategies"""
             
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = self._invoke_llm([HumanMessage(content=prompt)], "explain_flag")
             
             return {
                 "messages": [AIMessage(content="📝 Explanation Generator: Detailed explanation provided")],
@@ -487,10 +916,10 @@ Include:
         """Build the LangGraph workflow"""
         workflow = StateGraph(UnderwritingState)
         
-        # Add nodes
-        workflow.add_node("fetch_context", self.fetch_context_data)
-        workflow.add_node("embed_and_retrieve", self.embed_and_retrieve)
-        workflow.add_node("summarize_risk", self.summarize_risk)
+        # Add nodes, each timed into underwriting_node_seconds
+        workflow.add_node("fetch_context", metrics.timed_node("fetch_context", self.fetch_context_data))
+        workflow.add_node("embed_and_retrieve", metrics.timed_node("embed_and_retrieve", self.embed_and_retrieve))
+        workflow.add_node("summarize_risk", metrics.timed_node("summarize_risk", self.summarize_risk))
         
         # Set entry point
         workflow.set_entry_point("fetch_context")
@@ -526,7 +955,12 @@ Include:
         return workflow.compile()
     
     def process_application(self, applicant_id: str, policy_id: str, lob: str, application_data: Dict) -> Dict:
-        """Process an underwriting application"""
+        """Process an underwriting application, counting its queries and timing it end to end"""
+        with connection.execute_wrapper(metrics.count_queries), \
+                metrics.timer(metrics.APPLICATION_SECONDS, stage='total'):
+            return self._process_application(applicant_id, policy_id, lob, application_data)
+
+    def _process_application(self, applicant_id: str, policy_id: str, lob: str, application_data: Dict) -> Dict:
         # Create initial state dictionary
         initial_state = {
             "applicant_id": applicant_id,
@@ -538,45 +972,37 @@ Include:
         }
         
         # Debug the workflow execution
-        logger.info(f"Starting workflow with initial state: applicant={applicant_id}, policy={policy_id}, lob={lob}")
+        logger.info("Starting workflow with initial state: applicant=%s, policy=%s, lob=%s",
+                    applicant_id, policy_id, lob)
         
-        # Since we're using the singleton embedding service, let's try adding the content directly here
-        # This is a workaround to ensure the embedding service has data
+        # Index any referenced documents that the offline build (manage.py build_index) has not covered yet
         try:
             # Get embedding service singleton
             embedding_service = get_embedding_service()
             
-            # Direct database access to get the data
-            policy = Policy.objects.filter(policy_id=policy_id).first()
-            claims = Claim.objects.filter(applicant_id=applicant_id)
-            regulations = Regulation.objects.filter(lob=lob)
-            
-            # Add texts to index directly
+            documents = []
+            policy = Policy.objects.filter(policy_id=policy_id).only('policy_id', 'text').first()
             if policy:
-                embedding_service.add_to_index([policy.text], "policy", policy_id)
-                logger.info(f"Directly added policy text to index (policy_id={policy_id})")
-                
-            if claims.exists():
-                claims_text = " ".join([claim.text for claim in claims])
-                embedding_service.add_to_index([claims_text], "claims", applicant_id)
-                logger.info(f"Directly added claims text to index (applicant_id={applicant_id})")
-                
-            if regulations.exists():
-                regulations_text = " ".join([reg.text for reg in regulations])
-                embedding_service.add_to_index([regulations_text], "regulations", lob)
-                logger.info(f"Directly added regulations text to index (lob={lob})")
+                documents.append((policy.text, "policy", policy.policy_id))
+            for claim in Claim.objects.filter(applicant_id=applicant_id).only('claim_id', 'text'):
+                documents.append((claim.text, "claims", claim.claim_id))
+            for regulation in Regulation.objects.filter(lob=lob).only('regulation_id', 'text'):
+                documents.append((regulation.text, "regulations", regulation.regulation_id))
+            
+            added = embedding_service.index_documents(documents)
+            logger.info("Indexed %s new chunks for %s referenced documents", added, len(documents))
             
         except Exception as e:
-            logger.error(f"Error pre-populating embedding service: {str(e)}")
+            logger.error("Error pre-populating embedding service: %s", e)
         
         # Now run the workflow
         result = self.workflow.invoke(initial_state)
         
         # Log the final embedding service state
-        try:
-            stats = embedding_service.get_stats()
-            logger.info(f"Final embedding service stats: {stats}")
-        except Exception as e:
-            logger.error(f"Error getting final embedding stats: {str(e)}")
-            
+        if logger.isEnabledFor(logging.DEBUG):
+            try:
+                logger.debug("Final embedding service stats: %s", get_embedding_service().get_stats())
+            except Exception as e:
+                logger.error("Error getting final embedding stats: %s", e)
+
         return result
@@ -0,0 +1,1105 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import numpy as np
+from django.conf import settings
+from django.contrib.admin.sites import site as admin_site
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from item_api.metrics import Histogram
+from item_api.renderers import ORJSONRenderer
+from . import accessors, metrics, search, services, vector_index
+from .bm25 import BM25Index, tokenize
+from .chunk_store import ChunkStore
+from .llm import AIMDLimiter, LLMDeadlineExceeded, LLMGateway, StubChatModel, TokenBucket, get_llm
+from .locks import ReadWriteLock, SingleFlight
+from .models import Claim, Policy, Regulation, UnderwritingApplication
+from .serializers import PolicySerializer, UnderwritingApplicationSerializer
+from .services import EmbeddingService, get_embedding_service
+from .views import UnderwritingViewSet
+
+
+class ReadWriteLockTests(SimpleTestCase):
+    def test_readers_share_and_writers_exclude(self):
+        lock = ReadWriteLock()
+        active = {'readers': 0, 'writers': 0, 'max_readers': 0, 'violations': 0}
+        guard = threading.Lock()
+        barrier = threading.Barrier(8)
+
+        def reader():
+            barrier.wait()
+            for _ in range(200):
+                with lock.read_lock():
+                    with guard:
+                        active['readers'] += 1
+                        active['max_readers'] = max(active['max_readers'], active['readers'])
+                        if active['writers']:
+                            active['violations'] += 1
+                    with guard:
+                        active['readers'] -= 1
+
+        def writer():
+            barrier.wait()
+            for _ in range(200):
+                with lock.write_lock():
+                    with guard:
+                        active['writers'] += 1
+                        if active['writers'] > 1 or active['readers']:
+                            active['violations'] += 1
+                    with guard:
+                        active['writers'] -= 1
+
+        threads = [threading.Thread(target=reader) for _ in range(6)] + [threading.Thread(target=writer) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(active['violations'], 0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        runs, results = [], []
+
+        def compute():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 4)
+        # Once finished, the key runs again
+        self.assertEqual(flight.do('key', lambda: 'again'), ('again', False))
+
+    def test_exceptions_are_raised_and_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('key', lambda: int('x'))
+        self.assertEqual(flight.do('key', lambda: 1), (1, False))
+
+
+class ChunkStoreTests(SimpleTestCase):
+    def test_round_trip_and_append_after_load(self):
+        store = ChunkStore(capacity=2)
+        store.append([
+            {'source': 'policy', 'doc_id': 'P1', 'chunk_index': 0, 'text': 'Section 4.2 — théft'},
+            {'source': 'claims', 'doc_id': 'C1', 'chunk_index': 0, 'text': 'rear-end collision'},
+            {'source': 'policy', 'doc_id': 'P1', 'chunk_index': 1, 'text': 'exclusions'},
+        ])
+        directory = tempfile.mkdtemp()
+        store.save(directory)
+
+        loaded = ChunkStore.load(directory)
+        loaded.append([{'source': 'regulations', 'doc_id': 'auto', 'chunk_index': 0, 'text': 'VIN 1HGCM82633A004352'}])
+
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(loaded.get(0), {'source': 'policy', 'doc_id': 'P1', 'chunk_index': 0, 'text': 'Section 4.2 — théft'})
+        self.assertEqual(loaded.text(3), 'VIN 1HGCM82633A004352')
+        self.assertEqual(loaded.counts_by_source(), {'policy': 2, 'claims': 1, 'regulations': 1})
+        self.assertTrue(loaded.has_document('claims', 'C1'))
+        self.assertFalse(loaded.has_document('policy', 'C1'))
+
+
+    def test_retired_documents_stay_stale_after_load(self):
+        store = ChunkStore()
+        store.append([{'source': 'policy', 'doc_id': 'P1', 'chunk_index': i, 'text': f'old {i}'} for i in range(2)])
+        self.assertEqual(store.retire_document('policy', 'P1'), 2)
+        store.append([{'source': 'policy', 'doc_id': 'P1', 'chunk_index': 0, 'text': 'new'}])
+        directory = tempfile.mkdtemp()
+        store.save(directory)
+
+        loaded = ChunkStore.load(directory)
+        self.assertEqual([loaded.is_stale(i) for i in range(3)], [True, True, False])
+        self.assertEqual(loaded.stale_count, 2)
+        self.assertEqual(loaded.counts_by_source(), {'policy': 1})
+        self.assertTrue(loaded.has_document('policy', 'P1'))
+        self.assertEqual(loaded.retire_document('policy', 'P1'), 1)
+        self.assertFalse(loaded.has_document('policy', 'P1'))
+
+    def test_compact_drops_stale_chunks_and_keeps_order(self):
+        store = ChunkStore(capacity=2)
+        store.append([{'source': 'policy', 'doc_id': f'P{i % 2}', 'chunk_index': i, 'text': f'text {i} — é'} for i in range(5)])
+        store.retire_document('policy', 'P0')
+        directory = tempfile.mkdtemp()
+        store.save(directory)
+        loaded = ChunkStore.load(directory)
+
+        np.testing.assert_array_equal(loaded.compact(), [1, 3])
+        self.assertEqual((len(loaded), loaded.stale_count), (2, 0))
+        self.assertEqual(list(loaded.texts()), ['text 1 — é', 'text 3 — é'])
+        loaded.append([{'source': 'claims', 'doc_id': 'C1', 'chunk_index': 0, 'text': 'appended'}])
+        loaded.save(directory)
+        self.assertEqual(list(ChunkStore.load(directory).texts()), ['text 1 — é', 'text 3 — é', 'appended'])
+        self.assertEqual(loaded.get(1)['chunk_index'], 3)
+
+class BM25IndexTests(SimpleTestCase):
+    def test_tokenize_keeps_identifiers_whole_and_split(self):
+        self.assertEqual(tokenize("See § 4.2.1 for CLM-2023-0042"),
+                         ['see', '4.2.1', '4', '2', '1', 'for', 'clm-2023-0042', 'clm', '2023', '0042'])
+
+    def test_exact_identifier_ranks_first(self):
+        index = BM25Index()
+        index.add([
+            "rear-end collision reported, claim CLM-2023-0041 settled",
+            "windshield damage, claim CLM-2023-0042 pending, VIN 1HGCM82633A004352",
+            "section 4.2.1 requires a police report for collisions",
+        ])
+
+        self.assertEqual(index.search("history for CLM-2023-0042", k=1)[0][0], 1)
+        self.assertEqual(index.search("vin 1hgcm82633a004352", k=3)[0][0], 1)
+        self.assertEqual(index.search("section 4.2.1", k=1)[0][0], 2)
+        self.assertEqual(index.search("unrelated words", k=3), [])
+
+    def test_skipped_documents_are_not_ranked(self):
+        index = BM25Index()
+        index.add(["hail damage to roof", "hail damage to car", "flood damage"])
+
+        self.assertEqual([idx for idx, _ in index.search("hail damage", k=2, skip=np.array([True, False, False]))], [1, 2])
+        self.assertEqual(index.search("hail", k=2, skip=np.array([True, True, False])), [])
+
+
+class EmbeddingServiceConcurrencyTests(SimpleTestCase):
+    def test_singleton_is_created_once_under_contention(self):
+        services._EMBEDDING_SERVICE_INSTANCE = None
+        instances = []
+        barrier = threading.Barrier(16)
+
+        def fetch():
+            barrier.wait()
+            instances.append(get_embedding_service())
+
+        with override_settings(UNDERWRITING_INDEX_DIR=tempfile.mkdtemp()):
+            threads = [threading.Thread(target=fetch) for _ in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        services._EMBEDDING_SERVICE_INSTANCE = None
+
+        self.assertEqual(len({id(instance) for instance in instances}), 1)
+
+    def test_concurrent_add_and_search_keep_ids_aligned(self):
+        service = EmbeddingService()
+        writers, docs_per_writer, searchers = 8, 25, 8
+        errors = []
+        barrier = threading.Barrier(writers + searchers)
+
+        def add(writer_id):
+            barrier.wait()
+            for n in range(docs_per_writer):
+                doc_id = f"doc-{writer_id}-{n}"
+                service.add_to_index([f"document {doc_id} body"], f"source-{writer_id % 3}", doc_id)
+
+        def search(searcher_id):
+            barrier.wait()
+            for n in range(docs_per_writer):
+                query = f"document doc-{searcher_id % writers}-{n} body"
+                for result in service.search(query, k=3):
+                    # Every hit must carry the text that was embedded at that id
+                    if not result['text'].startswith("document doc-"):
+                        errors.append(result)
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=search, args=(i,)) for i in range(searchers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(service.index.ntotal, writers * docs_per_writer)
+        self.assertEqual(len(service.chunks), service.index.ntotal)
+
+        # The vector stored at each FAISS id must be the embedding of the metadata at that position
+        texts = list(service.chunks.texts())
+        stored = np.vstack([service.index.reconstruct(i) for i in range(service.index.ntotal)])
+        np.testing.assert_allclose(stored, service.get_embeddings(texts), rtol=1e-6)
+
+        # Exact-text queries find their own chunk first
+        for text in texts[:20]:
+            self.assertEqual(service.search(text, k=1)[0]['text'], text)
+
+    def test_index_documents_skips_documents_indexed_concurrently(self):
+        service = EmbeddingService()
+        documents = [(f"claim text {n}", "claims", f"C{n}") for n in range(20)]
+        barrier = threading.Barrier(8)
+
+        def index():
+            barrier.wait()
+            service.index_documents(documents)
+
+        threads = [threading.Thread(target=index) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(service.index.ntotal, len(documents))
+        self.assertEqual(len(service.chunks), len(documents))
+
+
+class RetrievalCacheTests(SimpleTestCase):
+    def test_results_are_cached_until_the_index_changes(self):
+        service = EmbeddingService()
+        service.add_documents([(f"regulation section {n}.1 text", "regulations", f"R{n}") for n in range(10)])
+
+        first = service.hybrid_search(["section 3.1", "regulation"], k=3)
+        second = service.hybrid_search(["section 3.1", "regulation"], k=3)
+        self.assertEqual(first, second)
+        self.assertEqual(service.get_stats()["cache"]["hits"], 1)
+
+        generation = service.generation
+        service.add_documents([("new section 3.1 amendment", "regulations", "R99")])
+        self.assertEqual(service.generation, generation + 1)
+
+        misses = service.get_stats()["cache"]["misses"]
+        service.hybrid_search(["section 3.1", "regulation"], k=3)
+        self.assertEqual(service.get_stats()["cache"]["hits"], 1)
+        self.assertEqual(service.get_stats()["cache"]["misses"], misses + 1)
+
+    def test_source_filter_is_part_of_the_key(self):
+        service = EmbeddingService()
+        service.add_documents([("collision claim", "claims", "C1"), ("collision coverage", "policy", "P1")])
+
+        self.assertEqual({r["source"] for r in service.hybrid_search("collision", k=5, sources=["claims"])}, {"claims"})
+        self.assertEqual({r["source"] for r in service.hybrid_search("collision", k=5)}, {"claims", "policy"})
+
+
+class VectorIndexTests(SimpleTestCase):
+    LAYOUTS = tuple(vector_index.INDEX_TYPES)
+
+    def unit_vectors(self, n, dimension=32, seed=0):
+        vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_to_distances_gives_squared_l2_for_every_layout(self):
+        vectors = self.unit_vectors(300)
+        queries = self.unit_vectors(4, seed=1)
+        expected = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        for layout in self.LAYOUTS:
+            with self.subTest(layout=layout):
+                index = vector_index.build_index(32, layout, pq_m=8)
+                self.assertEqual(index.is_trained, layout not in ('sq8', 'pq'))
+                self.assertEqual(vector_index.min_training_points(index), 256 if layout == 'pq' else 1)
+                index.train(vectors)
+                index.add(vectors)
+
+                scores, ids = index.search(queries, 5)
+                distances = vector_index.to_distances(index, scores)
+                self.assertTrue((np.diff(distances, axis=1) >= -1e-6).all())
+                tolerance = 0.5 if layout == 'pq' else 0.05
+                np.testing.assert_allclose(distances, np.take_along_axis(expected, ids, axis=1), atol=tolerance)
+                if layout != 'pq':
+                    np.testing.assert_array_equal(ids[:, 0], expected.argmin(axis=1))
+
+    @override_settings(UNDERWRITING_INDEX_TRAINING_SIZE=300, UNDERWRITING_PQ_SUBQUANTIZERS=16)
+    def test_buffered_chunks_are_searchable_before_and_after_training(self):
+        documents = [(f"claim {n} water damage in unit {n * 7}", "claims", f"C{n}") for n in range(300)]
+        for layout in self.LAYOUTS:
+            with self.subTest(layout=layout):
+                service = EmbeddingService(index_type=layout)
+                trained = layout not in ('sq8', 'pq')
+                self.assertEqual(service.add_documents(documents[:299]), 299)
+                self.assertEqual(service.index.ntotal, 299 if trained else 0)
+                self.assertEqual(service.get_stats()['buffered_chunks'], 0 if trained else 299)
+
+                hit = service.search(documents[5][0], k=3)[0]
+                self.assertEqual(hit['doc_id'], 'C5')
+                self.assertAlmostEqual(hit['distance'], 0.0, places=2)
+                hit = service.hybrid_search(documents[5][0], k=1)[0]
+                self.assertEqual(hit['doc_id'], 'C5')
+                self.assertIsNotNone(hit['bm25_score'])
+                # Buffered documents count as indexed, so they are not embedded again
+                with mock.patch.object(service, 'get_embeddings') as get_embeddings:
+                    self.assertEqual(service.index_documents(documents[:299]), 0)
+                get_embeddings.assert_not_called()
+
+                generation = service.generation
+                self.assertEqual(service.add_documents(documents[299:]), 1)
+                self.assertTrue(service.index.is_trained)
+                self.assertEqual((service.index.ntotal, len(service.chunks)), (300, 300))
+                self.assertEqual(service.get_stats()['buffered_chunks'], 0)
+                self.assertGreater(service.generation, generation)
+                self.assertIn('C5', [r['doc_id'] for r in service.search(documents[5][0], k=3)])
+                self.assertEqual(service.hybrid_search(documents[5][0], k=1)[0]['doc_id'], 'C5')
+
+    @override_settings(UNDERWRITING_PQ_SUBQUANTIZERS=16)
+    def test_chunks_too_few_to_train_survive_save_and_load(self):
+        service = EmbeddingService(index_type='pq')
+        service.add_documents([("hail damage to roof", "claims", "C1"), ("rear-end collision", "claims", "C2")])
+        directory = tempfile.mkdtemp()
+        service.save(directory)
+
+        loaded = EmbeddingService.load(directory)
+        self.assertEqual((loaded.index.ntotal, len(loaded.chunks)), (0, 2))
+        self.assertEqual(loaded.search("rear-end collision", k=1)[0]['doc_id'], 'C2')
+        loaded.update_documents([("rear-end collision at low speed", "claims", "C2")])
+        self.assertEqual([r['doc_id'] for r in loaded.search("rear-end collision", k=5)], ['C2', 'C1'])
+        self.assertEqual(loaded.search("rear-end collision", k=1)[0]['text'], "rear-end collision at low speed")
+
+    @override_settings(UNDERWRITING_INDEX_TRAINING_SIZE=300, UNDERWRITING_PQ_SUBQUANTIZERS=16,
+                       UNDERWRITING_INDEX_COMPACT_RATIO=0.25)
+    def test_repeated_updates_compact_stale_chunks(self):
+        documents = [(f"claim {n} water damage in unit {n * 7}", "claims", f"C{n}") for n in range(40)]
+        for layout in ('flat', 'sq8'):
+            with self.subTest(layout=layout):
+                service = EmbeddingService(index_type=layout)
+                service.add_documents(documents)
+                for revision in range(30):
+                    service.update_documents([(f"claim 5 revision {revision} hail damage", "claims", "C5")])
+                    self.assertLessEqual(service.chunks.stale_count, 0.25 * len(service.chunks))
+                    self.assertEqual(len(service.chunks), 40 + service.chunks.stale_count)
+                self.assertEqual(service.index.ntotal + len(service._pending_embeddings()), len(service.chunks))
+                self.assertEqual(len(service.lexical_index), len(service.chunks))
+
+                hit = service.search("claim 5 revision 29 hail damage", k=1)[0]
+                self.assertEqual((hit['doc_id'], hit['text']), ('C5', "claim 5 revision 29 hail damage"))
+                self.assertAlmostEqual(hit['distance'], 0.0, places=2)
+                self.assertEqual(service.search(documents[9][0], k=1)[0]['doc_id'], 'C9')
+                results = service.hybrid_search("claim 5 hail damage", k=40)
+                self.assertEqual([r['doc_id'] for r in results].count('C5'), 1)
+
+    @override_settings(UNDERWRITING_INDEX_COMPACT_RATIO=1.0)
+    def test_stale_chunks_widen_the_vector_search_by_at_most_k(self):
+        service = EmbeddingService(index_type='flat')
+        service.add_documents([(f"claim {n} water damage", "claims", f"C{n}") for n in range(3)])
+        for revision in range(20):
+            service.update_documents([(f"claim 1 water damage, revision {revision}", "claims", "C1")])
+        self.assertEqual(service.chunks.stale_count, 20)
+
+        with mock.patch.object(service.index, 'search', wraps=service.index.search) as index_search:
+            results = service.search("claim 1 water damage, revision 0", k=3)
+        self.assertEqual(sorted(r['doc_id'] for r in results), ['C0', 'C1', 'C2'])
+        self.assertIn("claim 1 water damage, revision 19", [r['text'] for r in results])
+        # The first pass fetches k + k, later passes widen only because most of the corpus is stale
+        fetches = [call.args[1] for call in index_search.call_args_list]
+        self.assertEqual(fetches[0], 6)
+        self.assertGreater(len(fetches), 1)
+        self.assertEqual(fetches, sorted(fetches))
+
+        results = service.hybrid_search("claim 1 water damage, revision 0", k=3, candidates=2)
+        self.assertNotIn("claim 1 water damage, revision 0", [r['text'] for r in results])
+        self.assertEqual(len({r['doc_id'] for r in results}), len(results))
+
+
+class RetrievalQueryTests(SimpleTestCase):
+    DOCUMENTS = [
+        ("Auto policy covers collision and comprehensive damage up to the stated limit.", "policy", "P1"),
+        ("Claims history: two at-fault accidents and one speeding ticket in three years.", "claims", "A1"),
+        ("Drivers with more than two at-fault accidents require manual underwriting review.", "regulations", "auto"),
+        ("Homeowners policy excludes flood damage unless an endorsement is purchased.", "policy", "P2"),
+        ("Speeding violations within 36 months raise the premium tier.", "regulations", "auto-rating"),
+    ]
+
+    @override_settings(UNDERWRITING_LLM_BACKEND='stub')
+    def test_build_retrieval_queries_adds_one_query_per_risk_field(self):
+        workflow = services.UnderwritingWorkflow()
+        queries = workflow.build_retrieval_queries({
+            'coverage_type': 'auto', 'coverage_amount': 50000, 'age': 34,
+            'driving_record': '1 speeding ticket', 'previous_claims': '2 at-fault accidents',
+        })
+        self.assertEqual(queries, [
+            "Application for auto coverage amount 50000. age: 34, driving_record: 1 speeding ticket, "
+            "previous_claims: 2 at-fault accidents",
+            "auto coverage limits, exclusions and requirements for amount 50000",
+            "Driving record: 1 speeding ticket",
+            "Claims history: 2 at-fault accidents",
+        ])
+        # Fields that are missing or empty add no query of their own
+        self.assertEqual(workflow.build_retrieval_queries({'age': 34, 'driving_record': ''}),
+                         ["Application for  coverage amount . age: 34, driving_record: "])
+
+    def test_queries_share_one_embedding_batch_and_one_faiss_search(self):
+        service = EmbeddingService(index_type='flat')
+        service.add_documents(self.DOCUMENTS)
+        queries = ["Driving record: speeding ticket", "Claims history: at-fault accidents", "flood endorsement"]
+
+        with mock.patch.object(service, 'get_embeddings', wraps=service.get_embeddings) as get_embeddings, \
+                mock.patch.object(service.index, 'search', wraps=service.index.search) as index_search:
+            service.hybrid_search(queries, k=3)
+
+        get_embeddings.assert_called_once_with(queries)
+        index_search.assert_called_once()
+        self.assertEqual(index_search.call_args.args[0].shape, (len(queries), service.dimension))
+
+    def test_results_are_deduplicated_and_ranked_by_reciprocal_rank_fusion(self):
+        service = EmbeddingService(index_type='flat')
+        service.add_documents(self.DOCUMENTS)
+        queries = ["at-fault accidents", "speeding ticket", "at-fault accidents speeding"]
+        candidates, rrf_k = 3, 10
+
+        # Every ranking a chunk appears in adds 1 / (rrf_k + rank), vector and lexical alike
+        stored = service.get_embeddings(list(service.chunks.texts()))
+        expected = {}
+        for query, embedding in zip(queries, service.get_embeddings(queries)):
+            vector_ranking = np.argsort(((stored - embedding) ** 2).sum(axis=1), kind='stable')[:candidates]
+            lexical_ranking = [idx for idx, _ in service.lexical_index.search(query, candidates)]
+            for ranking in (vector_ranking, lexical_ranking):
+                for rank, idx in enumerate(ranking, start=1):
+                    expected[int(idx)] = expected.get(int(idx), 0.0) + 1.0 / (rrf_k + rank)
+
+        results = service.hybrid_search(queries, k=len(self.DOCUMENTS), candidates=candidates, rrf_k=rrf_k)
+
+        doc_ids = [r['doc_id'] for r in results]
+        self.assertEqual(len(doc_ids), len(set(doc_ids)))
+        self.assertEqual(len(results), len(expected))
+        scores = [r['rrf_score'] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        by_doc = {service.chunks.get(idx)['doc_id']: score for idx, score in expected.items()}
+        for result in results:
+            self.assertAlmostEqual(result['rrf_score'], by_doc[result['doc_id']])
+        # A chunk matched by several queries is returned once, with every ranking summed into its score
+        self.assertGreater(by_doc['A1'], 3 * (1.0 / (rrf_k + 1)))
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test latency', ('node',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, node='a')
+
+        lines = list(histogram.render())
+        self.assertIn('test_seconds_bucket{node="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{node="a",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{node="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{node="a"} 3', lines)
+
+    def test_timings_are_collected_only_inside_the_block(self):
+        node = metrics.timed_node('fetch_context', lambda state: {'seen': state})
+        count = metrics.NODE_SECONDS._series.get(('fetch_context',), [0])[-1]
+
+        node({})
+        with metrics.collect_timings() as timings:
+            self.assertEqual(node({'x': 1}), {'seen': {'x': 1}})
+            metrics.record('db_queries', 2)
+        node({})
+
+        self.assertEqual(set(timings), {'fetch_context', 'db_queries'})
+        self.assertEqual(timings['db_queries'], 2)
+        self.assertEqual(metrics.NODE_SECONDS._series[('fetch_context',)][-1], count + 3)
+
+    def test_search_records_latency_and_cache_lookups(self):
+        service = EmbeddingService()
+        service.add_documents([("collision claim", "claims", "C1")])
+        hits = metrics.SEARCH_CACHE.value(result='hit')
+
+        with metrics.collect_timings() as timings:
+            service.hybrid_search("collision", k=1)
+            service.hybrid_search("collision", k=1)
+
+        self.assertIn('search', timings)
+        self.assertEqual(timings['embeddings'], 1)
+        self.assertEqual(metrics.SEARCH_CACHE.value(result='hit'), hits + 1)
+        self.assertIn('underwriting_search_seconds_bucket{kind="hybrid"', metrics.REGISTRY.render())
+
+
+class StubLLMTests(SimpleTestCase):
+    @override_settings(UNDERWRITING_LLM_BACKEND='stub', UNDERWRITING_STUB_LLM_LATENCY=0)
+    def test_stub_is_selected_and_deterministic(self):
+        llm = get_llm()
+        self.assertIsInstance(llm, StubChatModel)
+
+        first = llm.invoke([services.HumanMessage(content="assess applicant A1")])
+        second = llm.invoke([services.HumanMessage(content="assess applicant A1")])
+        self.assertEqual(first.content, second.content)
+        self.assertIn("RED FLAGS:", first.content)
+        self.assertGreater(first.usage_metadata["input_tokens"], 0)
+
+    @override_settings(UNDERWRITING_LLM_BACKEND='unknown')
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            get_llm()
+
+
+class LazyImportTests(SimpleTestCase):
+    HEAVY_MODULES = ('faiss', 'tiktoken', 'langgraph', 'langchain_groq', 'faster_whisper', 'underwriting.services')
+
+    def test_url_conf_does_not_import_heavy_dependencies(self):
+        script = ("import sys, django; django.setup(); "
+                  "from django.urls import get_resolver; get_resolver().url_patterns; "
+                  f"print(','.join(m for m in {self.HEAVY_MODULES!r} if m in sys.modules))")
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='item_api.settings')
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+    def test_vector_index_imports_without_django_settings(self):
+        script = ("from underwriting.vector_index import build_index; from item_api import resources; "
+                  "print(build_index(8).ntotal, resources.threads('faiss'))")
+        env = {k: v for k, v in os.environ.items() if k != 'DJANGO_SETTINGS_MODULE'}
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '0 None')
+
+    @override_settings(UNDERWRITING_LLM_BACKEND='stub')
+    def test_workflow_is_shared_until_llm_settings_change(self):
+        workflow = accessors.get_workflow()
+        self.assertIs(accessors.get_workflow(), workflow)
+        self.assertIsInstance(workflow.llm, StubChatModel)
+
+        with override_settings(UNDERWRITING_STUB_LLM_LATENCY=0.5):
+            self.assertIsNot(accessors.get_workflow(), workflow)
+            self.assertEqual(accessors.get_workflow().llm.latency, 0.5)
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        Regulation.objects.create(regulation_id='R1', lob='auto',
+                                  text='Section 4.2.1 requires review of driving records for three years.')
+        Regulation.objects.create(regulation_id='R2', lob='home',
+                                  text='Flood damage is excluded unless a flood endorsement is purchased.')
+        Claim.objects.create(claim_id='C1', applicant_id='A1', text='Rear-end collision, claim CLM-2023-0042 settled.')
+        Claim.objects.create(claim_id='C2', applicant_id='A2', text='Collisions with deer on rural roads.')
+
+    def test_ranked_results_with_snippets(self):
+        matches = search.search(Regulation, 'flood endorsement')
+        self.assertEqual(matches['count'], 1)
+        self.assertEqual(matches['results'][0]['regulation_id'], 'R2')
+        self.assertIn('<mark>flood</mark>', matches['results'][0]['snippet'].lower())
+
+    def test_identifiers_stemming_and_filters(self):
+        self.assertEqual([r['regulation_id'] for r in search.search(Regulation, 'section 4.2.1')['results']], ['R1'])
+        self.assertEqual([r['claim_id'] for r in search.search(Claim, 'CLM-2023-0042')['results']], ['C1'])
+        # Porter stemming matches "collisions" to "collision"
+        self.assertEqual(search.search(Claim, 'collision')['count'], 2)
+        self.assertEqual([r['claim_id'] for r in search.search(Claim, 'collision', filters={'applicant_id': 'A2'})['results']],
+                         ['C2'])
+
+    def test_index_follows_updates_deletes_and_bulk_upserts(self):
+        Claim.objects.filter(claim_id='C2').update(text='Hail damage to the windshield.')
+        self.assertEqual(search.search(Claim, 'deer')['count'], 0)
+        self.assertEqual(search.search(Claim, 'hail')['count'], 1)
+
+        Claim.objects.filter(claim_id='C1').delete()
+        self.assertEqual(search.search(Claim, 'collision')['count'], 0)
+
+        Claim.objects.bulk_create([Claim(claim_id='C2', applicant_id='A2', text='Theft of catalytic converter.')],
+                                  update_conflicts=True, unique_fields=['claim_id'], update_fields=['text'])
+        self.assertEqual(search.search(Claim, 'hail')['count'], 0)
+        self.assertEqual(search.search(Claim, 'catalytic')['count'], 1)
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('"unbalanced', 'flood AND (', 'NEAR(flood', '*', 'text:flood'):
+            search.search(Regulation, query)
+        self.assertEqual(search.search(Regulation, '---')['count'], 0)
+
+    def test_search_endpoint_and_admin(self):
+        response = APIClient().get('/api/regulations/search/', {'q': 'driving records', 'lob': 'auto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['regulation_id'], 'R1')
+        self.assertEqual(APIClient().get('/api/regulations/search/').status_code, 400)
+
+        admin = admin_site._registry[Regulation]
+        request = RequestFactory().get('/admin/')
+        queryset, _ = admin.get_search_results(request, Regulation.objects.all(), 'endorsement')
+        self.assertEqual([r.regulation_id for r in queryset], ['R2'])
+        queryset, _ = admin.get_search_results(request, Regulation.objects.all(), 'R1')
+        self.assertEqual([r.regulation_id for r in queryset], ['R1'])
+
+
+@override_settings(UNDERWRITING_LLM_BACKEND='stub')
+class FullTextIndexSyncTests(TransactionTestCase):
+    def matches(self, query):
+        return sorted(r['policy_id'] for r in search.search(Policy, query)['results'])
+
+    def test_index_survives_vacuum_and_table_rebuilds(self):
+        Policy.objects.bulk_create([Policy(policy_id=f'P{n}', text=f'Flood clause {n}.') for n in range(5)])
+        Policy.objects.filter(policy_id__in=['P0', 'P1']).delete()
+        # VACUUM renumbers the implicit rowid of tables without an INTEGER PRIMARY KEY
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        Policy.objects.create(policy_id='P5', text='Hail clause.')
+        self.assertEqual(self.matches('flood'), ['P2', 'P3', 'P4'])
+        self.assertEqual(self.matches('hail'), ['P5'])
+
+        # SQLite applies AddField/AlterField by rebuilding the table, which drops the triggers and key column
+        with connection.schema_editor() as editor:
+            editor._remake_table(Policy)
+        call_command('migrate', verbosity=0)
+
+        Policy.objects.create(policy_id='P6', text='Theft clause.')
+        Policy.objects.filter(policy_id='P2').update(text='Theft exclusion.')
+        Policy.objects.filter(policy_id='P3').delete()
+        self.assertEqual(self.matches('flood'), ['P4'])
+        self.assertEqual(self.matches('theft'), ['P2', 'P6'])
+        self.assertEqual(self.matches('hail'), ['P5'])
+        self.assertEqual(list(Policy.objects.filter(pk__in=search.matching_pks(Policy, 'theft'))
+                              .order_by('policy_id').values_list('policy_id', flat=True)), ['P2', 'P6'])
+
+
+class ApplicationDetailsTests(TestCase):
+    def setUp(self):
+        Policy.objects.create(policy_id='P1', text='Policy wording ' * 100)
+        for n in range(5):
+            Claim.objects.create(claim_id=f'C{n}', applicant_id='A1', text=f'Claim {n} notes ' * 50)
+        Regulation.objects.create(regulation_id='R1', lob='auto', text='Short rule')
+        self.application = UnderwritingApplication.objects.create(
+            applicant_id='A1', policy_id='P1', lob='auto', application_data={'age': 30})
+
+    def get(self, **params):
+        response = APIClient().get('/api/underwriting/get_application_details/',
+                                   {'application_id': str(self.application.id), **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_default_response_includes_everything(self):
+        related = self.get()['detailed_results']['related_data']
+        self.assertEqual(related['policy']['text'], 'Policy wording ' * 100)
+        self.assertEqual(related['claims_count'], 5)
+        self.assertEqual(len(related['claims']), 5)
+        self.assertEqual(set(related['claims'][0]), {'id', 'claim_id', 'applicant_id', 'text', 'metadata', 'created_at'})
+        self.assertEqual(related['regulations_count'], 1)
+
+    def test_include_fields_and_pagination(self):
+        with CaptureQueriesContext(connection) as queries:
+            related = self.get(**{'include': 'claims', 'fields[claims]': 'claim_id',
+                                  'limit[claims]': '2', 'offset[claims]': '2'})['detailed_results']['related_data']
+        self.assertEqual(set(related), {'claims', 'claims_count'})
+        self.assertEqual(related['claims'], [{'claim_id': 'C2'}, {'claim_id': 'C3'}])
+        self.assertEqual(related['claims_count'], 5)
+        claim_queries = [q['sql'] for q in queries.captured_queries if 'underwriting_claim' in q['sql']]
+        self.assertTrue(claim_queries)
+        self.assertFalse(any('"text"' in sql for sql in claim_queries))
+
+    def test_excerpts_truncate_in_the_database(self):
+        related = self.get(excerpt='10', fields='policy_id,claim_id,text')['detailed_results']['related_data']
+        self.assertEqual(related['policy'], {'policy_id': 'P1', 'text': 'Policy wor…', 'text_length': 1500,
+                                             'text_truncated': True})
+        self.assertEqual(related['regulations'][0]['text'], 'Short rule')
+        self.assertFalse(related['regulations'][0]['text_truncated'])
+
+    def test_invalid_options_are_rejected(self):
+        for params in ({'include': 'everything'}, {'limit[claims]': '-1'}, {'excerpt': 'abc'}):
+            response = APIClient().get('/api/underwriting/get_application_details/',
+                                       {'application_id': str(self.application.id), **params})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(UNDERWRITING_LLM_BACKEND='stub')
+class ConditionalDashboardTests(TestCase):
+    def test_dashboard_and_list_honour_etags_per_query(self):
+        UnderwritingApplication.objects.create(applicant_id='A1', policy_id='P1', lob='auto', application_data={})
+        client = APIClient()
+
+        for url in ('/api/underwriting/dashboard_overview/', '/api/underwriting/list_applications/'):
+            etag = client.get(url)['ETag']
+            self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertNotEqual(client.get(url, {'lob': 'home'})['ETag'], etag)
+
+        etag = client.get('/api/underwriting/list_applications/')['ETag']
+        application = UnderwritingApplication.objects.get(applicant_id='A1')
+        application.status = 'processed'
+        application.save()
+        response = client.get('/api/underwriting/list_applications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['applications'][0]['status'], 'processed')
+
+
+@override_settings(UNDERWRITING_LLM_BACKEND='stub')
+class ORJSONRenderingTests(TestCase):
+    def setUp(self):
+        for n in range(3):
+            UnderwritingApplication.objects.create(
+                applicant_id=f'A{n}', policy_id='P1', lob='auto', application_data={'age': 30 + n, 'note': 'é\u2028'},
+                risk_summary='High risk driver' if n else '', red_flags=['late payment'] * n, recommendations=' ')
+
+    def test_output_matches_drf_json_renderer(self):
+        data = {'text': 'naïve \u2028 line', 'nested': [1, 2.5, None, True], 'id': str(uuid.uuid4())}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_numpy_uuid_and_datetime_render_natively(self):
+        value = uuid.uuid4()
+        moment = timezone.now()
+        rendered = ORJSONRenderer().render({'id': value, 'at': moment, 'vector': np.array([0.5, 1.0], dtype=np.float32),
+                                            'count': np.int64(3)})
+        self.assertEqual(rendered.decode(), '{"id":"%s","at":"%s","vector":[0.5,1.0],"count":3}' % (
+            value, moment.isoformat().replace('+00:00', 'Z')))
+
+    def test_list_applications_rows_match_the_serializer_in_constant_queries(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as few:
+            response = client.get('/api/underwriting/list_applications/')
+        applications = response.json()['applications']
+        expected = JSONRenderer().render(UnderwritingApplicationSerializer(
+            UnderwritingApplication.objects.order_by('-created_at'), many=True).data)
+        self.assertEqual([{k: v for k, v in app.items() if k != 'summary'} for app in applications],
+                         json.loads(expected))
+        self.assertEqual(applications[0]['summary'], {'red_flags_count': 2, 'has_recommendations': False,
+                                                      'has_risk_summary': True})
+
+        UnderwritingApplication.objects.create(applicant_id='A9', policy_id='P1', lob='auto', application_data={})
+        with CaptureQueriesContext(connection) as more:
+            client.get('/api/underwriting/list_applications/')
+        self.assertEqual(len(more), len(few))
+
+    def test_dashboard_overview_counts(self):
+        overview = APIClient().get('/api/underwriting/dashboard_overview/').json()
+        self.assertEqual(overview['overview']['total_applications'], 3)
+        self.assertEqual(overview['overview']['pending_applications'], 3)
+        self.assertEqual(overview['overview']['flagged_applications_count'], 2)
+        self.assertEqual(overview['overview']['high_risk_applications_count'], 2)
+        self.assertEqual(overview['line_of_business_stats'], {'auto': {'count': 3, 'flagged': 2, 'processed': 0}})
+        self.assertEqual(len(overview['recent_applications']), 3)
+
+    def test_invalid_json_bodies_are_rejected(self):
+        client = APIClient()
+        for body in ('{"name": [', '{"name": NaN}'):
+            response = client.post('/items/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('JSON parse error', response.json()['detail'])
+
+    def test_embeddings_render_from_numpy(self):
+        response = APIClient().post('/api/underwriting/embeddings/', {'input': ['hello world']}, format='json')
+        embedding = response.json()['embeddings'][0]
+        self.assertEqual(len(embedding), 1536)
+        self.assertAlmostEqual(float(np.linalg.norm(embedding)), 1.0, places=5)
+
+
+@override_settings(UNDERWRITING_LLM_BACKEND='stub', UNDERWRITING_IDEMPOTENCY_WINDOW=3600)
+class IdempotentApplicationTests(TestCase):
+    URL = '/api/underwriting/process_application/'
+    BODY = {'applicant_id': 'A1', 'policy_id': 'P1', 'lob': 'auto', 'application_data': {'age': 30, 'vehicle': 'sedan'}}
+
+    def setUp(self):
+        self.workflow = mock.Mock()
+        self.workflow.process_application.return_value = {
+            'risk_summary': 'Low risk', 'red_flags': ['late payment'], 'recommendations': 'Approve',
+            'messages': [services.AIMessage(content='RISK SUMMARY: Low risk')]}
+        patcher = mock.patch.object(UnderwritingViewSet, 'underwriting_workflow', new_callable=mock.PropertyMock,
+                                    return_value=self.workflow)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def post(self, body=None, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(self.URL, body or self.BODY, format='json', **headers)
+
+    def test_repeated_key_replays_the_stored_application(self):
+        first = self.post(key='retry-1')
+        second = self.post(key='retry-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(first.json()['messages'], ['RISK SUMMARY: Low risk'])
+        self.assertEqual(self.workflow.process_application.call_count, 1)
+        self.assertEqual(UnderwritingApplication.objects.count(), 1)
+
+    def test_identical_bodies_without_a_key_are_deduplicated(self):
+        first = self.post()
+        reordered = {'lob': 'auto', 'application_data': {'vehicle': 'sedan', 'age': 30},
+                     'policy_id': 'P1', 'applicant_id': 'A1'}
+        self.assertEqual(self.post(reordered).json()['application_id'], first.json()['application_id'])
+
+        changed = dict(self.BODY, application_data={'age': 31, 'vehicle': 'sedan'})
+        self.assertNotEqual(self.post(changed).json()['application_id'], first.json()['application_id'])
+        self.assertEqual(self.workflow.process_application.call_count, 2)
+
+    def test_key_reused_for_another_application_is_rejected(self):
+        self.post(key='retry-1')
+        response = self.post(dict(self.BODY, applicant_id='A2'), key='retry-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(UnderwritingApplication.objects.count(), 1)
+
+    def test_key_is_processed_again_after_the_window(self):
+        first = self.post(key='retry-1').json()['application_id']
+        UnderwritingApplication.objects.update(created_at=timezone.now() - timedelta(hours=2))
+
+        second = self.post(key='retry-1')
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(second.json()['application_id'], first)
+        self.assertIsNone(UnderwritingApplication.objects.get(id=first).idempotency_key)
+        self.assertEqual(UnderwritingApplication.objects.get(idempotency_key='retry-1').id,
+                         uuid.UUID(second.json()['application_id']))
+
+
+class ThrottlingLLMServer(ThreadingHTTPServer):
+    """Local stand-in for the provider's chat completions API that answers 429 when overloaded.
+
+    Requests beyond `capacity` in flight, and the first `fail_first` requests, get 429 with a
+    Retry-After of `retry_after` seconds; the rest answer after `latency` seconds.
+    """
+    daemon_threads = True
+
+    def __init__(self, capacity=100, latency=0.0, fail_first=0, retry_after=0.0, status=429):
+        super().__init__(('127.0.0.1', 0), ThrottlingLLMHandler)
+        self.capacity, self.latency, self.fail_first = capacity, latency, fail_first
+        self.retry_after, self.status = retry_after, status
+        self.lock = threading.Lock()
+        self.in_flight = self.requests = self.throttled = self.max_in_flight = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class ThrottlingLLMHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.requests += 1
+            reject = server.requests <= server.fail_first or server.in_flight >= server.capacity
+            if reject:
+                server.throttled += 1
+            else:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        if reject:
+            return self.reply(server.status, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit'}},
+                              {'retry-after': str(server.retry_after)})
+
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_flight -= 1
+        self.reply(200, {
+            'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': 0, 'model': 'stub',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': 'RISK SUMMARY: Low risk'}}],
+            'usage': {'prompt_tokens': 5, 'completion_tokens': 4, 'total_tokens': 9},
+        })
+
+    def reply(self, status_code, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        for name, value in {'Content-Type': 'application/json', **(headers or {})}.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class LLMGatewayTests(SimpleTestCase):
+    def start_server(self, **options):
+        server = ThrottlingLLMServer(**options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def gateway(self, server, **options):
+        from langchain_groq import ChatGroq
+
+        llm = ChatGroq(model='stub', api_key='test', base_url=server.url, max_retries=0)
+        return LLMGateway(llm, **{'backoff': 0.01, **options})
+
+    def test_throttled_calls_are_retried(self):
+        server = self.start_server(fail_first=2)
+        gateway = self.gateway(server)
+
+        response = gateway.invoke([services.HumanMessage(content='assess')])
+        self.assertEqual(response.content, 'RISK SUMMARY: Low risk')
+        self.assertEqual((server.requests, server.throttled), (3, 2))
+        self.assertLess(gateway.limiter.limit, 16)
+
+    def test_concurrency_adapts_to_provider_capacity(self):
+        server = self.start_server(capacity=2, latency=0.02)
+        gateway = self.gateway(server, max_concurrency=16, max_retries=10)
+        failures = []
+
+        def call():
+            for _ in range(5):
+                try:
+                    gateway.invoke([services.HumanMessage(content='assess')])
+                except Exception as e:
+                    failures.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(server.requests - server.throttled, 40)
+        self.assertLessEqual(server.max_in_flight, 2)
+        self.assertLess(gateway.limiter.limit, 16)
+
+    def test_deadline_bounds_retries(self):
+        server = self.start_server(fail_first=1000, retry_after=0.2)
+        gateway = self.gateway(server, max_retries=100)
+
+        start = time.monotonic()
+        with self.assertRaises(LLMDeadlineExceeded):
+            gateway.invoke([services.HumanMessage(content='assess')], deadline=0.5)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertLessEqual(server.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        server = self.start_server(fail_first=1, status=400)
+        with self.assertRaises(Exception):
+            self.gateway(server).invoke([services.HumanMessage(content='assess')])
+        self.assertEqual(server.requests, 1)
+
+    def test_attempts_time_out_at_the_deadline(self):
+        gateway = LLMGateway(StubChatModel(latency=0.5), max_retries=0)
+        with self.assertRaises(TimeoutError):
+            gateway.invoke([services.HumanMessage(content='assess')], deadline=0.05)
+
+    def test_token_bucket_spaces_calls(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            self.assertTrue(bucket.acquire(start + 5))
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertFalse(bucket.acquire(time.monotonic()))
+
+    def test_limiter_decreases_once_per_round(self):
+        limiter = AIMDLimiter(8)
+        starts = []
+        for _ in range(4):
+            self.assertTrue(limiter.acquire(time.monotonic() + 1))
+            starts.append(time.monotonic())
+        for started in starts:
+            limiter.release(started, throttled=True)
+        self.assertEqual(limiter.limit, 4)
+
+        limiter.acquire(time.monotonic() + 1)
+        limiter.release(time.monotonic(), latency=0.01)
+        self.assertEqual(limiter.limit, 4.25)
+
+
+class BulkIngestTests(TestCase):
+    URL = '/api/policies/bulk/'
+
+    def setUp(self):
+        self.service = EmbeddingService(index_type='flat')
+        patcher = mock.patch('underwriting.views.get_embedding_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def post(self, records, batch_size=None):
+        url = f'{self.URL}?batch_size={batch_size}' if batch_size else self.URL
+        return self.client.post(url, records, format='json')
+
+    def indexed(self):
+        """(doc_id, text) of every live chunk"""
+        chunks = self.service.chunks
+        return sorted((chunks.get(i)['doc_id'], chunks.text(i)) for i in range(len(chunks)) if not chunks.is_stale(i))
+
+    def test_json_array_creates_and_indexes(self):
+        response = self.post([{'policy_id': 'P-1', 'text': 'Covers flood damage.'},
+                              {'policy_id': 'P-2', 'text': 'Covers theft.'}])
+        self.assertEqual(response.json(), {'received': 2, 'created': 2, 'updated': 0, 'chunks_indexed': 2})
+        self.assertEqual(self.indexed(), [('P-1', 'Covers flood damage.'), ('P-2', 'Covers theft.')])
+
+    def test_ndjson_stream(self):
+        body = '{"policy_id": "P-1", "text": "Covers flood damage."}\n\n{"policy_id": "P-2", "text": "Covers theft."}\n'
+        response = self.client.post(self.URL, body, content_type='application/x-ndjson')
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(Policy.objects.get(policy_id='P-2').text, 'Covers theft.')
+
+    def test_key_repeated_across_batches_counts_once(self):
+        response = self.post([{'policy_id': 'P-1', 'text': 'first'}, {'policy_id': 'P-2', 'text': 'other'},
+                              {'policy_id': 'P-1', 'text': 'second'}], batch_size=2)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(response.json()['updated'], 0)
+        self.assertEqual(Policy.objects.get(policy_id='P-1').text, 'second')
+        self.assertEqual(self.indexed(), [('P-1', 'second'), ('P-2', 'other')])
+
+    def test_update_replaces_indexed_text(self):
+        self.post([{'policy_id': 'P-1', 'text': 'Excludes basements.'}])
+        response = self.post([{'policy_id': 'P-1', 'text': 'Covers basements.'}])
+        self.assertEqual(response.json(), {'received': 1, 'created': 0, 'updated': 1, 'chunks_indexed': 1})
+        self.assertEqual(self.indexed(), [('P-1', 'Covers basements.')])
+        self.assertEqual([r['text'] for r in self.service.hybrid_search('basements', k=5)], ['Covers basements.'])
+        self.assertEqual([r['text'] for r in self.service.search('Excludes basements.', k=5)], ['Covers basements.'])
+
+    def test_unchanged_repost_is_not_reindexed(self):
+        self.post([{'policy_id': 'P-1', 'text': 'Covers flood damage.'}])
+        response = self.post([{'policy_id': 'P-1', 'text': 'Covers flood damage.'}])
+        self.assertEqual(response.json()['chunks_indexed'], 0)
+        self.assertEqual((len(self.service.chunks), self.service.index.ntotal), (1, 1))
+
+    def test_validation_error_in_a_later_batch_rolls_back_every_batch(self):
+        response = self.post([{'policy_id': 'P-1', 'text': 'ok'}, {'policy_id': 'P-2', 'text': 'ok'},
+                              {'policy_id': 'P-3'}], batch_size=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['2'])
+        self.assertFalse(Policy.objects.exists())
+        self.assertEqual(len(self.service.chunks), 0)
+
+
+class BuildIndexTests(TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        Policy.objects.create(policy_id='P-1', text='Excludes flood damage.')
+        Policy.objects.create(policy_id='P-2', text='Covers theft.')
+        Claim.objects.create(claim_id='C-1', applicant_id='A-1', text='Rear-end collision.')
+
+    def build(self, **options):
+        stdout = io.StringIO()
+        call_command('build_index', output=self.output, index_type='flat', workers=0, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def indexed(self, service):
+        chunks = service.chunks
+        return sorted((chunks.get(i)['doc_id'], chunks.text(i)) for i in range(len(chunks)) if not chunks.is_stale(i))
+
+    def test_full_build_writes_an_index_the_service_loads(self):
+        output = self.build()
+        self.assertIn('total: 3 docs, 3 chunks', output)
+
+        service = EmbeddingService.load(self.output)
+        self.assertEqual(service.index.ntotal, 3)
+        self.assertIn('last_built_at', service.manifest)
+        self.assertEqual(self.indexed(service), [('C-1', 'Rear-end collision.'), ('P-1', 'Excludes flood damage.'),
+                                                 ('P-2', 'Covers theft.')])
+        self.assertEqual(service.search('Covers theft.', k=1)[0]['doc_id'], 'P-2')
+
+    def test_incremental_build_picks_up_only_new_and_changed_rows(self):
+        self.build()
+        updated_at = Policy.objects.get(policy_id='P-1').updated_at
+        serializer = PolicySerializer(data=[{'policy_id': 'P-1', 'text': 'Covers flood damage.'},
+                                            {'policy_id': 'P-3', 'text': 'Covers hail.'}], many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        # The bulk upsert rewrites updated_at along with the text
+        self.assertGreater(Policy.objects.get(policy_id='P-1').updated_at, updated_at)
+
+        output = self.build(incremental=True)
+        self.assertIn('policy: 2 docs, 2 chunks', output)
+        self.assertIn('claims: 0 docs', output)
+
+        service = EmbeddingService.load(self.output)
+        self.assertEqual(self.indexed(service), [('C-1', 'Rear-end collision.'), ('P-1', 'Covers flood damage.'),
+                                                 ('P-2', 'Covers theft.'), ('P-3', 'Covers hail.')])
+        # The replaced P-1 chunk was one of three, enough to compact it out of the index
+        self.assertEqual((service.chunks.stale_count, service.index.ntotal), (0, 4))
+        self.assertEqual(self.build(incremental=True).count(' 0 docs'), 4)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PolicyViewSet, ClaimViewSet, RegulationViewSet, UnderwritingViewSet
+from .views import PolicyViewSet, ClaimViewSet, RegulationViewSet, UnderwritingViewSet, metrics_view
 
 router = DefaultRouter()
 router.register(r'policies', PolicyViewSet)
@@ -10,4 +10,5 @@ router.register(r'underwriting', UnderwritingViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]
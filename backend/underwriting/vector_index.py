@@ -0,0 +1,48 @@
+import faiss
+import numpy as np
+
+# Storage layouts selectable through UNDERWRITING_INDEX_TYPE. Embeddings are unit-normalized, so
+# every layout except "flat" ranks by inner product, which orders results exactly like L2.
+INDEX_TYPES = {
+    "flat": "exact float32 vectors, L2 distance",
+    "flat_ip": "exact float32 vectors, inner product",
+    "fp16": "scalar quantizer, 2 bytes per dimension, inner product",
+    "sq8": "scalar quantizer, 1 byte per dimension, inner product (trained)",
+    "pq": "product quantizer, pq_m bytes per vector, inner product (trained)",
+}
+
+
+def build_index(dimension: int, index_type: str = "flat", pq_m: int = 96) -> faiss.Index:
+    """Create an empty FAISS index for the given storage layout"""
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "flat_ip":
+        return faiss.IndexFlatIP(dimension)
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "pq":
+        if dimension % pq_m:
+            raise ValueError(f"PQ sub-quantizer count {pq_m} must divide the dimension {dimension}")
+        return faiss.IndexPQ(dimension, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+    raise ValueError(f"Unknown index type '{index_type}', expected one of: {', '.join(INDEX_TYPES)}")
+
+
+def min_training_points(index: faiss.Index) -> int:
+    """Smallest number of vectors the index can be trained on"""
+    if isinstance(index, faiss.IndexPQ):
+        return index.pq.ksub
+    return 1
+
+
+def to_distances(index: faiss.Index, scores: np.ndarray) -> np.ndarray:
+    """Express search scores as squared L2 distances between unit vectors (lower is closer)"""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return np.maximum(2.0 - 2.0 * scores, 0.0)
+    return scores
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Serialized size of the index, a close proxy for its resident memory"""
+    return faiss.serialize_index(index).nbytes
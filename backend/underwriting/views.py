@@ -1,20 +1,187 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length, Substr
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
+import hashlib
 import json
+import logging
+from datetime import timedelta
+import orjson
+from item_api.conditional import conditional_response
+from item_api.parsers import ORJSONParser
+from . import metrics, search
 from .models import Policy, Claim, Regulation, UnderwritingApplication
+from .parsers import NDJSONParser
 from .serializers import PolicySerializer, ClaimSerializer, RegulationSerializer, UnderwritingApplicationSerializer
-from .services import UnderwritingWorkflow
+from .accessors import get_embedding_service, get_workflow
+from .locks import SingleFlight
 
+logger = logging.getLogger(__name__)
 
-class PolicyViewSet(viewsets.ModelViewSet):
+IDEMPOTENCY_KEY_MAX_LENGTH = UnderwritingApplication._meta.get_field('idempotency_key').max_length
+
+_applications_in_flight = SingleFlight()
+
+
+def request_hash(fields):
+    """Idempotency key for a request sent without an Idempotency-Key header"""
+    body = orjson.dumps([fields[name] for name in ('applicant_id', 'policy_id', 'lob', 'application_data')],
+                        option=orjson.OPT_SORT_KEYS)
+    return 'sha256:' + hashlib.sha256(body).hexdigest()
+
+
+def idempotency_cutoff():
+    return timezone.now() - timedelta(seconds=settings.UNDERWRITING_IDEMPOTENCY_WINDOW)
+
+
+def stored_application(key):
+    """Application already processed for key within UNDERWRITING_IDEMPOTENCY_WINDOW, if any"""
+    return UnderwritingApplication.objects.filter(idempotency_key=key, created_at__gte=idempotency_cutoff()).first()
+
+
+class BulkValidationError(Exception):
+    """Raised inside the bulk transaction to roll back every batch when one fails validation"""
+
+    def __init__(self, errors):
+        super().__init__('Bulk validation failed')
+        self.errors = errors
+
+
+class BulkIngestMixin:
+    """Bulk upsert endpoint for JSON arrays or NDJSON streams, keyed on the serializer's upsert field"""
+    index_source = None
+
+    @action(detail=False, methods=['post'], parser_classes=[ORJSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Upsert many records in one transaction and index their text in batch"""
+        records = request.data
+        if not isinstance(records, list):
+            return Response({
+                'error': 'Expected a JSON array or an NDJSON stream of records'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', settings.UNDERWRITING_BULK_BATCH_SIZE))
+        except ValueError:
+            batch_size = 0
+        if batch_size <= 0:
+            return Response({
+                'error': 'batch_size must be a positive integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_serializer_class().Meta.model
+        upsert_field = self.get_serializer_class().Meta.upsert_field
+        # Text each key had before this request (None: new), and the text it has after it
+        previous_text = {}
+        saved_text = {}
+
+        try:
+            with transaction.atomic():
+                for offset in range(0, len(records), batch_size):
+                    batch = records[offset:offset + batch_size]
+                    serializer = self.get_serializer(data=batch, many=True, context={
+                        **self.get_serializer_context(),
+                        'batch_size': batch_size
+                    })
+                    if not serializer.is_valid():
+                        raise BulkValidationError({
+                            offset + i: errors for i, errors in enumerate(serializer.errors) if errors
+                        })
+
+                    # Keys seen in an earlier batch keep the text they had before the request
+                    keys = {attrs[upsert_field] for attrs in serializer.validated_data} - previous_text.keys()
+                    previous_text.update(dict.fromkeys(keys))
+                    previous_text.update(model.objects.filter(**{f'{upsert_field}__in': keys})
+                                         .values_list(upsert_field, 'text'))
+
+                    for obj in serializer.save():
+                        saved_text[getattr(obj, upsert_field)] = obj.text
+        except BulkValidationError as e:
+            return Response({
+                'error': 'Validation failed; no records were saved',
+                'errors': e.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        created = sum(text is None for text in previous_text.values())
+        # New and unchanged records are indexed only if the index lacks them; changed ones replace their chunks
+        documents, changed = [], []
+        for key, text in saved_text.items():
+            before = previous_text[key]
+            (changed if before is not None and before != text else documents).append((text, self.index_source, key))
+
+        # Chunk and embed only after the transaction has committed
+        chunks_indexed = 0
+        try:
+            embedding_service = get_embedding_service()
+            for offset in range(0, len(documents), batch_size):
+                chunks_indexed += embedding_service.index_documents(documents[offset:offset + batch_size])
+            for offset in range(0, len(changed), batch_size):
+                chunks_indexed += embedding_service.update_documents(changed[offset:offset + batch_size])
+        except Exception as e:
+            logger.error("Error indexing bulk %s documents: %s", self.index_source, e, exc_info=True)
+
+        return Response({
+            'received': len(records),
+            'created': created,
+            'updated': len(previous_text) - created,
+            'chunks_indexed': chunks_indexed
+        }, status=status.HTTP_200_OK)
+
+
+class TextSearchMixin:
+    """Ranked full-text search over the model's text with highlighted snippets"""
+    # Query parameter -> model field, applied as exact filters alongside the text match
+    search_filters = {}
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search record text, best matches first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                'error': 'Missing required parameter: q'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+            offset = int(request.query_params.get('offset', 0))
+            if limit < 1 or offset < 0:
+                raise ValueError
+        except ValueError:
+            return Response({
+                'error': 'limit must be between 1 and 100 and offset must be non-negative'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {field: request.query_params[param]
+                   for param, field in self.search_filters.items() if param in request.query_params}
+        try:
+            matches = search.search(self.queryset.model, query, limit=limit, offset=offset, filters=filters)
+        except Exception as e:
+            logger.error("Error searching %s: %s", self.queryset.model.__name__, e, exc_info=True)
+            return Response({
+                'error': f'Error searching: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'query': query,
+            'count': matches['count'],
+            'limit': limit,
+            'offset': offset,
+            'results': matches['results']
+        }, status=status.HTTP_200_OK)
+
+
+class PolicyViewSet(TextSearchMixin, BulkIngestMixin, viewsets.ModelViewSet):
     """API endpoints for Policy management"""
     queryset = Policy.objects.all()
     serializer_class = PolicySerializer
+    index_source = 'policy'
 
     def create(self, request, *args, **kwargs):
         """Create a new policy"""
@@ -25,10 +192,12 @@ class PolicyViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ClaimViewSet(viewsets.ModelViewSet):
+class ClaimViewSet(TextSearchMixin, BulkIngestMixin, viewsets.ModelViewSet):
     """API endpoints for Claim management"""
     queryset = Claim.objects.all()
     serializer_class = ClaimSerializer
+    index_source = 'claims'
+    search_filters = {'applicantId': 'applicant_id'}
 
     def get_queryset(self):
         """Filter claims by applicant_id if provided"""
@@ -47,10 +216,12 @@ class ClaimViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RegulationViewSet(viewsets.ModelViewSet):
+class RegulationViewSet(TextSearchMixin, BulkIngestMixin, viewsets.ModelViewSet):
     """API endpoints for Regulation management"""
     queryset = Regulation.objects.all()
     serializer_class = RegulationSerializer
+    index_source = 'regulations'
+    search_filters = {'lob': 'lob'}
 
     def get_queryset(self):
         """Filter regulations by line of business if provided"""
@@ -73,57 +244,111 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
     """API endpoints for Underwriting processes"""
     queryset = UnderwritingApplication.objects.all()
     serializer_class = UnderwritingApplicationSerializer
+    # Related data get_application_details can include
+    DETAIL_INCLUDES = ('policy', 'claims', 'regulations')
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.underwriting_workflow = UnderwritingWorkflow()
+    @property
+    def underwriting_workflow(self):
+        # Shared across requests; services.py is imported by the first request that needs it
+        return get_workflow()
 
     @action(detail=False, methods=['post'])
     def process_application(self, request):
-        """Process an underwriting application using LangGraph workflow"""
+        """Process an underwriting application using LangGraph workflow, at most once per idempotency key"""
         try:
             data = request.data
-            applicant_id = data.get('applicant_id')
-            policy_id = data.get('policy_id')
-            lob = data.get('lob')
-            application_data = data.get('application_data', {})
+            fields = {
+                'applicant_id': data.get('applicant_id'),
+                'policy_id': data.get('policy_id'),
+                'lob': data.get('lob'),
+                'application_data': data.get('application_data', {}),
+            }
 
-            if not all([applicant_id, policy_id, lob]):
+            if not all([fields['applicant_id'], fields['policy_id'], fields['lob']]):
                 return Response({
                     'error': 'Missing required fields: applicant_id, policy_id, lob'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Process through LangGraph workflow
-            result = self.underwriting_workflow.process_application(
-                applicant_id, policy_id, lob, application_data
-            )
+            key = request.headers.get('Idempotency-Key') or request_hash(fields)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return Response({
+                    'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Save the application to database
-            application = UnderwritingApplication.objects.create(
-                applicant_id=applicant_id,
-                policy_id=policy_id,
-                lob=lob,
-                application_data=application_data,
-                risk_summary=result.get('risk_summary', ''),
-                red_flags=result.get('red_flags', []),
-                recommendations=result.get('recommendations', ''),
-                status='processed'
-            )
+            application = stored_application(key)
+            if application is not None:
+                replayed = 'stored'
+            else:
+                # Concurrent duplicates in this process wait for the first one and share its application
+                (application, timings), in_flight = _applications_in_flight.do(
+                    key, lambda: self._create_application(key, fields))
+                if in_flight:
+                    replayed = 'in_flight'
+                else:
+                    replayed = None if timings is not None else 'stored'
+
+            if any(getattr(application, name) != value for name, value in fields.items()):
+                return Response({
+                    'error': 'Idempotency-Key was already used for a different application'
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
-            return Response({
+            response_data = {
                 'application_id': str(application.id),
-                'risk_summary': result.get('risk_summary', ''),
-                'red_flags': result.get('red_flags', []),
-                'recommendations': result.get('recommendations', ''),
-                'messages': [msg.content for msg in result.get('messages', [])],
+                'risk_summary': application.risk_summary,
+                'red_flags': application.red_flags,
+                'recommendations': application.recommendations,
+                'messages': application.messages,
                 'status': 'completed'
-            }, status=status.HTTP_200_OK)
+            }
+            if not replayed and request.query_params.get('timings', '').lower() in ('1', 'true', 'yes'):
+                response_data['timings'] = {
+                    stage: round(value, 6) if isinstance(value, float) else value
+                    for stage, value in timings.items()
+                }
+            response = Response(response_data, status=status.HTTP_200_OK)
+            if replayed:
+                metrics.APPLICATION_REPLAYS.inc(source=replayed)
+                response['Idempotent-Replayed'] = 'true'
+            return response
 
         except Exception as e:
             return Response({
                 'error': f'Error processing application: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _create_application(self, key, fields):
+        """Run the workflow and save its application under key; returns (application, timings or None if replayed)"""
+        # Another worker process may have finished the same request meanwhile
+        application = stored_application(key)
+        if application is not None:
+            return application, None
+
+        # Process through LangGraph workflow, collecting a per-stage breakdown
+        with metrics.collect_timings() as timings:
+            result = self.underwriting_workflow.process_application(
+                fields['applicant_id'], fields['policy_id'], fields['lob'], fields['application_data']
+            )
+
+        # Save the application to database, releasing the key from an application outside the window
+        UnderwritingApplication.objects.filter(
+            idempotency_key=key, created_at__lt=idempotency_cutoff()).update(idempotency_key=None)
+        try:
+            with transaction.atomic():
+                application = UnderwritingApplication.objects.create(
+                    **fields,
+                    risk_summary=result.get('risk_summary', ''),
+                    red_flags=result.get('red_flags', []),
+                    recommendations=result.get('recommendations', ''),
+                    messages=[msg.content for msg in result.get('messages', [])],
+                    # A run that ended in an error (e.g. the LLM never answered) is not replayed to retries
+                    idempotency_key=None if result.get('current_step') == 'error' else key,
+                    status='processed'
+                )
+        except IntegrityError:
+            # A worker process finished first: answer with its application, as a later retry would get
+            return UnderwritingApplication.objects.get(idempotency_key=key), None
+        return application, timings
+
     @action(detail=False, methods=['post'])
     def explain_flag(self, request):
         """Explain a specific red flag in detail"""
@@ -194,7 +419,13 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def get_application_details(self, request):
-        """Get detailed information about an underwriting application"""
+        """Get detailed information about an underwriting application.
+
+        Optional query parameters trim the response: include=policy,claims,regulations selects
+        related data, fields= (or fields[application|policy|claims|regulations]=) selects record
+        fields, limit[claims|regulations]= and offset[...]= page the collections, and excerpt=N
+        returns the first N characters of each text with its full length.
+        """
         try:
             application_id = request.query_params.get('application_id')
             
@@ -203,6 +434,11 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
                     'error': 'Missing required parameter: application_id'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            try:
+                options = self._detail_options(request.query_params)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
             # Get the application
             try:
                 application = UnderwritingApplication.objects.get(id=application_id)
@@ -212,23 +448,28 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # Serialize the application data
-            serializer = self.get_serializer(application)
+            serializer = self.get_serializer(application, fields=options['fields'].get('application'))
             application_data = serializer.data
 
             # Get related claims for this applicant
-            claims = Claim.objects.filter(applicant_id=application.applicant_id)
-            claims_data = ClaimSerializer(claims, many=True).data
+            claims_data, claims_count = None, None
+            if 'claims' in options['include']:
+                claims = Claim.objects.filter(applicant_id=application.applicant_id).order_by('created_at', 'claim_id')
+                claims_data, claims_count = self._related_records(claims, ClaimSerializer, 'claims', options)
 
             # Get related policies
-            try:
-                policy = Policy.objects.get(policy_id=application.policy_id)
-                policy_data = PolicySerializer(policy).data
-            except Policy.DoesNotExist:
-                policy_data = None
+            policy_data = None
+            if 'policy' in options['include']:
+                policy = Policy.objects.filter(policy_id=application.policy_id)
+                records, _ = self._related_records(policy, PolicySerializer, 'policy', options)
+                policy_data = records[0] if records else None
 
             # Get regulations for this line of business
-            regulations = Regulation.objects.filter(lob=application.lob)
-            regulations_data = RegulationSerializer(regulations, many=True).data
+            regulations_data, regulations_count = None, None
+            if 'regulations' in options['include']:
+                regulations = Regulation.objects.filter(lob=application.lob).order_by('created_at', 'regulation_id')
+                regulations_data, regulations_count = self._related_records(
+                    regulations, RegulationSerializer, 'regulations', options)
 
             # Format the detailed response
             response_data = {
@@ -247,15 +488,18 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
                         'red_flags': application.red_flags,
                         'red_flags_count': len(application.red_flags) if application.red_flags else 0
                     },
-                    'related_data': {
-                        'policy': policy_data,
-                        'claims': claims_data,
-                        'claims_count': len(claims_data),
-                        'regulations': regulations_data,
-                        'regulations_count': len(regulations_data)
-                    }
+                    'related_data': {}
                 }
             }
+            related_data = response_data['detailed_results']['related_data']
+            if 'policy' in options['include']:
+                related_data['policy'] = policy_data
+            if 'claims' in options['include']:
+                related_data['claims'] = claims_data
+                related_data['claims_count'] = claims_count
+            if 'regulations' in options['include']:
+                related_data['regulations'] = regulations_data
+                related_data['regulations_count'] = regulations_count
 
             return Response(response_data, status=status.HTTP_200_OK)
 
@@ -264,7 +508,85 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
                 'error': f'Error retrieving application details: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @classmethod
+    def _detail_options(cls, params):
+        """Parse include, fields, limit, offset and excerpt for get_application_details"""
+        include = cls.DETAIL_INCLUDES
+        if 'include' in params:
+            include = tuple(name for name in params['include'].split(',') if name)
+            unknown = set(include) - set(cls.DETAIL_INCLUDES)
+            if unknown:
+                raise ValueError(f"Unknown include: {', '.join(sorted(unknown))}. "
+                                 f"Expected any of {', '.join(cls.DETAIL_INCLUDES)}")
+
+        def field_list(value):
+            return [name.strip() for name in value.split(',') if name.strip()]
+
+        fields = {}
+        if 'fields' in params:
+            fields = {name: field_list(params['fields']) for name in cls.DETAIL_INCLUDES}
+        for name in ('application',) + cls.DETAIL_INCLUDES:
+            if f'fields[{name}]' in params:
+                fields[name] = field_list(params[f'fields[{name}]'])
+
+        def non_negative(key, default=None):
+            if key not in params:
+                return default
+            try:
+                value = int(params[key])
+            except ValueError:
+                value = -1
+            if value < 0:
+                raise ValueError(f'{key} must be a non-negative integer')
+            return value
+
+        return {
+            'include': include,
+            'fields': fields,
+            'limit': {name: non_negative(f'limit[{name}]') for name in ('claims', 'regulations')},
+            'offset': {name: non_negative(f'offset[{name}]', 0) for name in ('claims', 'regulations')},
+            'excerpt': non_negative('excerpt'),
+        }
+
+    @staticmethod
+    def _related_records(queryset, serializer_class, name, options):
+        """A page of related records as dicts of the requested serializer fields"""
+        fields = options['fields'].get(name)
+        serializer_fields = [f for f in serializer_class.Meta.fields if fields is None or f in fields]
+        excerpt = options['excerpt']
+        wants_text = 'text' in serializer_fields
+
+        # Never load text that is not returned; with excerpts, let the database truncate it.
+        # Plain columns render like the serializer's output, so rows come straight from .values()
+        columns = [f for f in serializer_fields if not (f == 'text' and excerpt is not None)]
+        # values() without names would load every column
+        load = columns or ['id']
+        if wants_text and excerpt is not None:
+            queryset = queryset.values(*load, text_excerpt=Substr('text', 1, excerpt), text_length=Length('text'))
+        else:
+            queryset = queryset.values(*load)
+
+        limit, offset = options['limit'].get(name), options['offset'].get(name, 0)
+        count = None
+        if limit is not None or offset:
+            count = queryset.count()
+            queryset = queryset[offset:offset + limit] if limit is not None else queryset[offset:]
+        data = list(queryset)
+
+        if not columns:
+            for item in data:
+                del item['id']
+        if wants_text and excerpt is not None:
+            for item in data:
+                text, text_length = item.pop('text_excerpt'), item.pop('text_length')
+                truncated = text_length > excerpt
+                item['text'] = text + ('…' if truncated else '')
+                item['text_length'] = text_length
+                item['text_truncated'] = truncated
+        return data, len(data) if count is None else count
+
     @action(detail=False, methods=['get'])
+    @conditional_response(UnderwritingApplication)
     def list_applications(self, request):
         """List all underwriting applications with summary information"""
         try:
@@ -289,17 +611,16 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
             # Order by creation date (newest first)
             queryset = queryset.order_by('-created_at')
 
-            # Serialize the data
-            serializer = self.get_serializer(queryset, many=True)
-            applications = serializer.data
+            # Plain columns render like the serializer's output (item_api/renderers.py), so read
+            # rows with .values() and skip per-field serialization
+            applications = list(queryset.values(*self.serializer_class.Meta.fields))
 
             # Add summary information to each application
             for app in applications:
-                app_obj = UnderwritingApplication.objects.get(id=app['id'])
                 app['summary'] = {
-                    'red_flags_count': len(app_obj.red_flags) if app_obj.red_flags else 0,
-                    'has_recommendations': bool(app_obj.recommendations.strip()) if app_obj.recommendations else False,
-                    'has_risk_summary': bool(app_obj.risk_summary.strip()) if app_obj.risk_summary else False
+                    'red_flags_count': len(app['red_flags']) if app['red_flags'] else 0,
+                    'has_recommendations': bool(app['recommendations'].strip()) if app['recommendations'] else False,
+                    'has_risk_summary': bool(app['risk_summary'].strip()) if app['risk_summary'] else False
                 }
 
             return Response({
@@ -319,69 +640,73 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'])
+    @conditional_response(UnderwritingApplication)
     def dashboard_overview(self, request):
         """Get dashboard overview of all underwriting applications"""
         try:
-            # Get all applications
-            all_applications = UnderwritingApplication.objects.all()
-            
-            # Calculate statistics
-            total_applications = all_applications.count()
-            pending_applications = all_applications.filter(status='pending').count()
-            processed_applications = all_applications.filter(status='processed').count()
-            
+            # One pass over the columns the dashboard uses; application_data is never loaded
+            all_applications = UnderwritingApplication.objects.values(
+                'id', 'applicant_id', 'policy_id', 'lob', 'status', 'risk_summary', 'red_flags',
+                'recommendations', 'created_at')
+
+            total_applications = 0
+            pending_applications = 0
+            processed_applications = 0
+
             # Get applications with red flags
             flagged_applications = []
             high_risk_applications = []
-            
+
+            # Group by line of business
+            lob_stats = {}
+
             for app in all_applications:
-                if app.red_flags and len(app.red_flags) > 0:
+                total_applications += 1
+                if app['status'] == 'pending':
+                    pending_applications += 1
+                elif app['status'] == 'processed':
+                    processed_applications += 1
+
+                flagged = bool(app['red_flags'])
+                if flagged:
                     flagged_applications.append({
-                        'id': str(app.id),
-                        'applicant_id': app.applicant_id,
-                        'red_flags_count': len(app.red_flags),
-                        'red_flags': app.red_flags,
-                        'created_at': app.created_at.isoformat()
+                        'id': str(app['id']),
+                        'applicant_id': app['applicant_id'],
+                        'red_flags_count': len(app['red_flags']),
+                        'red_flags': app['red_flags'],
+                        'created_at': app['created_at'].isoformat()
                     })
-                
+
                 # Check for high risk indicators
-                if (app.risk_summary and 
-                    any(keyword in app.risk_summary.lower() for keyword in 
+                risk_summary = app['risk_summary']
+                if (risk_summary and
+                    any(keyword in risk_summary.lower() for keyword in
                         ['high risk', 'medium to high', 'significant risk'])):
                     high_risk_applications.append({
-                        'id': str(app.id),
-                        'applicant_id': app.applicant_id,
-                        'risk_summary': app.risk_summary[:200] + '...' if len(app.risk_summary) > 200 else app.risk_summary,
-                        'created_at': app.created_at.isoformat()
+                        'id': str(app['id']),
+                        'applicant_id': app['applicant_id'],
+                        'risk_summary': risk_summary[:200] + '...' if len(risk_summary) > 200 else risk_summary,
+                        'created_at': app['created_at'].isoformat()
                     })
 
-            # Get recent applications (last 10)
-            recent_applications = all_applications.order_by('-created_at')[:10]
-            recent_apps_data = []
-            
-            for app in recent_applications:
-                recent_apps_data.append({
-                    'id': str(app.id),
-                    'applicant_id': app.applicant_id,
-                    'policy_id': app.policy_id,
-                    'lob': app.lob,
-                    'status': app.status,
-                    'red_flags_count': len(app.red_flags) if app.red_flags else 0,
-                    'has_recommendations': bool(app.recommendations.strip()) if app.recommendations else False,
-                    'created_at': app.created_at.isoformat()
-                })
+                stats = lob_stats.setdefault(app['lob'], {'count': 0, 'flagged': 0, 'processed': 0})
+                stats['count'] += 1
+                if flagged:
+                    stats['flagged'] += 1
+                if app['status'] == 'processed':
+                    stats['processed'] += 1
 
-            # Group by line of business
-            lob_stats = {}
-            for app in all_applications:
-                lob = app.lob
-                if lob not in lob_stats:
-                    lob_stats[lob] = {'count': 0, 'flagged': 0, 'processed': 0}
-                lob_stats[lob]['count'] += 1
-                if app.red_flags and len(app.red_flags) > 0:
-                    lob_stats[lob]['flagged'] += 1
-                if app.status == 'processed':
-                    lob_stats[lob]['processed'] += 1
+            # Get recent applications (last 10)
+            recent_apps_data = [{
+                'id': str(app['id']),
+                'applicant_id': app['applicant_id'],
+                'policy_id': app['policy_id'],
+                'lob': app['lob'],
+                'status': app['status'],
+                'red_flags_count': len(app['red_flags']) if app['red_flags'] else 0,
+                'has_recommendations': bool(app['recommendations'].strip()) if app['recommendations'] else False,
+                'created_at': app['created_at'].isoformat()
+            } for app in all_applications.order_by('-created_at')[:10]]
 
             return Response({
                 'overview': {
@@ -402,3 +727,8 @@ class UnderwritingViewSet(viewsets.ModelViewSet):
             return Response({
                 'error': f'Error generating dashboard overview: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def metrics_view(request):
+    """Expose underwriting metrics in the Prometheus text exposition format"""
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
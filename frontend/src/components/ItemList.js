@@ -8,6 +8,9 @@ import {
   Flex,
   Heading,
   HStack,
+  Input,
+  Select,
+  Switch,
   Table,
   Tbody,
   Td,
@@ -20,10 +23,24 @@ import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { getItems } from '../services/itemService';
 
+const PAGE_SIZE = 50;
+
 const ItemList = () => {
   const [items, setItems] = useState([]);
+  const [count, setCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [query, setQuery] = useState('');
+  const [group, setGroup] = useState('');
+  const [fuzzy, setFuzzy] = useState(false);
+  const [offset, setOffset] = useState(0);
+
+  // A filter change starts again from the first page; both updates land in one render, so the
+  // fetch below never runs for the new filters with the old offset
+  const changeFilter = (setFilter) => (value) => {
+    setFilter(value);
+    setOffset(0);
+  };
 
   useEffect(() => {
     let mounted = true;
@@ -34,11 +51,16 @@ const ItemList = () => {
       try {
         setLoading(true);
         console.log('Fetching items from API...');
-        const data = await getItems();
+        const params = { limit: PAGE_SIZE, offset };
+        if (query.trim()) params.q = query.trim();
+        if (group) params.group = group;
+        if (fuzzy) params.fuzzy = 1;
+        const data = await getItems(params);
 
         if (mounted) {
           console.log('Items received:', data);
-          setItems(data);
+          setItems((previous) => (offset ? [...previous, ...data.results] : data.results));
+          setCount(data.count);
           setLoading(false);
         }
       } catch (error) {
@@ -50,12 +72,14 @@ const ItemList = () => {
       }
     };
 
-    fetchItems();
+    // Wait for a pause in typing before searching
+    const timer = setTimeout(fetchItems, offset ? 0 : 250);
 
     return () => {
       mounted = false;
+      clearTimeout(timer);
     };
-  }, []);
+  }, [query, group, fuzzy, offset]);
 
   const getBadgeColor = (group) => {
     return group === 'Primary' ? 'green' : 'blue';
@@ -85,7 +109,23 @@ const ItemList = () => {
         </Alert>
       )}
 
-      {loading ? (
+      <HStack spacing={3} mb={4}>
+        <Input
+          placeholder="Search items by name"
+          value={query}
+          onChange={(e) => changeFilter(setQuery)(e.target.value)}
+        />
+        <Select placeholder="All groups" value={group} onChange={(e) => changeFilter(setGroup)(e.target.value)} maxW="200px">
+          <option value="Primary">Primary</option>
+          <option value="Secondary">Secondary</option>
+        </Select>
+        <HStack spacing={2} flexShrink={0}>
+          <Switch isChecked={fuzzy} onChange={(e) => changeFilter(setFuzzy)(e.target.checked)} />
+          <Text fontSize="sm">Fuzzy</Text>
+        </HStack>
+      </HStack>
+
+      {loading && !offset ? (
         <Box>Loading items...</Box>
       ) : (
         <Table>
@@ -103,19 +143,25 @@ const ItemList = () => {
                 <Td colSpan={4} textAlign="center" py={8}>
                   <Box>
                     <Heading size="md" color="gray.500" mb={2}>No items found</Heading>
-                    <Text color="gray.400" mb={4}>Get started by creating your first item!</Text>
-                    <HStack spacing={3} justify="center">
-                      <Link to="/add">
-                        <Button colorScheme="teal" size="sm">
-                          ➕ Add Item Manually
-                        </Button>
-                      </Link>
-                      <Link to="/speech">
-                        <Button colorScheme="orange" size="sm">
-                          🎤 Add with Voice
-                        </Button>
-                      </Link>
-                    </HStack>
+                    {(query || group) ? (
+                      <Text color="gray.400">Try a different search or group.</Text>
+                    ) : (
+                      <>
+                        <Text color="gray.400" mb={4}>Get started by creating your first item!</Text>
+                        <HStack spacing={3} justify="center">
+                          <Link to="/add">
+                            <Button colorScheme="teal" size="sm">
+                              ➕ Add Item Manually
+                            </Button>
+                          </Link>
+                          <Link to="/speech">
+                            <Button colorScheme="orange" size="sm">
+                              🎤 Add with Voice
+                            </Button>
+                          </Link>
+                        </HStack>
+                      </>
+                    )}
                   </Box>
                 </Td>
               </Tr>
@@ -147,6 +193,14 @@ const ItemList = () => {
           </Tbody>
         </Table>
       )}
+
+      {items.length < count && (
+        <Flex justify="center" mt={4}>
+          <Button onClick={() => setOffset(items.length)} isLoading={loading}>
+            Load more ({items.length} of {count})
+          </Button>
+        </Flex>
+      )}
     </Container>
   );
 };
@@ -87,10 +87,11 @@ const SpeechRecorder = () => {
 
       if (response.ok) {
         setTranscription(data.transcription);
-        if (data.item) {
+        const created = data.items || (data.item ? [data.item] : []);
+        if (created.length) {
           toast({
-            title: 'Item Created Successfully!',
-            description: `Added "${data.item.name}" to ${data.item.group} group`,
+            title: created.length > 1 ? `${created.length} Items Created Successfully!` : 'Item Created Successfully!',
+            description: created.map((item) => `Added "${item.name}" to ${item.group} group`).join('\n'),
             status: 'success',
             duration: 3000,
             isClosable: true,
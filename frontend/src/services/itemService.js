@@ -2,10 +2,12 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:8000';
 
-export const getItems = async () => {
+// params: group, q (name prefix), fuzzy, limit, offset; with limit the response is
+// { count, next, previous, results } instead of a plain array
+export const getItems = async (params = {}) => {
   try {
-    console.log('Sending request to:', `${API_URL}/items/`);
-    const response = await axios.get(`${API_URL}/items/`);
+    console.log('Sending request to:', `${API_URL}/items/`, params);
+    const response = await axios.get(`${API_URL}/items/`, { params });
     console.log('Response received:', response);
     return response.data;
   } catch (error) {